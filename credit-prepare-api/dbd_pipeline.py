@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+dbd_pipeline.py — DBD refresh แบบไหลต่อเนื่องต่อบริษัท: scrape → OCR/parse → send (+ งบการเงิน)
+
+แทนการรัน 4 สคริปต์ทีละขั้น (รอทั้งชุดเสร็จก่อนค่อยเริ่มขั้นถัดไป):
+  scrape     : dbd_web_scraping.run_for_one_company        → <id>_company_info.pdf, <id>_{balance,income,ratios}.xls
+  ocr        : pdf_ocr_dbd_to_json.process_one              → <id>_company_info_structured.json
+  financials : script_read_dbd_financials.process_company   → <json-dir>/<id>_{balance,income,ratios}.json
+  send       : send_dbd_company_supplier.post_json          → POST structured JSON
+
+- แต่ละขั้นมีคิวถาวรใน SQLite (services/work_queue.py) บริษัทที่ scrape เสร็จเข้าคิว OCR ทันที
+- worker แต่ละตัวเป็น process แยก (OCR/pandas ไม่ติด GIL, pdfium ไม่ต้องแชร์ข้าม thread)
+- retry ต่อขั้น (backoff ทวีคูณจาก --retry-delay) งานที่หมดสิทธิ์เป็น failed ดูได้ด้วย --status
+- หยุดกลางคัน (Ctrl-C / เครื่องดับ) แล้วรันคำสั่งเดิมซ้ำ → ทำต่อจากที่ค้าง ไม่ทำงานที่ done ซ้ำ
+- scrape ใช้ 1 worker ต่อ --out-dir (ตรวจไฟล์ดาวน์โหลดจากการเปลี่ยนแปลงในโฟลเดอร์ และใช้ chrome_profile เดียวกัน)
+- scrape ผ่าน token bucket ร่วม (--rate-db, services/rate_limiter.py) กับ scraper ตัวอื่นบนเครื่อง ปรับ rate ตาม latency / error / หน้าถูกปฏิเสธ
+
+Usage:
+  python dbd_pipeline.py --ids-file juristic_ids.txt --headless
+  python dbd_pipeline.py --ids-file juristic_ids.txt --ocr-workers 4 --send-workers 4 --api-url http://api/api/public/dbd-company-supplier
+  python dbd_pipeline.py --skip-scrape                # ประมวลผลไฟล์ที่มีอยู่แล้วใน --out-dir
+  python dbd_pipeline.py --status                     # ดูความคืบหน้า/งานที่ล้มเหลว
+  python dbd_pipeline.py --retry-failed               # คืนงาน failed เข้าคิวแล้วรันต่อ
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.pdf_raster import dpi_arg
+from services.rate_limiter import add_rate_args
+from services.work_queue import WorkQueue
+
+STAGES = ("scrape", "ocr", "financials", "send")
+UPSTREAM = {"scrape": (), "ocr": ("scrape",), "financials": ("scrape",), "send": ("ocr",)}
+STATEMENTS = ("balance", "income", "ratios")
+POLL_SECONDS = 1.0
+
+INFO_PDF_RE = re.compile(r"^(\d{10,13})_company_info\.pdf$", re.IGNORECASE)
+XLS_RE = re.compile(r"^(\d{10,13})_(balance|income|ratios)\.xlsx?$", re.IGNORECASE)
+
+
+# ---------------- stage handlers ---------------- #
+# handler(jid, args, state) → รายชื่อขั้นถัดไปที่ต้อง enqueue; raise = ล้มเหลว (retry ตาม --*-retries)
+# state: dict ต่อ worker process (เช่น Selenium driver ที่ใช้ซ้ำข้ามบริษัท); state["close"] ถูกเรียกตอน worker จบ
+
+def _scrape(jid: str, args, state: Dict[str, Any]) -> List[str]:
+    import dbd_web_scraping as scraper
+    from services.driver_supervisor import DriverSupervisor
+    from services.rate_limiter import open_limiter
+
+    out_dir = Path(args.out_dir)
+    sup = state.get("sup")
+    if sup is None:
+        # Chrome หนึ่งตัวต่อ worker ใช้ซ้ำข้ามบริษัท; recycle ตามจำนวน/หน่วยความจำ, restart เมื่อ browser ตาย
+        sup = DriverSupervisor(
+            lambda: scraper.make_driver(out_dir, headless=args.headless, lean=args.lean),
+            recycle_every=args.recycle_every,
+            max_rss_mb=args.max_rss_mb or None,
+        )
+        state.update(sup=sup, close=sup.close, limiter=open_limiter(args))
+    limiter = state["limiter"]
+    with limiter.request() if limiter else nullcontext():
+        sup.run(jid, lambda driver, fresh: scraper.scrape_one(driver, out_dir, jid, fresh))
+
+    nexts = []
+    if (out_dir / f"{jid}_company_info.pdf").is_file():
+        nexts.append("ocr")
+    if _statement_files(out_dir, jid):
+        nexts.append("financials")
+    return nexts
+
+
+def _ocr(jid: str, args, state: Dict[str, Any]) -> List[str]:
+    import pdf_ocr_dbd_to_json as dbd
+
+    pdf_path = os.path.join(args.out_dir, f"{jid}_company_info.pdf")
+    if not os.path.isfile(pdf_path):
+        raise FileNotFoundError(pdf_path)
+    ocr_args = argparse.Namespace(
+        lang=args.lang, dpi=args.dpi, force_ocr=False, text_backend=None,
+        structured_only=True, full_text=False, text_only=False, no_early_exit=False,
+    )
+    if not dbd.process_one(pdf_path, ocr_args):
+        raise RuntimeError(f"process_one failed: {pdf_path}")
+    return ["send"]
+
+
+def _financials(jid: str, args, state: Dict[str, Any]) -> List[str]:
+    import script_read_dbd_financials as fin
+
+    files = _statement_files(Path(args.out_dir), jid)
+    if not files:
+        raise FileNotFoundError(f"no *_balance/_income/_ratios file for {jid} in {args.out_dir}")
+    _, _, errors = fin.process_company(jid, files, None, Path(args.json_dir), False)
+    if errors:
+        raise RuntimeError("; ".join(f"{k}: {v}" for k, v in errors.items()))
+    return []
+
+
+def _send(jid: str, args, state: Dict[str, Any]) -> List[str]:
+    from send_dbd_company_supplier import make_session, post_json
+
+    session = state.get("session")
+    if session is None:
+        session = make_session()  # keep-alive ข้ามบริษัทใน worker เดียวกัน
+        state.update(session=session, close=session.close)
+    json_path = os.path.join(args.out_dir, f"{jid}_company_info_structured.json")
+    if not post_json(json_path, args.api_url, args.timeout, auto_jid=True, session=session):
+        raise RuntimeError(f"POST failed: {json_path}")
+    return []
+
+
+HANDLERS = {"scrape": _scrape, "ocr": _ocr, "financials": _financials, "send": _send}
+
+
+def _statement_files(out_dir: Path, jid: str) -> Dict[str, Path]:
+    files: Dict[str, Path] = {}
+    for stmt in STATEMENTS:
+        for ext in (".xls", ".xlsx"):
+            p = out_dir / f"{jid}_{stmt}{ext}"
+            if p.is_file():
+                files[stmt] = p
+                break
+    return files
+
+
+# ---------------- worker ---------------- #
+
+def stage_finished(q: WorkQueue, stage: str, enabled: Tuple[str, ...]) -> bool:
+    """ไม่มีงานค้างในขั้นนี้ และขั้นก่อนหน้า (ที่เปิดใช้) จบหมดแล้ว → จะไม่มีงานใหม่เข้ามาอีก"""
+    st = q.stats(stage)
+    if st["pending"] or st["running"]:
+        return False
+    return all(stage_finished(q, up, enabled) for up in UPSTREAM[stage] if up in enabled)
+
+
+def worker_main(db_path: str, stage: str, idx: int, args, enabled: Tuple[str, ...], max_attempts: int) -> None:
+    q = WorkQueue(db_path)
+    handler = HANDLERS[stage]
+    name = f"{stage}-{idx}@{os.getpid()}"
+    state: Dict[str, Any] = {}
+    try:
+        while True:
+            job = q.claim(stage, name)
+            if job is None:
+                if stage_finished(q, stage, enabled):
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+            try:
+                nexts = handler(job.key, args, state)
+            except Exception as e:
+                retry = q.fail(job, f"{type(e).__name__}: {e}", max_attempts, args.retry_delay)
+                tag = f"retry {job.attempts}/{max_attempts}" if retry else "failed"
+                print(f"⚠ [{stage}] {job.key}: {e} ({tag})", file=sys.stderr, flush=True)
+                continue
+            # enqueue ขั้นถัดไปก่อน complete → ขั้นถัดไปไม่เห็นว่าขั้นนี้ "จบ" ก่อนงานของตัวเองเข้าคิว
+            # requeue: ขั้นก่อนหน้าเพิ่งทำใหม่ (เช่นรอบ --fresh) → ผลเดิมของขั้นถัดไปที่ done แล้วต้องทำใหม่ด้วย
+            for nxt in nexts:
+                if nxt in enabled:
+                    q.enqueue(nxt, job.key, requeue=True)
+            q.complete(job)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close = state.get("close")
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+        q.close()
+
+
+# ---------------- progress ---------------- #
+
+def _fmt_secs(sec: Optional[float]) -> str:
+    if sec is None:
+        return "?"
+    sec = int(sec)
+    if sec >= 3600:
+        return f"{sec // 3600}h{(sec % 3600) // 60:02d}m"
+    if sec >= 60:
+        return f"{sec // 60}m{sec % 60:02d}s"
+    return f"{sec}s"
+
+
+def progress_line(q: WorkQueue, enabled: Tuple[str, ...], workers: Dict[str, int]) -> str:
+    parts = []
+    for stage in enabled:
+        st = q.stats(stage)
+        total = sum(st[s] for s in ("pending", "running", "done", "failed"))
+        left = st["pending"] + st["running"]
+        eta = left * st["avg_seconds"] / max(1, workers[stage]) if st["avg_seconds"] is not None else None
+        part = f"{stage} {st['done']}/{total}"
+        if st["running"]:
+            part += f" run={st['running']}"
+        if st["failed"]:
+            part += f" fail={st['failed']}"
+        if left:
+            part += f" eta={_fmt_secs(eta)}"
+        parts.append(part)
+    return " | ".join(parts)
+
+
+def print_status(q: WorkQueue) -> None:
+    print(progress_line(q, STAGES, {s: 1 for s in STAGES}))
+    for stage in STAGES:
+        for f in q.failures(stage):
+            print(f"  ❌ [{stage}] {f['key']} (attempts={f['attempts']}): {f['error']}")
+
+
+# ---------------- seeding ---------------- #
+
+def seed_from_downloads(q: WorkQueue, out_dir: Path, enabled: Tuple[str, ...], fresh: bool = False) -> Tuple[int, int]:
+    """--skip-scrape: เข้าคิว OCR/financials จากไฟล์ที่มีอยู่ใน out_dir"""
+    pdf_ids, xls_ids = set(), set()
+    for p in out_dir.iterdir():
+        m = INFO_PDF_RE.match(p.name)
+        if m:
+            pdf_ids.add(m.group(1))
+        m = XLS_RE.match(p.name)
+        if m:
+            xls_ids.add(m.group(1))
+    n_ocr = q.enqueue_many("ocr", sorted(pdf_ids), requeue=fresh) if "ocr" in enabled else 0
+    n_fin = q.enqueue_many("financials", sorted(xls_ids), requeue=fresh) if "financials" in enabled else 0
+    return n_ocr, n_fin
+
+
+# ---------------- CLI ---------------- #
+
+def main():
+    ap = argparse.ArgumentParser(description="DBD pipeline: scrape → OCR/parse → send, per company via durable SQLite queues")
+    ap.add_argument("--juristic-id", help="รหัสเดียว")
+    ap.add_argument("--juristic-ids", help="หลายรหัส คั่นด้วยจุลภาค")
+    ap.add_argument("--ids-file", help="ไฟล์ .txt รหัสบรรทัดละหนึ่งตัว")
+    ap.add_argument("--out-dir", default="./downloads", help="โฟลเดอร์ดาวน์โหลด/ผล OCR (default: ./downloads)")
+    ap.add_argument("--json-dir", default="./processed_data", help="ผล <id>_{balance,income,ratios}.json (default: ./processed_data)")
+    ap.add_argument("--db", default="./pipeline/dbd_pipeline.sqlite", help="ไฟล์คิว SQLite")
+    ap.add_argument("--headless", action="store_true")
+    ap.add_argument("--lean", action="store_true", help="Chrome แบบไม่โหลดรูป/ฟอนต์/tracker (ดู dbd_web_scraping.py --lean)")
+    ap.add_argument("--recycle-every", type=int, default=100, help="เปิด Chrome ใหม่ทุก N บริษัท (0 = ไม่ใช้)")
+    ap.add_argument("--max-rss-mb", type=float, default=2500, help="เปิด Chrome ใหม่เมื่อหน่วยความจำรวมเกิน (MB, 0 = ไม่ตรวจ)")
+    add_rate_args(ap)
+    ap.add_argument("--skip-scrape", action="store_true", help="ไม่ scrape; ใช้ไฟล์ที่มีใน --out-dir")
+    ap.add_argument("--no-financials", action="store_true", help="ไม่แปลงงบการเงิน")
+    ap.add_argument("--no-send", action="store_true", help="ไม่ POST ไป API")
+    ap.add_argument("--lang", default="tha+eng")
+    ap.add_argument("--dpi", type=dpi_arg, default="auto", help="auto (from glyph height) or a number")
+    ap.add_argument("--api-url", default="http://localhost:8000/api/public/dbd-company-supplier")
+    ap.add_argument("--timeout", type=int, default=30)
+    ap.add_argument("--ocr-workers", type=int, default=2)
+    ap.add_argument("--fin-workers", type=int, default=1)
+    ap.add_argument("--send-workers", type=int, default=2)
+    ap.add_argument("--scrape-retries", type=int, default=2, help="จำนวนครั้งสูงสุดต่อบริษัท (รวมครั้งแรก)")
+    ap.add_argument("--ocr-retries", type=int, default=2)
+    ap.add_argument("--fin-retries", type=int, default=1)
+    ap.add_argument("--send-retries", type=int, default=5)
+    ap.add_argument("--retry-delay", type=float, default=30.0, help="วินาทีก่อน retry ครั้งแรก (ทวีคูณทุกครั้ง)")
+    ap.add_argument("--progress-every", type=float, default=10.0, help="แสดงความคืบหน้าทุก N วินาที")
+    ap.add_argument("--status", action="store_true", help="แสดงสถานะคิวแล้วออก")
+    ap.add_argument("--retry-failed", action="store_true", help="คืนงาน failed ทุกขั้นเข้าคิวก่อนเริ่ม")
+    ap.add_argument("--fresh", action="store_true",
+                    help="รอบ refresh ใหม่: รหัสที่ระบุซึ่ง done/failed แล้วกลับเข้าคิวทำใหม่ทุกขั้น (ไม่ใส่ = ทำต่อจากที่ค้าง)")
+    args = ap.parse_args()
+
+    q = WorkQueue(args.db)
+    if args.status:
+        print_status(q)
+        return
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    Path(args.json_dir).mkdir(parents=True, exist_ok=True)
+
+    enabled = tuple(
+        s for s in STAGES
+        if not (s == "scrape" and args.skip_scrape)
+        and not (s == "financials" and args.no_financials)
+        and not (s == "send" and args.no_send)
+    )
+    workers = {"scrape": 1, "ocr": args.ocr_workers, "financials": args.fin_workers, "send": args.send_workers}
+    retries = {"scrape": args.scrape_retries, "ocr": args.ocr_retries, "financials": args.fin_retries, "send": args.send_retries}
+
+    recovered = q.recover()
+    if recovered:
+        print(f"▶ recovered {recovered} interrupted job(s)")
+    if args.retry_failed:
+        print(f"▶ re-queued {q.retry_failed()} failed job(s)")
+
+    if "scrape" in enabled:
+        if args.juristic_id or args.juristic_ids or args.ids_file:
+            from dbd_web_scraping import parse_ids
+            added = q.enqueue_many("scrape", parse_ids(args), requeue=args.fresh)
+            print(f"▶ scrape queue: +{added} {'new/requeued' if args.fresh else 'new'}")
+            if not added and not args.fresh:
+                print("  (ทุกรหัสเคยเข้าคิวแล้ว — รอบ refresh ใหม่ใช้ --fresh)")
+    else:
+        n_ocr, n_fin = seed_from_downloads(q, out_dir, enabled, fresh=args.fresh)
+        print(f"▶ from {out_dir}: ocr +{n_ocr}, financials +{n_fin}")
+
+    print("=" * 60)
+    print(f"DBD pipeline: {' → '.join(enabled)}  (db={q.db_path})")
+    print("=" * 60)
+
+    procs: List[mp.Process] = []
+    for stage in enabled:
+        for i in range(max(1, workers[stage])):
+            p = mp.Process(
+                target=worker_main,
+                args=(q.db_path, stage, i + 1, args, enabled, max(1, retries[stage])),
+                name=f"{stage}-{i + 1}",
+            )
+            p.start()
+            procs.append(p)
+
+    t0 = time.time()
+    next_report = t0 + args.progress_every
+    try:
+        while any(p.is_alive() for p in procs):
+            time.sleep(POLL_SECONDS)
+            if time.time() >= next_report:
+                next_report += args.progress_every
+                print(f"[{_fmt_secs(time.time() - t0)}] {progress_line(q, enabled, workers)}", flush=True)
+    except KeyboardInterrupt:
+        print("\n⏹ interrupted — run the same command again to resume", file=sys.stderr)
+        for p in procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        sys.exit(130)
+
+    print("-" * 60)
+    print_status(q)
+    failed = sum(q.stats(s)["failed"] for s in enabled)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
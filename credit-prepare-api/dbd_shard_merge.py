@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+dbd_shard_merge.py — รวมผลจากหลายเครื่อง (dbd_web_scraping.py / pdf_ocr_dbd_to_json.py --shard i/N)
+เป็นโฟลเดอร์ downloads เดียว แล้วตรวจว่าทุกรหัสมีไฟล์ครบ
+
+รวม (merge):
+- ไฟล์ <id>_* ที่ระดับบนสุดของแต่ละ shard (pdf / xls / company_title.json / *_structured.json) → --dest
+  ไฟล์เดิมใน dest ที่เนื้อหาเหมือนกัน → ข้าม; เนื้อหาต่างกัน → conflict (คงไฟล์เดิมไว้ ยกเว้น --overwrite)
+- not_found/*_financial_result.json และ not_found/not_found_list.txt ของทุก shard → รวมเป็นชุดเดียว ไม่ซ้ำ
+  (รหัสที่มี xls ครบแล้วใน dest ถูกตัดออกจาก not_found_list.txt)
+- ไฟล์ debug_* และไฟล์อื่นไม่ถูกรวม
+
+ตรวจ (verify) เมื่อระบุ --ids-file / --juristic-ids:
+- ต้องมี <id>_company_info.pdf
+- งบการเงิน: <id>_{balance,income,ratios}.xls ครบ หรืออยู่ใน not_found_list.txt
+- --check-ocr: ต้องมี <id>_company_info_structured.json ด้วย
+- รหัสที่ขาด → --gaps-file (ใช้เป็น --ids-file รอบถัดไปได้เลย) และ exit code 1
+
+Usage:
+  python dbd_shard_merge.py shard1/downloads shard2/downloads shard3/downloads --dest ./downloads --ids-file juristic_ids.txt
+  python dbd_shard_merge.py --dest ./downloads --ids-file juristic_ids.txt --check-ocr     # ตรวจอย่างเดียว
+"""
+
+import argparse
+import filecmp
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Set
+
+STATEMENTS = ("balance", "income", "ratios")
+ARTIFACT_RE = re.compile(r"^(\d{10,13})_.+")
+NF_DIR = "not_found"
+NF_LIST = "not_found_list.txt"
+
+
+def read_ids(args) -> List[str]:
+    ids: List[str] = []
+    if args.juristic_ids:
+        ids += [s.strip() for s in args.juristic_ids.split(",") if s.strip()]
+    if args.ids_file:
+        p = Path(args.ids_file)
+        if not p.exists():
+            raise SystemExit(f"ไม่พบไฟล์: {p}")
+        for line in p.read_text(encoding="utf-8").splitlines():
+            s = line.strip()
+            if s and not s.startswith("#"):
+                ids.append(s)
+    return list(dict.fromkeys(ids))
+
+
+def read_not_found(folder: Path) -> List[str]:
+    p = folder / NF_DIR / NF_LIST
+    if not p.is_file():
+        return []
+    return [s.strip() for s in p.read_text(encoding="utf-8").splitlines() if s.strip()]
+
+
+# ---------------- merge ---------------- #
+
+class MergeStats:
+    def __init__(self):
+        self.copied = 0
+        self.same = 0
+        self.replaced = 0
+        self.conflicts: List[str] = []
+
+
+def _place(src: Path, dst: Path, move: bool, overwrite: bool, stats: MergeStats) -> None:
+    if dst.exists():
+        if filecmp.cmp(src, dst, shallow=False):
+            stats.same += 1
+            if move:
+                src.unlink()
+            return
+        if not overwrite:
+            stats.conflicts.append(f"{src} ≠ {dst}")
+            return
+        stats.replaced += 1
+    else:
+        stats.copied += 1
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if move:
+        shutil.move(str(src), str(dst))
+    else:
+        shutil.copy2(src, dst)
+
+
+def merge_shards(shards: List[Path], dest: Path, move: bool, overwrite: bool) -> MergeStats:
+    stats = MergeStats()
+    dest.mkdir(parents=True, exist_ok=True)
+    not_found: List[str] = read_not_found(dest)
+
+    for shard in shards:
+        if shard.resolve() == dest.resolve():
+            continue
+        if not shard.is_dir():
+            raise SystemExit(f"ไม่พบโฟลเดอร์: {shard}")
+        n_before = stats.copied + stats.replaced
+        for p in sorted(shard.iterdir()):
+            if p.is_file() and ARTIFACT_RE.match(p.name) and not p.name.endswith(".crdownload"):
+                _place(p, dest / p.name, move, overwrite, stats)
+        nf_dir = shard / NF_DIR
+        if nf_dir.is_dir():
+            for p in sorted(nf_dir.glob("*_financial_result.json")):
+                _place(p, dest / NF_DIR / p.name, move, overwrite, stats)
+        not_found += read_not_found(shard)
+        print(f"✔ {shard}: +{stats.copied + stats.replaced - n_before} file(s)")
+
+    # รหัสที่ภายหลังดาวน์โหลดงบได้ครบแล้ว ไม่ถือว่า not found
+    kept = [jid for jid in dict.fromkeys(not_found) if not has_statements(dest, jid)]
+    if kept or (dest / NF_DIR / NF_LIST).exists():
+        (dest / NF_DIR).mkdir(parents=True, exist_ok=True)
+        (dest / NF_DIR / NF_LIST).write_text("".join(f"{jid}\n" for jid in kept), encoding="utf-8")
+    return stats
+
+
+# ---------------- verify ---------------- #
+
+def has_statements(folder: Path, jid: str) -> bool:
+    return all((folder / f"{jid}_{stmt}.xls").is_file() for stmt in STATEMENTS)
+
+
+def verify(dest: Path, ids: List[str], check_ocr: bool) -> Dict[str, List[str]]:
+    """คืน {jid: [สิ่งที่ขาด]} เฉพาะรหัสที่ไม่ครบ"""
+    not_found: Set[str] = set(read_not_found(dest))
+    gaps: Dict[str, List[str]] = {}
+    for jid in ids:
+        missing: List[str] = []
+        if not (dest / f"{jid}_company_info.pdf").is_file():
+            missing.append("company_info.pdf")
+        elif check_ocr and not (dest / f"{jid}_company_info_structured.json").is_file():
+            missing.append("structured.json")
+        if jid not in not_found:
+            lacking = [s for s in STATEMENTS if not (dest / f"{jid}_{s}.xls").is_file()]
+            if lacking:
+                missing.append("+".join(lacking) + ".xls")
+        if missing:
+            gaps[jid] = missing
+    return gaps
+
+
+def unexpected_ids(dest: Path, ids: List[str]) -> List[str]:
+    wanted = set(ids)
+    found = {m.group(1) for m in (ARTIFACT_RE.match(p.name) for p in dest.iterdir() if p.is_file()) if m}
+    return sorted(found - wanted)
+
+
+# ---------------- CLI ---------------- #
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge per-shard DBD download folders and report missing companies")
+    ap.add_argument("shards", nargs="*", help="โฟลเดอร์ผลของแต่ละ shard (ไม่ระบุ = ตรวจ --dest อย่างเดียว)")
+    ap.add_argument("--dest", default="./downloads", help="โฟลเดอร์รวม (default: ./downloads)")
+    ap.add_argument("--juristic-ids", help="รหัสที่ต้องมี คั่นด้วยจุลภาค")
+    ap.add_argument("--ids-file", help="ไฟล์ .txt รหัสที่ต้องมี บรรทัดละหนึ่งตัว (ไฟล์เดียวกับที่ใช้ scrape)")
+    ap.add_argument("--check-ocr", action="store_true", help="ต้องมี <id>_company_info_structured.json ด้วย")
+    ap.add_argument("--move", action="store_true", help="ย้ายไฟล์แทนการคัดลอก")
+    ap.add_argument("--overwrite", action="store_true", help="ไฟล์ชื่อซ้ำแต่เนื้อหาต่าง → ใช้ไฟล์จาก shard")
+    ap.add_argument("--gaps-file", default=None, help="เขียนรหัสที่ขาด (default: <dest>/missing_ids.txt)")
+    args = ap.parse_args()
+
+    dest = Path(args.dest)
+    ids = read_ids(args)
+
+    print("=" * 60)
+    print(f"DBD shard merge → {dest}")
+    print("=" * 60)
+
+    rc = 0
+    if args.shards:
+        stats = merge_shards([Path(s) for s in args.shards], dest, args.move, args.overwrite)
+        print(f"copied={stats.copied} identical={stats.same} replaced={stats.replaced} conflicts={len(stats.conflicts)}")
+        for c in stats.conflicts:
+            print(f"  ⚠ conflict: {c}")
+        if stats.conflicts:
+            rc = 1
+
+    if not ids:
+        if not dest.is_dir():
+            raise SystemExit(f"ไม่พบโฟลเดอร์: {dest}")
+        print("⏩ ไม่ได้ระบุ --ids-file / --juristic-ids — ข้ามการตรวจความครบถ้วน")
+        sys.exit(rc)
+
+    gaps = verify(dest, ids, args.check_ocr)
+    extra = unexpected_ids(dest, ids)
+    n_nf = len(set(read_not_found(dest)) & set(ids))
+    print("-" * 60)
+    print(f"ids={len(ids)} complete={len(ids) - len(gaps)} (financials not found: {n_nf}) missing={len(gaps)}")
+    for jid, missing in gaps.items():
+        print(f"  ❌ {jid}: {', '.join(missing)}")
+    if extra:
+        print(f"  ⚠ {len(extra)} id(s) in {dest} not in the id list: {', '.join(extra[:10])}{' ...' if len(extra) > 10 else ''}")
+
+    gaps_file = Path(args.gaps_file) if args.gaps_file else dest / "missing_ids.txt"
+    if gaps:
+        gaps_file.write_text("".join(f"{jid}\n" for jid in gaps), encoding="utf-8")
+        print(f"✔ missing ids → {gaps_file}  (rerun: python dbd_web_scraping.py --ids-file {gaps_file})")
+        rc = 1
+    else:
+        if gaps_file.exists():
+            gaps_file.unlink()
+        print("✅ ครบทุกรหัส")
+    sys.exit(rc)
+
+
+if __name__ == "__main__":
+    main()
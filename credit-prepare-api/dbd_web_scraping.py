@@ -12,24 +12,52 @@
 import argparse
 import time
 import json
+from contextlib import nullcontext
 from pathlib import Path
 from typing import List, Optional
-import re
 
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver import ChromeOptions
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+from services.sharding import describe as describe_shard, select_shard, shard_arg
+from services.title_card import SNAPSHOT_JS as TITLE_CARD_SNAPSHOT_JS, parse_title_card
+from services import web_waits as waits
+from services.web_waits import TIMEOUTS, js_in_source, js_present_xpath, js_visible_css, js_visible_xpath
+from services.net_stats import NetMeter, enable_perf_log
+from services.driver_supervisor import DriverSupervisor
+from services.rate_limiter import BlockedError, add_rate_args, open_limiter
+
 
 # ============================================================
 # Utilities
 # ============================================================
 
-def make_driver(download_dir: Path, headless: bool = False) -> webdriver.Chrome:
+# --lean: resource ที่ flow ดาวน์โหลดรายงานไม่ต้องใช้ (CDP Network.setBlockedURLs, wildcard *)
+LEAN_BLOCKED_URLS = [
+    # images
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    # fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # media
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav",
+    # analytics / trackers
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*facebook.com/tr*", "*connect.facebook.*", "*hotjar.com*", "*clarity.ms*",
+    "*truehits.net*", "*analytics.tiktok.com*", "*line-scdn.net/*tag*",
+]
+LEAN_WINDOW = "1280,800"
+
+
+def make_driver(download_dir: Path, headless: bool = False, lean: bool = False, net_stats: bool = False) -> webdriver.Chrome:
+    """
+    lean: ไม่โหลดรูป/ฟอนต์/มีเดีย/tracker (LEAN_BLOCKED_URLS), ปิด extension, headless ใช้หน้าต่าง LEAN_WINDOW
+    net_stats: เปิด performance log สำหรับ NetMeter (bandwidth / จำนวน request ต่อบริษัท)
+    """
     opts = ChromeOptions()
 
     # คง session/cookies เดิมเพื่อความเสถียร
@@ -53,14 +81,22 @@ def make_driver(download_dir: Path, headless: bool = False) -> webdriver.Chrome:
     opts.add_argument("--disable-dev-shm-usage")
     opts.add_argument("--disable-notifications")
     opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_argument("--start-maximized")
+    if not (lean and headless):
+        opts.add_argument("--start-maximized")
     opts.add_argument("--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     opts.add_argument("accept-language=th-TH,th;q=0.9,en-US;q=0.8,en;q=0.7")
 
     if headless:
         # หากถูกบล็อกง่าย ให้พิจารณาไม่ใช้ headless
         opts.add_argument("--headless=new")
-        opts.add_argument("--window-size=1920,1080")
+        opts.add_argument(f"--window-size={LEAN_WINDOW if lean else '1920,1080'}")
+
+    if lean:
+        opts.add_argument("--disable-extensions")
+        opts.add_argument("--disable-component-extensions-with-background-pages")
+        opts.add_argument("--mute-audio")
+    if net_stats:
+        enable_perf_log(opts)
 
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
     # ตั้งค่าเส้นทางดาวน์โหลดสำหรับบางเวอร์ชัน
@@ -68,6 +104,12 @@ def make_driver(download_dir: Path, headless: bool = False) -> webdriver.Chrome:
         driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": str(download_dir)})
     except Exception:
         pass
+    if lean:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+        except Exception as e:
+            print(f"[warn] lean: Network.setBlockedURLs ไม่สำเร็จ ({e}) — โหลด resource ตามปกติ")
     return driver
 
 
@@ -84,35 +126,74 @@ def save_debug(driver, tag: str, out_dir: Path):
         pass
 
 
-def try_close_popups(driver, loops=2):
-    """ปิด popup หรือ dialog ที่ขวาง"""
-    for _ in range(loops):
-        for xp in [
-            "//button[normalize-space()='ปิด']",
-            "//button[contains(.,'ยอมรับ')]",
-            "//button[contains(.,'ตกลง')]",
-            "//div[contains(@class,'modal')]//button",
-        ]:
-            try:
-                for el in driver.find_elements(By.XPATH, xp):
-                    if el.is_displayed():
-                        driver.execute_script("arguments[0].click();", el)
-                        time.sleep(0.2)
-            except Exception:
-                pass
-
-
-def wait_for_downloads(folder: Path, before_set: set, timeout=120) -> Path:
+# หน้าที่แปลว่าเว็บปฏิเสธ / ขอ CAPTCHA / ล่ม (ตรวจตอนเกิด error ก่อน save_debug) → limiter ชะลอทุก worker
+BLOCK_MARKERS = (
+    "captcha",
+    "access denied",
+    "request rejected",
+    "the requested url was rejected",
+    "your support id is",
+    "too many requests",
+    "403 forbidden",
+    "attention required",
+    "checking your browser",
+    "service unavailable",
+    "bad gateway",
+    "gateway time-out",
+    "gateway timeout",
+    "ระบบไม่สามารถให้บริการ",
+)
+_PAGE_TEXT_JS = """
+const captcha = !!document.querySelector("iframe[src*='captcha'], .g-recaptcha, .h-captcha, #captcha");
+const body = (document.body && document.body.innerText) || '';
+return (captcha ? 'captcha\\n' : '') + (document.title || '') + '\\n' + body.slice(0, 3000);
+"""
+
+
+def block_reason(driver) -> Optional[str]:
+    """ข้อความที่บอกว่าหน้าปัจจุบันถูกปฏิเสธ/ขอ CAPTCHA/ล่ม หรือ None"""
+    try:
+        text = (driver.execute_script(_PAGE_TEXT_JS) or "").lower()
+    except Exception:
+        return None
+    return next((m for m in BLOCK_MARKERS if m in text), None)
+
+
+POPUP_XPATHS = [
+    "//button[normalize-space()='ปิด']",
+    "//button[contains(.,'ยอมรับ')]",
+    "//button[contains(.,'ตกลง')]",
+    "//div[contains(@class,'modal')]//button",
+]
+
+PAGE_READY = {"ready": "document.readyState !== 'loading' && !!document.body"}
+COMPANY_PAGE_XPATH = "//*[contains(.,'ข้อมูลนิติบุคคล')]"
+
+
+def try_close_popups(driver):
+    """ปิด popup หรือ dialog ที่ขวาง แล้วรอจนไม่มี popup ใหม่โผล่ (MutationObserver)"""
+    try:
+        waits.dismiss_popups(driver, POPUP_XPATHS)
+    except Exception as e:
+        print(f"[warn] popups: {e}")
+
+
+def scroll_into_view(driver, el):
+    driver.execute_script("arguments[0].scrollIntoView({block:'center', behavior:'instant'});", el)
+
+
+def wait_for_downloads(folder: Path, before_set: set, timeout=120, name: str = "download") -> Path:
     """รอให้ไฟล์ใหม่ถูกดาวน์โหลด"""
-    end = time.time() + timeout
-    while time.time() < end:
-        after = set(folder.glob("*"))
-        new = [p for p in after - before_set if p.exists() and not p.name.endswith(".crdownload")]
-        new = [p for p in new if not p.name.lower().endswith(".html")]
-        if new:
-            return sorted(new, key=lambda p: p.stat().st_mtime)[-1]
-        time.sleep(0.5)
-    raise TimeoutError("รอโหลดไฟล์ไม่ทันเวลา")
+    with waits.timed(name):
+        end = time.time() + timeout
+        while time.time() < end:
+            after = set(folder.glob("*"))
+            new = [p for p in after - before_set if p.exists() and not p.name.endswith(".crdownload")]
+            new = [p for p in new if not p.name.lower().endswith(".html")]
+            if new:
+                return sorted(new, key=lambda p: p.stat().st_mtime)[-1]
+            time.sleep(0.25)
+        raise TimeoutError("รอโหลดไฟล์ไม่ทันเวลา")
 
 
 # ============================================================
@@ -123,21 +204,21 @@ def search_by_juristic_id(driver, juristic_id: str):
     """โหลดหน้า index หนึ่งครั้ง แล้วค้นหาบริษัทแรกด้วยวิธีเดิม"""
     print(f"กำลังค้นหาเลขนิติบุคคล: {juristic_id}")
     driver.get("https://datawarehouse.dbd.go.th/index")
-    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-    time.sleep(1)
+    waits.wait_any(driver, PAGE_READY, TIMEOUTS.page, "index_ready")
     try_close_popups(driver)
 
-    search_box = WebDriverWait(driver, 15).until(
-        EC.visibility_of_element_located((By.XPATH, "//input[@type='text' and contains(@placeholder,'ค้นหา')]"))
+    search_box = waits.wait_until(
+        driver,
+        EC.visibility_of_element_located((By.XPATH, "//input[@type='text' and contains(@placeholder,'ค้นหา')]")),
+        TIMEOUTS.element, "search_box",
     )
     search_box.clear()
     search_box.send_keys(juristic_id)
-    time.sleep(0.3)
+    # รอให้ค่าลงช่องค้นหาครบก่อนกด Enter
+    waits.wait_until(driver, lambda d: search_box.get_attribute("value") == juristic_id, TIMEOUTS.element, "search_typed")
     search_box.send_keys(u"\ue007")  # Enter
 
-    WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//*[contains(.,'ข้อมูลนิติบุคคล')]"))
-    )
+    waits.wait_any(driver, {"company": js_present_xpath(COMPANY_PAGE_XPATH)}, TIMEOUTS.page, "company_page")
     print("พบหน้าข้อมูลนิติบุคคล")
 
 
@@ -150,10 +231,9 @@ def search_via_header_input(driver, juristic_id: str, out_dir: Path):
 
     # บางครั้ง input อยู่บนสุดของหน้า
     driver.execute_script("window.scrollTo(0, 0);")
-    time.sleep(0.3)
 
-    inp = WebDriverWait(driver, 20).until(
-        EC.visibility_of_element_located((By.CSS_SELECTOR, "input#textSearch"))
+    inp = waits.wait_until(
+        driver, EC.visibility_of_element_located((By.CSS_SELECTOR, "input#textSearch")), TIMEOUTS.element, "header_search"
     )
 
     # เคลียร์ค่าเดิม + ใส่ค่าใหม่ผ่าน JS เพื่อเลี่ยงปัญหา send_keys
@@ -173,14 +253,14 @@ def search_via_header_input(driver, juristic_id: str, out_dir: Path):
     except Exception:
         inp.send_keys(u"\ue007")
 
-    # รอให้เนื้อหาใหม่โหลด (ดูจากข้อความและมีรหัสที่ขอใน source)
-    WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//*[contains(.,'ข้อมูลนิติบุคคล')]"))
+    # รอให้เนื้อหาใหม่โหลด (ดูจากข้อความและมีรหัสที่ขอใน source) — ตรวจใน browser รอบละครั้ง
+    waits.wait_any(
+        driver,
+        {"company": f"{js_present_xpath(COMPANY_PAGE_XPATH)} && {js_in_source(juristic_id)}"},
+        TIMEOUTS.page, "company_page",
     )
-    WebDriverWait(driver, 30).until(lambda d: juristic_id in d.page_source)
 
     try_close_popups(driver)
-    time.sleep(0.5)
     print(f"เปลี่ยนบริษัทสำเร็จ -> {juristic_id}")
 
 
@@ -188,135 +268,24 @@ def scrape_company_title_card(driver, out_dir: Path, juristic_id: str) -> Path:
     """
     หา card 'ข้อมูลนิติบุคคล' แล้วดึงคู่ label/value ภายใน .row
     + ดึง company_name / registration_no จาก .cac-certified
+    ดึง HTML ทั้งหมดด้วย execute_script ครั้งเดียว แล้ว parse ในเครื่อง (services/title_card.py)
     คืน path ของไฟล์ JSON ที่บันทึก
     """
     
     try_close_popups(driver)
-    # เลื่อนให้เห็นการ์ด
     try:
-        el_title = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//h5[contains(@class,'card-title')][contains(.,'ข้อมูลนิติบุคคล')]"))
+        el_title = waits.wait_until(
+            driver,
+            EC.presence_of_element_located((By.XPATH, "//h5[contains(@class,'card-title')][contains(.,'ข้อมูลนิติบุคคล')]")),
+            TIMEOUTS.element, "title_card",
         )
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el_title)
-        time.sleep(0.3)
     except Exception:
         save_debug(driver, "company_title_not_found", out_dir)
         raise RuntimeError("ไม่พบการ์ด 'ข้อมูลนิติบุคคล'")
 
-    def norm_txt(s: str) -> str:
-        return " ".join((s or "").replace("\xa0", " ").split()).strip()
-
-    # ---------- ดึงจาก .cac-certified (ชื่อบริษัท + เลขทะเบียน) ----------
-    company_name = None
-    registration_no = None
-    try:
-        cac = driver.find_element(By.CSS_SELECTOR, ".cac-certified")
-        try:
-            h3 = cac.find_element(By.CSS_SELECTOR, "h3")
-            name_txt = norm_txt(h3.text)
-            # ตัด prefix "ชื่อนิติบุคคล :" (เผื่อมีสเปซ/โคลอนหลายแบบ)
-            company_name = re.sub(r"^\s*ชื่อนิติบุคคล\s*[:：]\s*", "", name_txt)
-            company_name = company_name or None
-        except Exception:
-            pass
-
-        try:
-            h4 = cac.find_element(By.CSS_SELECTOR, "h4")
-            reg_txt = norm_txt(h4.text)
-            # ตัด prefix
-            reg_txt = re.sub(r"^\s*เลขทะเบียนนิติบุคคล\s*[:：]\s*", "", reg_txt)
-            # เก็บเฉพาะเลข (รองรับมีขีด/ช่องว่าง)
-            m = re.search(r"(\d{10,20})", re.sub(r"[^\d]", "", reg_txt))
-            if m:
-                registration_no = m.group(1)
-        except Exception:
-            pass
-    except Exception:
-        # ไม่มีบล็อก .cac-certified ก็ข้ามได้
-        pass
-
-    card = driver.find_element(
-        By.XPATH,
-        "//h5[contains(@class,'card-title')][contains(.,'ข้อมูลนิติบุคคล')]/ancestor::div[contains(@class,'card-infos')]"
-    )
-    rows = card.find_elements(By.CSS_SELECTOR, ".card-body .row .col-6")
-
-    MONTHS_TH = {
-        "ม.ค.": 1, "ก.พ.": 2, "มี.ค.": 3, "เม.ย.": 4, "พ.ค.": 5, "มิ.ย.": 6,
-        "ก.ค.": 7, "ส.ค.": 8, "ก.ย.": 9, "ต.ค.": 10, "พ.ย.": 11, "ธ.ค.": 12
-    }
-
-    def thai_date_to_iso(date_text: str) -> Optional[str]:
-        try:
-            parts = date_text.strip().split()
-            if len(parts) != 3:
-                return None
-            day = int(parts[0])
-            month_th = parts[1]
-            year_th = int(parts[2])
-            month = MONTHS_TH.get(month_th)
-            if not month:
-                return None
-            year = year_th - 543 if year_th > 2400 else year_th
-            return f"{year:04d}-{month:02d}-{day:02d}"
-        except Exception:
-            return None
-
-    data = {
-        "company_name": company_name,          
-        "registration_no": registration_no,    
-        "entity_type": None,
-        "entity_status": None,
-        "incorporation_date_th_text": None,
-        "registered_date": None,  # YYYY-MM-DD
-        "registered_capital_text": None,
-        "old_registration_no": None,
-        "business_group": None,
-        "business_size": None,
-        "financial_filing_years_th": [],
-        "head_office_address": None,
-        "website": None,
-    }
-
-    i = 0
-    while i < len(rows) - 1:
-        label = norm_txt(rows[i].text)
-        value_el = rows[i + 1]
-
-        if "ปีที่ส่งงบการเงิน" in label:
-            yrs = []
-            spans = value_el.find_elements(By.CSS_SELECTOR, ".tab1fiscal")
-            if spans:
-                for sp in spans:
-                    yrs.append((sp.get_attribute("title") or norm_txt(sp.text)))
-            else:
-                yrs = [y for y in norm_txt(value_el.text).split() if y.isdigit()]
-            data["financial_filing_years_th"] = [y for y in yrs if y]
-            i += 2
-            continue
-
-        val = norm_txt(value_el.text)
-
-        if label == "ประเภทนิติบุคคล":
-            data["entity_type"] = val or None
-        elif label == "สถานะนิติบุคคล":
-            data["entity_status"] = val or None
-        elif label == "วันที่จดทะเบียนจัดตั้ง":
-            data["incorporation_date_th_text"] = val or None
-            data["registered_date"] = thai_date_to_iso(val)
-        elif label == "ทุนจดทะเบียน":
-            data["registered_capital_text"] = val or None
-        elif label == "เลขทะเบียนเดิม":
-            data["old_registration_no"] = val or None
-        elif label == "กลุ่มธุรกิจ":
-            data["business_group"] = val or None
-        elif label == "ขนาดธุรกิจ":
-            data["business_size"] = val or None
-        elif label == "ที่ตั้งสำนักงานแห่งใหญ่":
-            data["head_office_address"] = val or None
-        elif label == "Website":
-            data["website"] = (val if val and val != "-" else None)
-        i += 2
+    # เลื่อนให้เห็นการ์ด + snapshot outerHTML ใน round-trip เดียว
+    html = driver.execute_script(TITLE_CARD_SNAPSHOT_JS, el_title)
+    data = parse_title_card(html or "")
 
     out_path = out_dir / f"{juristic_id}_company_title.json"
     out_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -327,13 +296,12 @@ def scrape_company_title_card(driver, out_dir: Path, juristic_id: str) -> Path:
 
 def download_company_info_pdf(driver, juristic_id: str, out_dir: Path) -> Path:
     print("กำลังดาวน์โหลด PDF ข้อมูลนิติบุคคล...")
-    try_close_popups(driver, loops=2)
+    try_close_popups(driver)
 
     before = set(out_dir.glob("*"))
     try:
-        btn = WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.ID, "printProfile")))
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
-        time.sleep(0.3)
+        btn = waits.wait_until(driver, EC.element_to_be_clickable((By.ID, "printProfile")), TIMEOUTS.element, "print_button")
+        scroll_into_view(driver, btn)
         btn.click()
     except Exception:
         save_debug(driver, "printProfile_not_found", out_dir)
@@ -341,7 +309,7 @@ def download_company_info_pdf(driver, juristic_id: str, out_dir: Path) -> Path:
 
     print("รอดาวน์โหลดไฟล์ PDF...")
     try:
-        pdf_file = wait_for_downloads(out_dir, before, timeout=120)
+        pdf_file = wait_for_downloads(out_dir, before, timeout=TIMEOUTS.pdf, name="pdf_download")
     except TimeoutError:
         print("ไม่พบไฟล์ PDF ที่ดาวน์โหลด")
         save_debug(driver, "pdf_timeout", out_dir)
@@ -362,75 +330,79 @@ def download_company_info_pdf(driver, juristic_id: str, out_dir: Path) -> Path:
     return pdf_file
 
 
+FIN_TAB_XPATHS = [
+    "//a[contains(@href,'#tab22') or contains(@href,'#tab_financial')]",
+    "//a[contains(.,'งบการเงิน') and not(contains(@href,'#'))]",
+    "//button[contains(.,'งบการเงิน')]",
+    "//li[contains(@class,'dropdown')]//*[contains(.,'งบการเงิน')]",
+    "//*[contains(text(),'งบการเงิน') and (self::a or self::span or self::div)]",
+]
+
+# ตามลำดับความสำคัญ: มีเมนูรายงาน > "ไม่พบข้อมูล" > มี popup บัง (ปิดแล้วรอต่อ)
+FIN_STATES = {
+    "menu": js_visible_css(".finMenu"),
+    "empty": js_visible_xpath("//div[contains(@class,'card-infos')]//h3[normalize-space()='ไม่พบข้อมูล']"),
+    "popup": " || ".join(js_visible_xpath(xp) for xp in POPUP_XPATHS),
+}
+
+_CLICK_FIRST_VISIBLE_JS = """
+const r = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (let i = 0; i < r.snapshotLength; i++) {
+  const el = r.snapshotItem(i);
+  if (el.offsetWidth || el.offsetHeight || el.getClientRects().length) {
+    el.scrollIntoView({block: 'center', behavior: 'instant'});
+    el.click();
+    return true;
+  }
+}
+return false;
+"""
+
+
+def _wait_financial_state(driver, timeout: float) -> Optional[str]:
+    """รอ menu / empty; ระหว่างรอถ้ามี popup โผล่ → ปิดแล้วรอต่อ"""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        state = waits.wait_any(driver, FIN_STATES, remaining, "financial_state", raise_on_timeout=False)
+        if state != "popup":
+            return state
+        try_close_popups(driver)
+
+
 def go_financial_tab(driver, out_dir: Path) -> str:
     """
     เปิดแท็บ 'ข้อมูลงบการเงิน' แล้วรอหนึ่งในสองสภาวะ:
       1) พบเมนูรายงาน (.finMenu) -> คืนค่า 'menu'
       2) พบข้อความ 'ไม่พบข้อมูล' ใน card-infos -> คืนค่า 'empty'
     ถ้าไม่เจอทั้งคู่ภายในเวลา -> error
+    คลิกตัวเลือกแท็บทีละแบบ (FIN_TAB_XPATHS) จนกว่าจะเกิดสภาวะใดสภาวะหนึ่ง
     """
     print("กำลังเปิดแท็บข้อมูลงบการเงิน...")
     try_close_popups(driver)
-    time.sleep(0.8)
 
     # scroll ให้แท็บโผล่
     driver.execute_script("window.scrollTo(0, 600);")
-    time.sleep(0.8)
-
-    # ลองคลิกเข้า "งบการเงิน"
-    patterns = [
-        "//a[contains(@href,'#tab22') or contains(@href,'#tab_financial')]",
-        "//a[contains(.,'งบการเงิน') and not(contains(@href,'#'))]",
-        "//button[contains(.,'งบการเงิน')]",
-        "//li[contains(@class,'dropdown')]//*[contains(.,'งบการเงิน')]",
-        "//*[contains(text(),'งบการเงิน') and (self::a or self::span or self::div)]"
-    ]
-    for xp in patterns:
-        try:
-            els = driver.find_elements(By.XPATH, xp)
-            for el in els:
-                if el.is_displayed():
-                    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
-                    time.sleep(0.3)
-                    try:
-                        el.click()
-                    except Exception:
-                        driver.execute_script("arguments[0].click();", el)
-                    time.sleep(1.2)
-                    break
-        except Exception:
-            continue
-
-    # รอเงื่อนไขอย่างใดอย่างหนึ่งเกิดขึ้น
-    deadline = time.time() + 20  # วินาที
-    found_menu = False
-    found_empty = False
-
-    while time.time() < deadline:
-        try_close_popups(driver, loops=1)
-
-        # เงื่อนไข 1: มีเมนูรายงาน (.finMenu)
-        try:
-            menus = driver.find_elements(By.CSS_SELECTOR, ".finMenu")
-            if any(m.is_displayed() for m in menus):
-                found_menu = True
-        except Exception:
-            pass
 
-        # เงื่อนไข 2: มีแถบข้อความไม่พบข้อมูล ใน card-infos ของงบการเงิน
+    deadline = time.monotonic() + TIMEOUTS.tab
+    state = None
+    for xp in FIN_TAB_XPATHS:
         try:
-            empties = driver.find_elements(
-                By.XPATH,
-                "//div[contains(@class,'card-infos')]//h3[normalize-space()='ไม่พบข้อมูล']"
-            )
-            if any(e.is_displayed() for e in empties):
-                found_empty = True
+            clicked = driver.execute_script(_CLICK_FIRST_VISIBLE_JS, xp)
         except Exception:
-            pass
-
-        if found_menu or found_empty:
+            continue
+        if not clicked:
+            continue
+        state = _wait_financial_state(driver, min(TIMEOUTS.tab_click, deadline - time.monotonic()))
+        if state:
             break
-        time.sleep(0.5)
+    if state is None:
+        state = _wait_financial_state(driver, deadline - time.monotonic())
+
+    found_menu = state == "menu"
+    found_empty = state == "empty"
 
     if found_menu:
         print("เนื้อหางบการเงินโหลดสำเร็จ (มี .finMenu)")
@@ -441,33 +413,40 @@ def go_financial_tab(driver, out_dir: Path) -> str:
         return "empty"
 
     save_debug(driver, "financial_content_timeout", out_dir)
-    raise RuntimeError("แท็บงบการเงินเปิดแล้ว แต่ไม่พบทั้งเมนูและ 'ไม่พบข้อมูล'")
+    # TimeoutException → rate limiter นับเป็นเว็บช้า (ชะลอ)
+    raise TimeoutException("แท็บงบการเงินเปิดแล้ว แต่ไม่พบทั้งเมนูและ 'ไม่พบข้อมูล'")
 
 
 def switch_report(driver, lang_key: str):
-    btn = WebDriverWait(driver, 15).until(
-        EC.element_to_be_clickable((By.CSS_SELECTOR, f".finMenu[lang='{lang_key}']"))
+    btn = waits.wait_until(
+        driver, EC.element_to_be_clickable((By.CSS_SELECTOR, f".finMenu[lang='{lang_key}']")), TIMEOUTS.element, "report_menu"
     )
-    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
+    scroll_into_view(driver, btn)
     btn.click()
-    WebDriverWait(driver, 10).until(
-        lambda d: "active" in d.find_element(By.CSS_SELECTOR, f".finMenu[lang='{lang_key}']").get_attribute("class")
+    waits.wait_any(
+        driver,
+        {"active": f"Array.from(document.querySelectorAll(\".finMenu[lang='{lang_key}']\")).some(el => el.classList.contains('active'))"},
+        TIMEOUTS.report, "report_active",
     )
 
 
 def click_excel(driver, out_dir: Path) -> Path:
-    toggle = WebDriverWait(driver, 15).until(
-        EC.element_to_be_clickable((By.XPATH, "//div[contains(@class,'dropdown') and contains(@class,'print')]//a"))
+    toggle = waits.wait_until(
+        driver,
+        EC.element_to_be_clickable((By.XPATH, "//div[contains(@class,'dropdown') and contains(@class,'print')]//a")),
+        TIMEOUTS.element, "excel_toggle",
     )
-    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", toggle)
+    scroll_into_view(driver, toggle)
     toggle.click()
-    menu = WebDriverWait(driver, 10).until(
-        EC.visibility_of_element_located((By.XPATH, "//ul[contains(@class,'dropdown-menu') and (contains(@class,'show') or contains(@style,'display: block'))]"))
+    menu = waits.wait_until(
+        driver,
+        EC.visibility_of_element_located((By.XPATH, "//ul[contains(@class,'dropdown-menu') and (contains(@class,'show') or contains(@style,'display: block'))]")),
+        TIMEOUTS.report, "excel_menu",
     )
     link = menu.find_element(By.XPATH, ".//a[@id='finXLS']")
     before = set(out_dir.glob("*"))
     link.click()
-    file = wait_for_downloads(out_dir, before, timeout=180)
+    file = wait_for_downloads(out_dir, before, timeout=TIMEOUTS.xls, name="xls_download")
     return file
 
 
@@ -561,6 +540,25 @@ def run_for_one_company(driver, out_dir: Path, juristic_id: str):
     print("-" * 60)
 
 
+def scrape_one(driver, out_dir: Path, juristic_id: str, fresh: bool):
+    """
+    ค้นหา + ดาวน์โหลดของบริษัทเดียว
+    fresh=True (driver ใหม่ / หลัง error): โหลดหน้า index แล้วค้นหา; ไม่งั้นใช้ช่องค้นหาเดิมบนหน้า
+    """
+    try:
+        if fresh:
+            search_by_juristic_id(driver, juristic_id)
+        else:
+            search_via_header_input(driver, juristic_id, out_dir)
+        run_for_one_company(driver, out_dir, juristic_id)
+    except Exception as e:
+        reason = block_reason(driver)
+        save_debug(driver, f"{'blocked' if reason else 'error'}_{juristic_id}", out_dir)
+        if reason:
+            raise BlockedError(f"blocked page ({reason})") from e
+        raise
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--juristic-id", help="รหัสเดียว")
@@ -568,40 +566,90 @@ def main():
     ap.add_argument("--ids-file", help="ระบุไฟล์ .txt ที่มีรายชื่อ juristic id บรรทัดละหนึ่งตัว")
     ap.add_argument("--out-dir", default="./downloads")
     ap.add_argument("--headless", action="store_true")
+    ap.add_argument("--lean", action="store_true",
+                    help="ไม่โหลดรูป/ฟอนต์/มีเดีย/tracker, ปิด extension, หน้าต่างเล็กลงเมื่อ headless")
+    ap.add_argument("--net-stats", action="store_true",
+                    help="วัด bandwidth / จำนวน request / เวลา ต่อบริษัท (ใช้เทียบก่อน-หลัง --lean)")
+    ap.add_argument("--recycle-every", type=int, default=100, help="เปิด Chrome ใหม่ทุก N บริษัท (0 = ไม่ใช้)")
+    ap.add_argument("--max-rss-mb", type=float, default=2500, help="เปิด Chrome ใหม่เมื่อหน่วยความจำรวมเกิน (MB, 0 = ไม่ตรวจ)")
+    ap.add_argument("--max-failures", type=int, default=3, help="เปิด Chrome ใหม่เมื่อพลาดติดกันครบจำนวนนี้")
+    ap.add_argument("--retries", type=int, default=1, help="ลองซ้ำต่อบริษัทเมื่อพลาด (เริ่มจากหน้า index ใหม่)")
+    ap.add_argument("--shard", type=shard_arg, default=None,
+                    help="i/N: ทำเฉพาะส่วนที่ i จาก N (แบ่งด้วย hash ของรหัส) สำหรับรันหลายเครื่อง แล้วรวมด้วย dbd_shard_merge.py")
+    add_rate_args(ap)
     args = ap.parse_args()
 
     out_dir = Path(args.out_dir)
     out_dir.mkdir(exist_ok=True, parents=True)
 
-    ids = parse_ids(args)
+    all_ids = parse_ids(args)
+    ids = select_shard(all_ids, args.shard)
 
     print("=" * 60)
     print("DBD Financial Scraper (Auto PDF + 3 XLS + Company Title JSON)")
+    print(describe_shard(args.shard, len(ids), len(all_ids)))
     print("=" * 60)
+    if not ids:
+        print("ไม่มีรหัสใน shard นี้")
+        return
 
-    driver = make_driver(out_dir, headless=args.headless)
-    try:
-        # บริษัทแรก: โหลดหน้าและค้นหาด้วยวิธีเดิม
-        first_id = ids[0]
-        search_by_juristic_id(driver, first_id)
-        run_for_one_company(driver, out_dir, first_id)
+    meter = NetMeter(None) if args.net_stats else None
+    sup = DriverSupervisor(
+        lambda: make_driver(out_dir, headless=args.headless, lean=args.lean, net_stats=args.net_stats),
+        recycle_every=args.recycle_every,
+        max_rss_mb=args.max_rss_mb or None,
+        max_failures=args.max_failures,
+        on_restart=(lambda d: setattr(meter, "driver", d)) if meter else None,
+    )
 
+    def one(jid: str):
+        def fn(driver, fresh: bool):
+            if meter:
+                meter.begin()
+            scrape_one(driver, out_dir, jid, fresh)
+            if meter:
+                meter.end(jid)
+        return fn
+
+    # token bucket ร่วมกับ scraper ตัวอื่นบนเครื่อง (pipeline / shard อื่น) ผ่าน --rate-db
+    limiter = open_limiter(args)
+    failed: List[str] = []
+    try:
+        # บริษัทแรก (และหลัง restart/error): โหลดหน้าและค้นหาด้วยวิธีเดิม
         # ตัวถัดไป: ใช้ input เดิม ไม่ต้องเข้าเว็บใหม่
-        for jid in ids[1:]:
-            driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(0.3)
-            search_via_header_input(driver, jid, out_dir)
-            run_for_one_company(driver, out_dir, jid)
+        for n, jid in enumerate(ids, start=1):
+            for attempt in range(1 + max(0, args.retries)):
+                try:
+                    with limiter.request() if limiter else nullcontext():
+                        sup.run(jid, one(jid))
+                    break
+                except Exception as e:
+                    print(f"❌ [{n}/{len(ids)}] {jid} (attempt {attempt + 1}): {e}")
+            else:
+                failed.append(jid)
 
         print("=" * 60)
-        print("งานครบทุกบริษัทแล้ว")
+        print("งานครบทุกบริษัทแล้ว" if not failed else f"งานครบทุกบริษัทแล้ว (ล้มเหลว {len(failed)} รหัส)")
         print("=" * 60)
 
     except Exception as e:
         print(f"\nเกิดข้อผิดพลาด: {e}")
-        save_debug(driver, "final_error", out_dir)
+        if sup.current is not None:
+            save_debug(sup.current, "final_error", out_dir)
     finally:
-        driver.quit()
+        print(waits.summary())
+        print(sup.summary())
+        if meter and meter.results:
+            print(meter.summary())
+        if limiter:
+            print(limiter.describe())
+            limiter.close()
+        sup.close()
+
+    if failed:
+        fail_path = out_dir / "failed_ids.txt"
+        fail_path.write_text("".join(f"{jid}\n" for jid in failed), encoding="utf-8")
+        print(f"รหัสที่ล้มเหลว → {fail_path} (รันซ้ำด้วย --ids-file {fail_path})")
 
 
 if __name__ == "__main__":
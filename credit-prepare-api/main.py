@@ -1,4 +1,9 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from services.bs_processor import process_bs_statements
 from services.ic_processor import process_ic_statements
 # from services.po_processor import load_po_data, save_po_json
@@ -7,6 +12,9 @@ from services.supplier_processor import load_supplier_data, save_supplier_json
 
 from services.inv_old_processor import load_old_invoice_data, save_old_inv_json
 from services.po_old_processor import load_old_po_data, save_old_po_json
+from services.sent_ledger import SentLedger
+from services.delta import diff_rows, commit_delta
+from services.upload_jobs import batch_dir, check_file, iter_results, safe_filename, save_stream, shutdown_pool, submit
 
 # from services.scraper import scrape_company_by_id
 import requests
@@ -17,65 +25,117 @@ from dotenv import load_dotenv
 load_dotenv()
 API_BASE = os.getenv("API_BASE", "")
 API_HEADERS = {"Content-Type": "application/json"}
+# snapshot hash ของแถวที่ส่งแล้ว (/process-bs, /process-ic ส่งเฉพาะแถวที่เปลี่ยน; ?full=true ส่งทั้งหมด)
+SENT_LEDGER_DB = os.getenv("SENT_LEDGER_DB", "./processed_data/sent_ledger.sqlite")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_pool()  # process pool ของ /upload/...
+
 
 app = FastAPI(
     title="Credit Scoring Preparing API",
     description="API สำหรับประมวลผลข้อมูลงบการเงิน (BS/IC) และส่งไป API ปลายทาง",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Credit Scoring Preparing API"}
 
+def _publish(result: dict, path: str, label: str, full: bool):
+    """ส่งเฉพาะแถว (company_id, year) ที่เปลี่ยนจากครั้งที่ส่งสำเร็จล่าสุด; full=True ส่งทุกแถว"""
+    processed_df = result["data"]
+    endpoint = f"{API_BASE}{path}"
+    ledger = SentLedger(SENT_LEDGER_DB)
+    try:
+        delta = diff_rows(processed_df, ["company_id", "year"], ledger, endpoint, full=full)
+        if delta.rows.empty:
+            return {"message": f"{label} processed, nothing changed", "rows": len(processed_df), **delta.counts(), "bytes": 0}
+
+        json_data = delta.rows.to_json(orient='records')
+        response = requests.post(endpoint, headers=API_HEADERS, data=json_data)
+        response.raise_for_status()
+        commit_delta(delta, ledger, endpoint)
+
+        return {
+            "message": f"{label} processed and sent",
+            "status_code": response.status_code,
+            "rows": len(processed_df),
+            **delta.counts(),
+            "bytes": len(json_data.encode("utf-8")),
+        }
+    except Exception as e:
+        return {"message": f"{label} processed but failed to send", "error": str(e)}
+    finally:
+        ledger.close()
+
+
 @app.post("/process-bs")
-def process_bs():
+def process_bs(full: bool = False):
     result = process_bs_statements()
     send_to_api = True
 
     if send_to_api and "data" in result:
-        try:
-            processed_df = result["data"]
-            json_data = processed_df.to_json(orient='records')
-            endpoint = f"{API_BASE}/api/public/bol-bs"
-
-            response = requests.post(endpoint, headers=API_HEADERS, data=json_data)
-            response.raise_for_status()
-
-            return {
-                "message": "BS processed and sent",
-                "status_code": response.status_code,
-                "rows": len(processed_df)
-            }
-        except Exception as e:
-            return {"message": "BS processed but failed to send", "error": str(e)}
+        return _publish(result, "/api/public/bol-bs", "BS", full)
     return result
 
 
 @app.post("/process-ic")
-def process_ic():
+def process_ic(full: bool = False):
     result = process_ic_statements()
     send_to_api = True
 
     if send_to_api and "data" in result:
-        try:
-            processed_df = result["data"]
-            json_data = processed_df.to_json(orient='records')
-            endpoint = f"{API_BASE}/api/public/bol-ic"
-
-            response = requests.post(endpoint, headers=API_HEADERS, data=json_data)
-            response.raise_for_status()
-
-            return {
-                "message": "IC processed and sent",
-                "status_code": response.status_code,
-                "rows": len(processed_df)
-            }
-        except Exception as e:
-            return {"message": "IC processed but failed to send", "error": str(e)}
+        return _publish(result, "/api/public/bol-ic", "IC", full)
     return result
 
 
+# ---------- uploads: บันทึกลงดิสก์ → process pool → ผลเป็น NDJSON ตามลำดับที่เสร็จ ---------- #
+
+async def _upload(kind: str, files: List[UploadFile], records: bool) -> StreamingResponse:
+    """ไฟล์อัปโหลดถูกคัดลอกลง raw_data/uploads/<kind>/<batch>/ ทีละ chunk ใน thread (ไม่บล็อก event loop)
+    แล้วแปลงบน process pool; response เป็น NDJSON หนึ่งบรรทัดต่อไฟล์ (records=true ส่งทุกแถวด้วย) + บรรทัดสรุป"""
+    folder = batch_dir(kind)
+    jobs, rejected = {}, {}
+    for f in files:
+        name = safe_filename(f.filename)
+        err = check_file(kind, name)
+        if err is None and name in jobs.values():
+            err = "duplicate file name in this upload"
+        if err:
+            rejected[name] = err
+            await f.close()
+            continue
+        dest = folder / name
+        await run_in_threadpool(save_stream, f.file, dest)
+        await f.close()
+        jobs[submit(kind, dest)] = name
+    return StreamingResponse(iter_results(jobs, rejected, records), media_type="application/x-ndjson")
+
+
+@app.post("/upload/invoice")
+async def upload_invoice(files: List[UploadFile] = File(...), records: bool = False):
+    return await _upload("invoice", files, records)
+
+
+@app.post("/upload/po-report")
+async def upload_po_report(files: List[UploadFile] = File(...), records: bool = False):
+    return await _upload("po-report", files, records)
+
+
+@app.post("/upload/remittance")
+async def upload_remittance(files: List[UploadFile] = File(...), records: bool = False):
+    return await _upload("remittance", files, records)
+
+
+@app.post("/upload/dbd")
+async def upload_dbd(files: List[UploadFile] = File(...), records: bool = False):
+    return await _upload("dbd", files, records)
+
+
 from datetime import datetime, timedelta
 
 def excel_serial_to_thai_date(serial: int) -> str:
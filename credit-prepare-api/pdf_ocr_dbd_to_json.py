@@ -3,15 +3,18 @@
 """
 pdf_ocr_dbd_to_json_v6_batch.py
 
-- Extract text from PDF (prefer pdfminer; fallback Tesseract OCR)
-- Save full JSON: <name>.json
+- Extract text from PDF (text layer via services/pdf_text: pdfminer by default, see tests/test_pdf_text_backends.py; fallback Tesseract OCR)
 - Save structured JSON (DBD table-aware + strong boundaries & tail-noise cleanup): <name>_structured.json
+- Save full JSON (<name>.json) only with --full-text / --text-only
+- OCR: parse ทีละหน้าระหว่าง OCR แล้วหยุดเมื่อได้ฟิลด์ที่ต้องใช้ครบ (REQUIRED_FIELDS) ไม่ต้อง OCR ทุกหน้า
+  (--no-early-exit เพื่อ OCR ทุกหน้า; --full-text / --text-only / --ocr-batch > 1 OCR ทุกหน้าเสมอ)
 - Merge downloads/<juristic_id>_company_title.json into structured (if present)
 - NEW: Batch mode — accept a file, a folder, or a glob pattern (e.g., downloads/*_company_info.pdf)
 
 Install:
-  pip install pdfminer.six pillow pytesseract pdf2image
+  pip install pypdfium2 pdfminer.six pytesseract opencv-python   # + tesserocr (optional, faster: engine stays loaded)
   # macOS: brew install tesseract poppler
+  # OCR หลายไฟล์ด้วย tesseract process เดียว: OCR_BACKEND=batch python pdf_ocr_dbd_to_json.py downloads --ocr-batch 50
 
 Usage:
   # 1) ไฟล์เดี่ยว
@@ -24,7 +27,7 @@ Usage:
   python pdf_ocr_dbd_to_json_v6_batch.py "downloads/*_company_info.pdf"
 
   # ตัวเลือกเพิ่มเติม (ใช้ได้กับทุกโหมด)
-  --lang tha+eng --dpi 300 --force-ocr --structured-only --text-only
+  --lang tha+eng --dpi auto|300 --force-ocr --full-text --text-only --no-early-exit
 """
 
 import argparse
@@ -35,54 +38,120 @@ import os
 import re
 import sys
 import glob
-from dataclasses import dataclass, asdict
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+
+from services.pdf_raster import dpi_arg
+from services.pdf_text import BACKENDS as TEXT_BACKENDS, extract_pages_text
+from services.sharding import describe as describe_shard, file_key, select_shard, shard_arg
 
 TESSERACT_CMD: Optional[str] = None  # set path on Windows if needed
+TEXT_BACKEND_DEFAULT = "pdfminer"  # engine เดิม: pdfium ให้ status ต่างออกไป (ดู KNOWN_DIFFERENCES ใน tests/test_pdf_text_backends.py)
 
 
 # ---------- PDF text layer ---------- #
-def extract_text_pdfminer(pdf_path: str) -> List[str]:
-    try:
-        from pdfminer_high_level import extract_pages  # type: ignore
-        from pdfminer.layout import LTTextContainer  # type: ignore
-    except Exception:
-        # บางเครื่องใช้ชื่อโมดูลเดิม
-        try:
-            from pdfminer.high_level import extract_pages  # type: ignore
-            from pdfminer.layout import LTTextContainer  # type: ignore
-        except Exception:
-            return []
-    pages = []
+def extract_text_layer(pdf_path: str, backend: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    ข้อความต่อหน้าจาก text layer (services/pdf_text; default pdfminer)
+    คืน ([], None) ถ้าอ่านไม่ได้หรือไม่มีข้อความเลย (PDF สแกน) → ไป OCR
+    """
     try:
-        for layout in extract_pages(pdf_path):
-            txt = "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
-            pages.append(txt.strip())
+        texts, used = extract_pages_text(pdf_path, backend, default=TEXT_BACKEND_DEFAULT)
     except Exception:
-        return []
-    return pages
+        return [], None
+    pages = [t.strip() for t in texts]
+    if not any(pages):
+        return [], None
+    return pages, used
 
 
 # ---------- OCR fallback ---------- #
-def ocr_pdf_with_tesseract(pdf_path: str, lang: str = "tha+eng", dpi: int = 300) -> List[str]:
+def _load_ocr():
     try:
-        from pdf2image import convert_from_path
-        import pytesseract
+        from services.ocr_engine import ocr_available, ocr_images_to_strings
+        from services.pdf_raster import render_pages
     except Exception as e:
-        raise RuntimeError("Need pdf2image/Pillow/pytesseract installed.") from e
+        raise RuntimeError("Need numpy/opencv-python, Poppler or pypdfium2, and tesserocr or pytesseract installed.") from e
+    if not ocr_available():
+        raise RuntimeError("Need numpy/opencv-python, Poppler or pypdfium2, and tesserocr or pytesseract installed.")
 
     if TESSERACT_CMD:
+        import pytesseract
         pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return render_pages, ocr_images_to_strings
+
 
+@dataclass
+class OCRPages:
+    texts: List[str]
+    dpi: Optional[int] = None
+    seconds: List[float] = field(default_factory=list)
+
+
+def ocr_pdf_with_tesseract(pdf_path: str, lang: str = "tha+eng", dpi: Any = "auto") -> List[str]:
+    return ocr_pdfs_with_tesseract([pdf_path], lang, dpi)[pdf_path].texts
+
+
+def ocr_pdfs_with_tesseract(pdf_paths: List[str], lang: str = "tha+eng", dpi: Any = "auto") -> Dict[str, OCRPages]:
+    """
+    OCR หลายไฟล์ในการเรียกครั้งเดียว (OCR_BACKEND=batch → tesseract process เดียวทั้งชุด)
+    dpi="auto" → เลือกต่อไฟล์จากความสูงตัวอักษร (ไม่เกิน 300)
+    คืน {pdf_path: OCRPages(texts ต่อหน้า, dpi, วินาทีต่อหน้า)}
+    """
+    render_pages, ocr_images_to_strings = _load_ocr()
+    from services.pdf_raster import resolve_dpi
+
+    counts: List[int] = []
+    dpis: List[int] = []
+
+    def _images():
+        for pdf_path in pdf_paths:
+            use_dpi = resolve_dpi(dpi, pdf_path, max_dpi=300)
+            # หน้า grayscale ทีละหน้า นับจำนวนหน้าระหว่าง yield (ไม่ถือทั้งไฟล์ไว้)
+            counts.append(0)
+            dpis.append(use_dpi)
+            try:
+                for gray in render_pages(pdf_path, use_dpi, "gray"):
+                    counts[-1] += 1
+                    yield gray
+            except RuntimeError as e:
+                raise RuntimeError("PDF->image failed. Install Poppler & add to PATH.") from e
+
+    timings: List[float] = []
+    texts = ocr_images_to_strings(_images(), lang=lang, timings=timings)
+
+    out: Dict[str, OCRPages] = {}
+    pos = 0
+    for pdf_path, n, use_dpi in zip(pdf_paths, counts, dpis):
+        out[pdf_path] = OCRPages(
+            texts=[t.strip() for t in texts[pos:pos + n]],
+            dpi=use_dpi,
+            seconds=[round(x, 3) for x in timings[pos:pos + n]],
+        )
+        pos += n
+    return out
+
+
+def ocr_pdf_pages(pdf_path: str, lang: str = "tha+eng", dpi: Any = "auto") -> Tuple[int, int, Iterator[Tuple[str, float]]]:
+    """
+    OCR ทีละหน้าแบบ lazy คืน (dpi, จำนวนหน้า, iterator ของ (text, seconds))
+    หน้าถัดไปถูก render/OCR เมื่อ caller ขอเท่านั้น → เลิกอ่าน iterator = ไม่ทำหน้าที่เหลือ (early exit)
+    """
+    render_pages, _ = _load_ocr()
+    from services.ocr_engine import iter_ocr_images
+    from services.pdf_raster import page_count, resolve_dpi
+
+    use_dpi = resolve_dpi(dpi, pdf_path, max_dpi=300)
     try:
-        images = convert_from_path(pdf_path, dpi=dpi)
+        total = page_count(pdf_path)
     except Exception as e:
         raise RuntimeError("PDF->image failed. Install Poppler & add to PATH.") from e
 
-    out = []
-    for img in images:
-        out.append(pytesseract.image_to_string(img, lang=lang).strip())
-    return out
+    def _images():
+        for pno in range(1, total + 1):
+            yield from render_pages(pdf_path, use_dpi, "gray", first_page=pno, last_page=pno)
+
+    return use_dpi, total, iter_ocr_images(_images(), lang=lang)
 
 
 # ---------- utils ---------- #
@@ -107,6 +176,7 @@ class PageResult:
     page: int
     text: str
     lines: List[str]
+    ocr_seconds: Optional[float] = None
 
 
 @dataclass
@@ -118,6 +188,7 @@ class OCRResult:
     engine: str
     num_pages: int
     pages: List[PageResult]
+    dpi: Optional[int] = None
 
 
 # ---------- helpers ---------- #
@@ -136,27 +207,18 @@ TAIL_NOISE_PAT = re.compile(r"[\d\s่-๋๊-ํ๎]+$")
 
 
 def _norm(ln: str) -> str:
-    return re.sub(r"\s+", " ", ln).strip(" /")
+    # เท่ากับ re.sub(r"\s+", " ", ln).strip(" /") แต่เร็วกว่า (str.split ใช้นิยาม whitespace เดียวกับ \s)
+    return " ".join(ln.split()).strip(" /")
 
 
-def _find(full: str, patterns: List[str], flags: int = 0) -> Optional[str]:
+def _find(full: str, patterns: List[Pattern]) -> Optional[str]:
     for p in patterns:
-        m = re.search(p, full, flags)
+        m = p.search(full)
         if m:
             return m.group(1).strip()
     return None
 
 
-def _combine_two_line_key(lines: List[str], i: int) -> Optional[str]:
-    cur = _norm(lines[i])
-    nxt = _norm(lines[i + 1]) if i + 1 < len(lines) else ""
-    if cur == "หมวดธุรกิจ" and re.fullmatch(r"\(มาจากงบการเงินปีล่าสุด\)\s*:", nxt):
-        return "หมวดธุรกิจ (มาจากงบการเงินปีล่าสุด) :"
-    if cur == "วัตถุประสงค์" and re.fullmatch(r"\(มาจากงบการเงินปีล่าสุด\)\s*:", nxt):
-        return "วัตถุประสงค์ (มาจากงบการเงินปีล่าสุด) :"
-    return None
-
-
 def _cut_at_boundaries(value: str) -> str:
     m = BOUNDARY_PAT.search(value)
     if m:
@@ -195,139 +257,152 @@ def _to_director_objs(names: List[str]) -> List[Dict[str, Any]]:
     return [{"no": i + 1, "name": nm} for i, nm in enumerate(cleaned)]
 
 
+# ---------- structured parser ---------- #
+# regex ที่ค้นบน full text (คอมไพล์ครั้งเดียว ตามลำดับความสำคัญต่อฟิลด์)
+FULL_PATTERNS: Dict[str, List[Pattern]] = {
+    "company_name": [re.compile(r"ข้อมูล\s*\n\s*(บริษัท[^\n]+)", re.M), re.compile(r"^\s*(บริษัท[^\n]+)", re.M)],
+    "reg_no": [re.compile(r"เลขทะเบียนนิติบุคคล\s*:\s*([0-9\-]+)")],
+    "entity_type": [re.compile(r"ประเภทนิติบุคคล\s*:\s*([^\n]+)")],
+    "incorp_date_th": [re.compile(r"วันที่จดทะเบียนจัดตั้ง\s*:\s*([0-9]{2}/[0-9]{2}/[0-9]{4})"),
+                       re.compile(r"วันที\s*่จดทะเบียนจัดตั\s*้ง\s*:\s*([0-9/]{8,10})")],
+    "status": [re.compile(r"สถานะนิติบุคคล\s*:\s*([^\n]+)")],
+    "capital": [re.compile(r"ทุนจดทะเบียน\s*\(บาท\)\s*:\s*([0-9,\.]+)")],
+    "printed_date": [re.compile(r"วันที่สั่งพิมพ์\s*:\s*([0-9]{2}/[0-9]{2}/[0-9]{4})"),
+                     re.compile(r"วันที\s*่สั\s*่งพิมพ์\s*:\s*([0-9/]{8,10})")],
+    "printed_time": [re.compile(r"เวลา\s*:\s*([0-9]{2}:[0-9]{2}:[0-9]{2})")],
+    "source_url": [re.compile(r"URL\s*:\s*(https?://\S+)")],
+    "financial_years": [re.compile(r"ปีที่ส่งงบการเงิน\s*:\s*([0-9\s,]+)")],
+}
+
+ONE_LINE_KEYS = (
+    "หมวดธุรกิจตอนจดทะเบียน :",
+    "วัตถุประสงค์ตอนจดทะเบียน :",
+    "ปีที่ส่งงบการเงิน :",
+    "ที่ตั้ง :",
+    "กรรมการ :",
+    "คณะกรรมการลงชื่อผูกพัน :",
+)
+# key ที่แตกเป็นสองบรรทัด: "หมวดธุรกิจ" + "(มาจากงบการเงินปีล่าสุด) :"
+TWO_LINE_KEYS = {
+    "หมวดธุรกิจ": "หมวดธุรกิจ (มาจากงบการเงินปีล่าสุด) :",
+    "วัตถุประสงค์": "วัตถุประสงค์ (มาจากงบการเงินปีล่าสุด) :",
+}
+KEY_TO_FIELD = {
+    "หมวดธุรกิจตอนจดทะเบียน :": "business_section_at_registration",
+    "วัตถุประสงค์ตอนจดทะเบียน :": "objective_at_registration",
+    "หมวดธุรกิจ (มาจากงบการเงินปีล่าสุด) :": "business_section_latest",
+    "วัตถุประสงค์ (มาจากงบการเงินปีล่าสุด) :": "objective_latest",
+    "ปีที่ส่งงบการเงิน :": "financial_years",
+    "ที่ตั้ง :": "address",
+    "กรรมการ :": "directors_header",
+    "คณะกรรมการลงชื่อผูกพัน :": "binding_rule_header",
+}
+# alternation ของ ONE_LINE_KEYS (ช่องว่างในคีย์ = \s*) → fullmatch ครั้งเดียวต่อบรรทัด
+ONE_LINE_KEY_RE = re.compile(
+    "|".join(f"(?P<k{i}>{re.escape(k).replace(chr(92) + ' ', chr(92) + 's*')})" for i, k in enumerate(ONE_LINE_KEYS))
+)
+LATEST_SUFFIX_RE = re.compile(r"\(มาจากงบการเงินปีล่าสุด\)\s*:")
+NUM_ITEM_RE = re.compile(r"^\d+\s*[\.\)]\s*")
+DIRECTOR_STOP_WORDS = ("ข้อมูล", "URL", "หน้า", "DBD", "ปีที่ส่งงบการเงิน")
+
+
+@dataclass
+class _Line:
+    text: str                    # บรรทัดหลัง _norm
+    key: Optional[str]           # คีย์ที่บรรทัดนี้เปิด (รวม key สองบรรทัด) หรือ None
+    boundary: Optional[bool]     # BOUNDARY_PAT เจอในบรรทัด (คำนวณเมื่อต้องใช้ — ดู _is_boundary)
+    numbered: bool               # ขึ้นต้นด้วย "1." / "2)"
+    director: Optional[str]      # ชื่อกรรมการที่ตัดเลขข้อแล้ว (เฉพาะบรรทัด numbered ที่ไม่ใช่ noise)
+
+
+def _tokenize(pages: List[PageResult]) -> List[_Line]:
+    """แปลงทุกบรรทัดเป็น _Line ครั้งเดียว — regex ทุกตัวรันบรรทัดละครั้ง"""
+    texts = [t for p in pages for t in (_norm(ln) for ln in p.lines) if t]
+    out: List[_Line] = []
+    for i, t in enumerate(texts):
+        key: Optional[str] = None
+        m = ONE_LINE_KEY_RE.fullmatch(t)
+        if m:
+            key = ONE_LINE_KEYS[int(m.lastgroup[1:])]
+        elif t in TWO_LINE_KEYS and i + 1 < len(texts) and LATEST_SUFFIX_RE.fullmatch(texts[i + 1]):
+            key = TWO_LINE_KEYS[t]
+        numbered = NUM_ITEM_RE.match(t) is not None
+        director = None
+        if numbered:
+            cand = NUM_ITEM_RE.sub("", t).strip(" /-•.")
+            if not any(b in cand for b in DIRECTOR_STOP_WORDS):
+                director = cand
+        out.append(_Line(t, key, None, numbered, director))
+    return out
+
+
+def _is_boundary(tok: _Line) -> bool:
+    if tok.boundary is None:
+        tok.boundary = BOUNDARY_PAT.search(tok.text) is not None
+    return tok.boundary
+
+
 def parse_structured_from_pages(pages: List[PageResult]) -> Dict[str, Any]:
     full = clean_text("\n".join([p.text for p in pages]))
-
-    company_name = _find(full, [r"ข้อมูล\s*\n\s*(บริษัท[^\n]+)", r"^\s*(บริษัท[^\n]+)"], flags=re.M)
-    reg_no = _find(full, [r"เลขทะเบียนนิติบุคคล\s*:\s*([0-9\-]+)"])
-    entity_type = _find(full, [r"ประเภทนิติบุคคล\s*:\s*([^\n]+)"])
-    incorp_date_th = _find(full, [r"วันที่จดทะเบียนจัดตั้ง\s*:\s*([0-9]{2}/[0-9]{2}/[0-9]{4})",
-                                   r"วันที\s*่จดทะเบียนจัดตั\s*้ง\s*:\s*([0-9/]{8,10})"])
-    status = _find(full, [r"สถานะนิติบุคคล\s*:\s*([^\n]+)"])
-    capital = _find(full, [r"ทุนจดทะเบียน\s*\(บาท\)\s*:\s*([0-9,\.]+)"])
+    found = {name: _find(full, pats) for name, pats in FULL_PATTERNS.items()}
+    capital = found["capital"]
     if capital:
         capital = capital.replace(",", "")
 
-    printed_date = _find(full, [r"วันที่สั่งพิมพ์\s*:\s*([0-9]{2}/[0-9]{2}/[0-9]{4})",
-                                r"วันที\s*่สั\s*่งพิมพ์\s*:\s*([0-9/]{8,10})"])
-    printed_time = _find(full, [r"เวลา\s*:\s*([0-9]{2}:[0-9]{2}:[0-9]{2})"])
-    source_url = _find(full, [r"URL\s*:\s*(https?://\S+)"])
-
-    lines: List[str] = []
-    for p in pages:
-        for ln in p.lines:
-            t = _norm(ln)
-            if t:
-                lines.append(t)
-
-    ONE_LINE_KEYS = {
-        "หมวดธุรกิจตอนจดทะเบียน :",
-        "วัตถุประสงค์ตอนจดทะเบียน :",
-        "ปีที่ส่งงบการเงิน :",
-        "ที่ตั้ง :",
-        "กรรมการ :",
-        "คณะกรรมการลงชื่อผูกพัน :",
-    }
-
-    KEY_TO_FIELD = {
-        "หมวดธุรกิจตอนจดทะเบียน :": "business_section_at_registration",
-        "วัตถุประสงค์ตอนจดทะเบียน :": "objective_at_registration",
-        "หมวดธุรกิจ (มาจากงบการเงินปีล่าสุด) :": "business_section_latest",
-        "วัตถุประสงค์ (มาจากงบการเงินปีล่าสุด) :": "objective_latest",
-        "ปีที่ส่งงบการเงิน :": "financial_years",
-        "ที่ตั้ง :": "address",
-        "กรรมการ :": "directors_header",
-        "คณะกรรมการลงชื่อผูกพัน :": "binding_rule_header",
-    }
-
-    def _key_at(i: int) -> Optional[str]:
-        ln = _norm(lines[i])
-        for k in ONE_LINE_KEYS:
-            if re.fullmatch(re.escape(k).replace(r"\ ", r"\s*"), ln):
-                return k
-        return _combine_two_line_key(lines, i)
+    toks = _tokenize(pages)
+    n = len(toks)
+    # รายชื่อจากบรรทัดเลขข้อทั้งเอกสาร (ใช้ทั้งตอนเจอ "กรรมการ :" และเป็น fallback)
+    all_directors = [t.director for t in toks if t.director is not None]
 
     results: Dict[str, Any] = {}
     pending: List[str] = []
     buffers: Dict[str, List[str]] = {}
 
+    # state machine: บรรทัดคีย์เปลี่ยน state, บรรทัดอื่นเข้า buffer ของคีย์ที่ยังไม่มีค่า
     i = 0
-    n = len(lines)
     while i < n:
-        k = _key_at(i)
-        if k:
+        tok = toks[i]
+        k = tok.key
+        if k == "กรรมการ :" or k == "คณะกรรมการลงชื่อผูกพัน :":
+            # กินบรรทัดจนเจอคีย์ถัดไปหรือ boundary
+            j = i + 1
+            while j < n and toks[j].key is None and not _is_boundary(toks[j]):
+                j += 1
+            section = toks[i + 1:j]
             if k == "กรรมการ :":
-                j = i + 1
-                local = []
-                while j < n:
-                    if _key_at(j):
-                        break
-                    txt = _norm(lines[j])
-                    if BOUNDARY_PAT.search(txt):
-                        break
-                    if re.match(r"^\d+\s*[\.\)]\s*", txt):
-                        cand = re.sub(r"^\d+\s*[\.\)]\s*", "", txt).strip(" /-•.")
-                        if not any(b in cand for b in ["ข้อมูล", "URL", "หน้า", "DBD", "ปีที่ส่งงบการเงิน"]):
-                            local.append(cand)
-                    j += 1
-
-                allnums = []
-                for x in lines:
-                    t = _norm(x)
-                    if re.match(r"^\d+\s*[\.\)]\s*", t):
-                        cand = re.sub(r"^\d+\s*[\.\)]\s*", "", t).strip(" /-•.")
-                        if not any(b in cand for b in ["ข้อมูล", "URL", "หน้า", "DBD", "ปีที่ส่งงบการเงิน"]):
-                            allnums.append(cand)
-
+                local = [t.director for t in section if t.director is not None]
                 names, seen = [], set()
-                for nm in allnums + local:
+                for nm in all_directors + local:
                     if nm and nm not in seen:
                         seen.add(nm)
                         names.append(nm)
-
                 results["directors"] = _to_director_objs(names)
-                i = j
-                continue
-
-            if k == "คณะกรรมการลงชื่อผูกพัน :":
-                j = i + 1
-                buf = []
-                while j < n:
-                    if _key_at(j):
-                        break
-                    txt = _norm(lines[j])
-                    if BOUNDARY_PAT.search(txt):
-                        break
-                    buf.append(txt)
-                    j += 1
-                s = re.sub(r"\s+", " ", " ".join(buf)).strip(" /")
+            else:
+                s = re.sub(r"\s+", " ", " ".join(t.text for t in section)).strip(" /")
                 s = re.split(r"\sข้อควรทราบ\s*:?", s)[0].strip()
                 s = s.replace("คนใดคนหนึ", "คนใดคนหนึ่ง")
                 results["binding_rule"] = s
-                i = j
-                continue
+            i = j
+            continue
 
+        if k:
             pending.append(k)
-            i += 2 if k in ("หมวดธุรกิจ (มาจากงบการเงินปีล่าสุด) :", "วัตถุประสงค์ (มาจากงบการเงินปีล่าสุด) :") else 1
+            i += 2 if k in TWO_LINE_KEYS.values() else 1
             continue
 
-        txt = _norm(lines[i])
-        if BOUNDARY_PAT.search(txt):
+        # ยังไม่มีคีย์ค้าง → บรรทัดนี้ไม่ถูกใช้ ไม่ต้องเช็ก boundary
+        if not pending or _is_boundary(tok) or tok.numbered:
             i += 1
             continue
-        if pending:
-            if re.match(r"^\d+\s*[\.\)]\s*", txt):
-                i += 1
-                continue
-            tgt = None
-            for k2 in pending:
-                if k2 not in buffers:
-                    tgt = k2
-                    buffers[k2] = []
-                    break
-            if tgt is None:
-                tgt = pending[-1]
-            buffers[tgt].append(txt)
+        tgt = None
+        for k2 in pending:
+            if k2 not in buffers:
+                tgt = k2
+                buffers[k2] = []
+                break
+        if tgt is None:
+            tgt = pending[-1]
+        buffers[tgt].append(tok.text)
         i += 1
 
     def _emit(key: str, val: str):
@@ -355,25 +430,17 @@ def parse_structured_from_pages(pages: List[PageResult]) -> Dict[str, Any]:
             _emit(k, val)
 
     if "financial_years" not in results:
-        yrs = _find(full, [r"ปีที่ส่งงบการเงิน\s*:\s*([0-9\s,]+)"])
-        results["financial_years"] = re.findall(r"[0-9]{4}", yrs or "")
+        results["financial_years"] = re.findall(r"[0-9]{4}", found["financial_years"] or "")
 
     if "directors" not in results:
-        allnums = []
-        for x in lines:
-            t = _norm(x)
-            if re.match(r"^\d+\s*[\.\)]\s*", t):
-                cand = re.sub(r"^\d+\s*[\.\)]\s*", "", t).strip(" /-•.")
-                if not any(b in cand for b in ["ข้อมูล", "URL", "หน้า", "DBD", "ปีที่ส่งงบการเงิน"]):
-                    allnums.append(cand)
-        results["directors"] = _to_director_objs([d for d in allnums if d])
+        results["directors"] = _to_director_objs([d for d in all_directors if d])
 
     out: Dict[str, Any] = {
-        "company_name": company_name,
-        "registration_number": reg_no,
-        "entity_type": entity_type,
-        "incorporation_date_th": incorp_date_th,
-        "status": status,
+        "company_name": found["company_name"],
+        "registration_number": found["reg_no"],
+        "entity_type": found["entity_type"],
+        "incorporation_date_th": found["incorp_date_th"],
+        "status": found["status"],
         "registered_capital_baht": float(capital) if capital not in (None, "") else None,
         "address": results.get("address"),
         "business_section_at_registration": results.get("business_section_at_registration"),
@@ -383,8 +450,8 @@ def parse_structured_from_pages(pages: List[PageResult]) -> Dict[str, Any]:
         "financial_filing_years_th": results.get("financial_years"),
         "directors": results.get("directors"),
         "binding_rule": results.get("binding_rule"),
-        "printed_at": {"date": printed_date, "time": printed_time},
-        "source_url": source_url,
+        "printed_at": {"date": found["printed_date"], "time": found["printed_time"]},
+        "source_url": found["source_url"],
     }
 
     if out.get("incorporation_date_th"):
@@ -395,6 +462,50 @@ def parse_structured_from_pages(pages: List[PageResult]) -> Dict[str, Any]:
     return {k: v for k, v in out.items() if v not in (None, "", [], {})}
 
 
+# ฟิลด์ที่ต้องมีก่อนหยุด OCR ก่อนหมดไฟล์ได้ (early exit)
+REQUIRED_FIELDS = (
+    "registration_number",
+    "status",
+    "registered_capital_baht",
+    "business_section_at_registration",
+    "directors",
+    "binding_rule",
+)
+# "ข้อควรทราบ" ตามหลัง คณะกรรมการลงชื่อผูกพัน → เห็นแล้วแปลว่า section ก่อนหน้า (กรรมการ/ลงชื่อผูกพัน) จบครบแล้ว
+END_OF_BODY_PAT = re.compile(r"ข้อควรทราบ")
+
+
+def structured_complete(structured: Dict[str, Any], pages: List[PageResult]) -> bool:
+    if any(not structured.get(k) for k in REQUIRED_FIELDS):
+        return False
+    return any(END_OF_BODY_PAT.search(p.text) for p in pages)
+
+
+def make_page(i: int, text: str, ocr_seconds: Optional[float] = None) -> PageResult:
+    ct = clean_text(text)
+    lines = [ln for ln in ct.splitlines() if ln.strip()]
+    return PageResult(page=i, text=ct, lines=lines, ocr_seconds=ocr_seconds)
+
+
+def ocr_until_complete(pdf_path: str, lang: str, dpi: Any) -> Tuple[OCRPages, List[PageResult], Dict[str, Any], int]:
+    """
+    OCR ทีละหน้า + parse_structured_from_pages หลังแต่ละหน้า หยุดเมื่อ structured_complete()
+    คืน (OCRPages ของหน้าที่ OCR แล้ว, pages, structured, จำนวนหน้าทั้งไฟล์)
+    """
+    use_dpi, total, it = ocr_pdf_pages(pdf_path, lang, dpi)
+    ocr = OCRPages(texts=[], dpi=use_dpi)
+    pages: List[PageResult] = []
+    structured: Dict[str, Any] = {}
+    for text, sec in it:
+        ocr.texts.append(text.strip())
+        ocr.seconds.append(round(sec, 3))
+        pages.append(make_page(len(pages) + 1, ocr.texts[-1], ocr.seconds[-1]))
+        structured = parse_structured_from_pages(pages)
+        if structured_complete(structured, pages):
+            break
+    return ocr, pages, structured, total
+
+
 # ---------- merge company_title.json ---------- #
 def merge_company_title(structured: Dict[str, Any], base_dir: str, base_pdf_stem: str) -> Dict[str, Any]:
     juristic_id = structured.get("registration_number") or base_pdf_stem.split("_")[0]
@@ -420,7 +531,8 @@ def merge_company_title(structured: Dict[str, Any], base_dir: str, base_pdf_stem
 
 
 # ---------- per-file processing ---------- #
-def process_one(pdf_path: str, args) -> bool:
+def process_one(pdf_path: str, args, pages_text: Optional[List[str]] = None, engine: Optional[str] = None,
+                ocr: Optional[OCRPages] = None) -> bool:
     try:
         if not os.path.isfile(pdf_path):
             print(f"❌ File not found: {pdf_path}", file=sys.stderr)
@@ -431,18 +543,30 @@ def process_one(pdf_path: str, args) -> bool:
         json_full = os.path.join(base_dir, base + ".json")
         json_struct = os.path.join(base_dir, base + "_structured.json")
 
-        pages_text = [] if args.force_ocr else extract_text_pdfminer(pdf_path)
-        engine = "pdfminer" if pages_text else "tesseract-ocr"
-        if not pages_text:
-            pages_text = ocr_pdf_with_tesseract(pdf_path, args.lang, args.dpi)
-
+        write_full = args.full_text or args.text_only
+        structured: Optional[Dict[str, Any]] = None
         pages: List[PageResult] = []
-        for i, t in enumerate(pages_text, start=1):
-            ct = clean_text(t)
-            lines = [ln for ln in ct.splitlines() if ln.strip()]
-            pages.append(PageResult(page=i, text=ct, lines=lines))
 
-        if not args.structured_only:
+        if pages_text is None:
+            pages_text, engine = ([], None) if args.force_ocr else extract_text_layer(pdf_path, args.text_backend)
+            engine = engine or "tesseract-ocr"
+            if not pages_text:
+                if write_full or args.no_early_exit:
+                    ocr = ocr_pdfs_with_tesseract([pdf_path], args.lang, args.dpi)[pdf_path]
+                    pages_text = ocr.texts
+                else:
+                    ocr, pages, structured, total = ocr_until_complete(pdf_path, args.lang, args.dpi)
+                    if len(pages) < total:
+                        print(f"⏩ all required fields found; OCR stopped at page {len(pages)}/{total}")
+
+        if not pages:
+            seconds = ocr.seconds if ocr else []
+            pages = [
+                make_page(i, t, seconds[i - 1] if i <= len(seconds) else None)
+                for i, t in enumerate(pages_text, start=1)
+            ]
+
+        if write_full:
             meta = OCRResult(
                 source_file=os.path.abspath(pdf_path),
                 file_size_bytes=os.path.getsize(pdf_path),
@@ -451,13 +575,15 @@ def process_one(pdf_path: str, args) -> bool:
                 engine=engine,
                 num_pages=len(pages),
                 pages=pages,
+                dpi=ocr.dpi if ocr else None,
             )
             with open(json_full, "w", encoding="utf-8") as f:
                 json.dump(asdict(meta), f, ensure_ascii=False, indent=2)
             print(f"✅ Saved full JSON: {json_full}")
 
         if not args.text_only:
-            structured = parse_structured_from_pages(pages)
+            if structured is None:
+                structured = parse_structured_from_pages(pages)
             structured = merge_company_title(structured, base_dir, base)
 
             with open(json_struct, "w", encoding="utf-8") as f:
@@ -473,6 +599,31 @@ def process_one(pdf_path: str, args) -> bool:
         return False
 
 
+# ---------- batch OCR across files ---------- #
+def prepare_pages_text(pdf_paths: List[str], args) -> Dict[str, Any]:
+    """
+    ดึงข้อความของหลายไฟล์ล่วงหน้า: text layer ก่อน ไฟล์ที่ยังว่างค่อย OCR รวมกันในการเรียกครั้งเดียว
+    คืน {pdf_path: (pages_text, engine, OCRPages|None)}; ไฟล์ที่ล้มเหลวจะไม่อยู่ใน dict (process_one จะลองเองอีกรอบ)
+    """
+    out: Dict[str, Any] = {}
+    need_ocr: List[str] = []
+    for fp in pdf_paths:
+        if not os.path.isfile(fp):
+            continue
+        pages_text, engine = ([], None) if args.force_ocr else extract_text_layer(fp, args.text_backend)
+        if pages_text:
+            out[fp] = (pages_text, engine, None)
+        else:
+            need_ocr.append(fp)
+    if need_ocr:
+        try:
+            for fp, ocr in ocr_pdfs_with_tesseract(need_ocr, args.lang, args.dpi).items():
+                out[fp] = (ocr.texts, "tesseract-ocr", ocr)
+        except Exception as e:
+            print(f"⚠ batch OCR failed ({e}); falling back to per-file OCR", file=sys.stderr)
+    return out
+
+
 # ---------- discover files for batch ---------- #
 def discover_input_files(input_path: str, default_pattern: str = "*_company_info.pdf") -> List[str]:
     # 1) ถ้าเป็นไฟล์ .pdf โดยตรง
@@ -495,30 +646,46 @@ def main():
     ap = argparse.ArgumentParser(description="DBD OCR to structured JSON (table-aware v6, batch-enabled).")
     ap.add_argument("input_path", help="ไฟล์เดี่ยว / โฟลเดอร์ / หรือ glob pattern เช่น 'downloads/*_company_info.pdf'")
     ap.add_argument("--lang", default="tha+eng")
-    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--dpi", type=dpi_arg, default="auto", help="auto (default, from glyph height; max 300) or a number")
     ap.add_argument("--force-ocr", action="store_true")
-    ap.add_argument("--structured-only", action="store_true")
-    ap.add_argument("--text-only", action="store_true")
+    ap.add_argument("--text-backend", choices=TEXT_BACKENDS, default=None,
+                    help="text layer backend: pdfminer (default, or env PDF_TEXT_BACKEND) | pdfium (เร็วกว่า) | pypdf2 | auto (pdfium → pdfminer → PyPDF2)")
+    ap.add_argument("--structured-only", action="store_true", help="(default) เขียนเฉพาะ <name>_structured.json — คงไว้เพื่อความเข้ากันได้")
+    ap.add_argument("--full-text", action="store_true", help="เขียน <name>.json (ข้อความทุกหน้า) ด้วย — OCR ทุกหน้า")
+    ap.add_argument("--text-only", action="store_true", help="เขียนเฉพาะ <name>.json (ข้อความทุกหน้า)")
+    ap.add_argument("--no-early-exit", action="store_true", help="OCR ทุกหน้าแม้ได้ฟิลด์ครบแล้ว")
     ap.add_argument("--pattern", default="*_company_info.pdf", help="pattern ที่ใช้เมื่อ input_path เป็นโฟลเดอร์ (ค่าเริ่มต้น: *_company_info.pdf)")
+    ap.add_argument("--ocr-batch", type=int, default=1,
+                    help="OCR ไฟล์ที่ต้อง OCR ทีละ N ไฟล์ในการเรียกครั้งเดียว (ใช้คู่กับ OCR_BACKEND=batch เพื่อโหลดโมเดลครั้งเดียวต่อชุด)")
+    ap.add_argument("--shard", type=shard_arg, default=None,
+                    help="i/N: ทำเฉพาะไฟล์ส่วนที่ i จาก N (hash ของเลขนิติบุคคลในชื่อไฟล์ — ชุดเดียวกับ dbd_web_scraping.py --shard)")
     args = ap.parse_args()
 
-    files = discover_input_files(args.input_path, default_pattern=args.pattern)
-    if not files:
+    all_files = discover_input_files(args.input_path, default_pattern=args.pattern)
+    if not all_files:
         print(f"❌ No PDF matched. Input: {args.input_path}", file=sys.stderr)
         sys.exit(2)
+    files = select_shard(all_files, args.shard, key=file_key)
 
     print("============================================================")
     print("Batch PDF → JSON (DBD company info)")
     print("============================================================")
-    print(f"Found {len(files)} file(s).")
+    print(f"Found {len(all_files)} file(s).")
+    if args.shard is not None:
+        print(describe_shard(args.shard, len(files), len(all_files)))
 
     ok, fail = 0, 0
-    for idx, fp in enumerate(files, start=1):
-        print(f"[{idx}/{len(files)}] Processing: {fp}")
-        if process_one(fp, args):
-            ok += 1
-        else:
-            fail += 1
+    chunk = max(1, args.ocr_batch)
+    for start in range(0, len(files), chunk):
+        group = files[start:start + chunk]
+        pre = prepare_pages_text(group, args) if chunk > 1 else {}
+        for idx, fp in enumerate(group, start=start + 1):
+            print(f"[{idx}/{len(files)}] Processing: {fp}")
+            pages_text, engine, ocr = pre.get(fp, (None, None, None))
+            if process_one(fp, args, pages_text, engine, ocr):
+                ok += 1
+            else:
+                fail += 1
 
     print("------------------------------------------------------------")
     print(f"Done. Success: {ok}, Failed: {fail}")
@@ -5,11 +5,16 @@
 #   python pdf_ocr_to_json.py invoice_detail_report_20251003_72195.pdf --method table --engine tabula --records-only --fix-lookalikes
 #   # ถ้าอยากคัดเข้ม (filter): เพิ่ม --strict
 
-import os, sys, re, json, argparse
-from typing import List, Dict, Any, Optional
+import os, sys, re, argparse
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from tqdm import tqdm
 
+from services.ocr_engine import ocr_available, ocr_jobs_to_strings
+from services.page_layout import find_regions
+from services.pdf_raster import dpi_arg, render_pages, resolve_dpi
+from services.record_sink import FORMATS, sink_path, write_document
+
 # ----------------- Optional deps -----------------
 _HAS_CAMELOT = False
 try:
@@ -27,10 +32,9 @@ except Exception:
 
 _HAS_OCR = False
 try:
-    from pdf2image import convert_from_path
-    import pytesseract
-    from PIL import Image
-    _HAS_OCR = True
+    import numpy as np
+    import cv2
+    _HAS_OCR = ocr_available()
 except Exception:
     _HAS_OCR = False
 
@@ -295,29 +299,47 @@ def transform_record_strict(rec: Dict[str, Any], fix_lookalikes: bool) -> Option
     return None if _rec_is_empty(r) else r
 
 # ----------------- OCR -----------------
-def _preprocess_pil(pil_img: "Image.Image"):
+def _preprocess(gray: "np.ndarray") -> "np.ndarray":
+    """หน้า grayscale (uint8) → Otsu + median blur; ส่ง numpy ให้ OCR ตรง ๆ ไม่ผ่าน PIL"""
     try:
-        import numpy as np, cv2
-        img = pil_img.convert("L")
-        arr = np.array(img)
-        arr = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        arr = cv2.medianBlur(arr, 3)
-        from PIL import Image
-        return Image.fromarray(arr)
+        arr = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        return cv2.medianBlur(arr, 3)
     except Exception:
-        return pil_img.convert("L")
+        return gray
+
+LAYOUTS = ("auto", "page")
+
+def _page_jobs(gray: "np.ndarray", layout: str, tesseract_config: str) -> List[Tuple[Any, str]]:
+    """layout=auto → crop header/ตาราง (psm ต่อ region); แยกไม่ได้หรือ layout=page → ทั้งหน้าด้วย tesseract_config"""
+    proc = _preprocess(gray)
+    regions = find_regions(gray) if layout == "auto" else []
+    if not regions:
+        return [(proc, tesseract_config)]
+    return [(r.crop(proc), r.config()) for r in regions]
 
-def ocr_pdf_to_pages_text(pdf_path: str, dpi: int = 300, lang: str = "tha+eng", tesseract_config: str = "--oem 1 --psm 6") -> Dict[str, Any]:
+def ocr_pdf_to_pages_text(pdf_path: str, dpi: Any = "auto", lang: str = "tha+eng", tesseract_config: str = "--oem 1 --psm 6",
+                          layout: str = "page") -> Dict[str, Any]:
     if not _HAS_OCR:
-        raise RuntimeError("OCR dependencies missing. Install pdf2image, pytesseract, pillow.")
+        raise RuntimeError("OCR dependencies missing. Install poppler (or pypdfium2), tesserocr (or pytesseract), numpy, opencv-python.")
     ensure_poppler_in_path(); ensure_tesseract_in_path()
-    pages = convert_from_path(pdf_path, dpi=dpi)
-    texts: List[str] = []
-    for p in tqdm(pages, desc="OCR pages"):
-        proc = _preprocess_pil(p)
-        txt = pytesseract.image_to_string(proc, lang=lang, config=tesseract_config)
-        texts.append((txt or "").strip())
-    return {"mode": "ocr", "pages": [{"page_number": i + 1, "text": t} for i, t in enumerate(texts)]}
+    dpi = resolve_dpi(dpi, pdf_path, max_dpi=300)
+    pages = render_pages(pdf_path, dpi, "gray")
+    # OCR_BACKEND=batch → tesseract ครั้งเดียวต่อ psm ต่อไฟล์ (โหลดโมเดลครั้งเดียว)
+    counts: List[int] = []
+    def _jobs():
+        for p in tqdm(pages, desc="OCR pages"):
+            jobs = _page_jobs(p, layout, tesseract_config)
+            counts.append(len(jobs))
+            yield from jobs
+    timings: List[float] = []
+    flat = ocr_jobs_to_strings(_jobs(), lang=lang, timings=timings)
+    out_pages: List[Dict[str, Any]] = []
+    pos = 0
+    for i, n in enumerate(counts, start=1):
+        parts = [(txt or "").strip() for txt in flat[pos:pos + n]]
+        out_pages.append({"page_number": i, "text": "\n".join(x for x in parts if x), "ocr_seconds": round(sum(timings[pos:pos + n]), 3)})
+        pos += n
+    return {"mode": "ocr", "dpi": dpi, "pages": out_pages}
 
 # ----------------- Table extraction -----------------
 def _camelot_tables_to_records(tables) -> List[Dict[str, Any]]:
@@ -420,14 +442,14 @@ def run_table(pdf_path: str, engine: str = "auto", strict: bool = False, fix_loo
 
     return {"mode": mode or "table", "records": fixed}
 
-def run_ocr(pdf_path: str, dpi: int, lang: str) -> Dict[str, Any]:
-    return ocr_pdf_to_pages_text(pdf_path, dpi=dpi, lang=lang)
+def run_ocr(pdf_path: str, dpi: Any, lang: str, layout: str = "page") -> Dict[str, Any]:
+    return ocr_pdf_to_pages_text(pdf_path, dpi=dpi, lang=lang, layout=layout)
 
-def run_auto(pdf_path: str, dpi: int, lang: str, engine: str, strict: bool, fix_lookalikes: bool) -> Dict[str, Any]:
+def run_auto(pdf_path: str, dpi: Any, lang: str, engine: str, strict: bool, fix_lookalikes: bool, layout: str = "page") -> Dict[str, Any]:
     tbl = run_table(pdf_path, engine=engine, strict=strict, fix_lookalikes=fix_lookalikes)
     if tbl.get("records"):
         return tbl
-    return run_ocr(pdf_path, dpi=dpi, lang=lang)
+    return run_ocr(pdf_path, dpi=dpi, lang=lang, layout=layout)
 
 # ----------------- CLI -----------------
 def main():
@@ -436,8 +458,9 @@ def main():
     p.add_argument("--method", choices=["auto", "table", "ocr"], default="auto")
     p.add_argument("--engine", choices=["auto", "tabula", "camelot-lattice", "camelot-stream"], default="auto",
                    help="Table extraction engine preference (suggest: tabula).")
-    p.add_argument("--dpi", type=int, default=300)
+    p.add_argument("--dpi", type=dpi_arg, default="auto", help="auto (default, from glyph height; max 300) or a number")
     p.add_argument("--lang", default="tha+eng")
+    p.add_argument("--layout", choices=LAYOUTS, default="page", help="OCR: page (default) whole page | auto: header + table regions only")
     p.add_argument("--input-dir", default=INPUT_DIR)
     p.add_argument("--out-dir", default=OUTPUT_DIR)
     p.add_argument("--records-only", action="store_true", help="Export only the array of records (if available).")
@@ -445,6 +468,8 @@ def main():
     p.add_argument("--sort-desc", action="store_true", help="Sort descending.")
     p.add_argument("--strict", action="store_true", help="Enable strict validation (filters rows by patterns).")
     p.add_argument("--fix-lookalikes", action="store_true", help="Fix lookalike characters in the numeric tail of 'Invoice No.' (l/I -> 1, o/O -> 0).")
+    p.add_argument("--format", choices=FORMATS, default="json", help="json (default) | ndjson (records/pages one per line)")
+    p.add_argument("--gzip", action="store_true", help="gzip the output file")
     args = p.parse_args()
 
     pdf_path = os.path.join(args.input_dir, args.filename)
@@ -455,9 +480,9 @@ def main():
     if args.method == "table":
         doc = run_table(pdf_path, engine=args.engine, strict=args.strict, fix_lookalikes=args.fix_lookalikes)
     elif args.method == "ocr":
-        doc = run_ocr(pdf_path, dpi=args.dpi, lang=args.lang)
+        doc = run_ocr(pdf_path, dpi=args.dpi, lang=args.lang, layout=args.layout)
     else:
-        doc = run_auto(pdf_path, dpi=args.dpi, lang=args.lang, engine=args.engine, strict=args.strict, fix_lookalikes=args.fix_lookalikes)
+        doc = run_auto(pdf_path, dpi=args.dpi, lang=args.lang, engine=args.engine, strict=args.strict, fix_lookalikes=args.fix_lookalikes, layout=args.layout)
 
     # optional sort
     if args.sort_by and "records" in doc:
@@ -474,11 +499,9 @@ def main():
 
     # output
     payload = doc["records"] if (args.records_only and "records" in doc) else doc
-    os.makedirs(args.out_dir, exist_ok=True)
-    out_name = os.path.splitext(args.filename)[0] + ".json"
-    out_path = os.path.join(args.out_dir, out_name)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    out_path = sink_path(args.out_dir, os.path.splitext(args.filename)[0], args.format, args.gzip)
+    list_key = "records" if "records" in doc else "pages"
+    write_document(out_path, payload, records_key=list_key, fmt=args.format, gzip=args.gzip)
     print(f"[OK] Saved -> {out_path} (mode: {doc.get('mode')}, strict={args.strict}, fix_lookalikes={args.fix_lookalikes})")
 
 if __name__ == "__main__":
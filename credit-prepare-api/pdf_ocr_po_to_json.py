@@ -4,11 +4,15 @@
 #   python pdf_ocr_po_to_json.py po_detail_report_20250717_2047695.pdf --method table
 #   python pdf_ocr_po_to_json.py po_detail_report_20251003_72195.pdf --method ocr
 
-import os, sys, re, json, argparse
+import os, sys, re, argparse
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from tqdm import tqdm
 
+from services.ocr_engine import ocr_available, ocr_images_to_strings
+from services.pdf_raster import dpi_arg, render_pages, resolve_dpi
+from services.record_sink import FORMATS, sink_path, write_document
+
 # ----------------- Optional deps -----------------
 _HAS_CAMELOT = False
 try:
@@ -26,10 +30,9 @@ except Exception:
 
 _HAS_OCR = False
 try:
-    from pdf2image import convert_from_path
-    import pytesseract
-    from PIL import Image
-    _HAS_OCR = True
+    import numpy as np
+    import cv2
+    _HAS_OCR = ocr_available()
 except Exception:
     _HAS_OCR = False
 
@@ -186,28 +189,23 @@ def transform_record(record: Dict[str, Any]) -> Dict[str, Any]:
     return r
 
 # ----------------- OCR -----------------
-def _preprocess_pil(pil_img: "Image.Image"):
+def _preprocess(gray: "np.ndarray") -> "np.ndarray":
+    """หน้า grayscale (uint8) → Otsu + median blur; ส่ง numpy ให้ OCR ตรง ๆ ไม่ผ่าน PIL"""
     try:
-        import numpy as np, cv2
-        img = pil_img.convert("L")
-        arr = np.array(img)
-        arr = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        arr = cv2.medianBlur(arr, 3)
-        from PIL import Image
-        return Image.fromarray(arr)
+        arr = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        return cv2.medianBlur(arr, 3)
     except Exception:
-        return pil_img.convert("L")
+        return gray
 
-def ocr_pdf_to_pages_text(pdf_path: str, dpi: int = 300, lang: str = "tha+eng", tesseract_config: str = "--oem 1 --psm 6") -> List[str]:
+def ocr_pdf_to_pages_text(pdf_path: str, dpi: int = 300, lang: str = "tha+eng", tesseract_config: str = "--oem 1 --psm 6",
+                          timings: Optional[List[float]] = None) -> List[str]:
     if not _HAS_OCR:
-        raise RuntimeError("OCR dependencies missing. Install pdf2image, pytesseract, pillow.")
+        raise RuntimeError("OCR dependencies missing. Install poppler (or pypdfium2), tesserocr (or pytesseract), numpy, opencv-python.")
     ensure_poppler_in_path(); ensure_tesseract_in_path()
-    pages = convert_from_path(pdf_path, dpi=dpi)
-    texts: List[str] = []
-    for p in tqdm(pages, desc="OCR pages"):
-        proc = _preprocess_pil(p)
-        txt = pytesseract.image_to_string(proc, lang=lang, config=tesseract_config)
-        texts.append((txt or "").strip())
+    pages = render_pages(pdf_path, dpi, "gray")
+    # OCR_BACKEND=batch → tesseract ครั้งเดียวต่อไฟล์ (โหลดโมเดลครั้งเดียว)
+    procs = (_preprocess(p) for p in tqdm(pages, desc="OCR pages"))
+    texts: List[str] = [(txt or "").strip() for txt in ocr_images_to_strings(procs, lang=lang, config=tesseract_config, timings=timings)]
     return texts
 
 # ----------------- Table extraction -----------------
@@ -302,11 +300,17 @@ def run_table(pdf_path: str) -> Dict[str, Any]:
     records = [transform_record(r) for r in records]
     return {"mode": mode, "records": records}
 
-def run_ocr(pdf_path: str, dpi: int, lang: str) -> Dict[str, Any]:
-    pages_text = ocr_pdf_to_pages_text(pdf_path, dpi=dpi, lang=lang)
-    return {"mode": "ocr", "pages": [{"page_number": i + 1, "text": t} for i, t in enumerate(pages_text)]}
-
-def run_auto(pdf_path: str, dpi: int, lang: str) -> Dict[str, Any]:
+def run_ocr(pdf_path: str, dpi: Any, lang: str) -> Dict[str, Any]:
+    dpi = resolve_dpi(dpi, pdf_path, max_dpi=300)
+    timings: List[float] = []
+    pages_text = ocr_pdf_to_pages_text(pdf_path, dpi=dpi, lang=lang, timings=timings)
+    return {
+        "mode": "ocr",
+        "dpi": dpi,
+        "pages": [{"page_number": i + 1, "text": t, "ocr_seconds": round(sec, 3)} for i, (t, sec) in enumerate(zip(pages_text, timings))],
+    }
+
+def run_auto(pdf_path: str, dpi: Any, lang: str) -> Dict[str, Any]:
     tbl = run_table(pdf_path)
     if tbl.get("records"):
         return tbl
@@ -317,10 +321,12 @@ def main():
     parser = argparse.ArgumentParser(description="PDF -> JSON (table-first, OCR fallback) with ISO dates.")
     parser.add_argument("filename", help="PDF file name inside raw_data/po")
     parser.add_argument("--method", choices=["auto", "table", "ocr"], default="auto")
-    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--dpi", type=dpi_arg, default="auto", help="auto (default, from glyph height; max 300) or a number")
     parser.add_argument("--lang", default="tha+eng")
     parser.add_argument("--input-dir", default=INPUT_DIR)
     parser.add_argument("--out-dir", default=OUTPUT_DIR)
+    parser.add_argument("--format", choices=FORMATS, default="json", help="json (default) | ndjson (records/pages one per line)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output file")
     args = parser.parse_args()
 
     pdf_path = os.path.join(args.input_dir, args.filename)
@@ -339,11 +345,9 @@ def main():
     # out_payload = doc["records"] if "records" in doc else doc
     out_payload = doc
 
-    os.makedirs(args.out_dir, exist_ok=True)
-    out_name = os.path.splitext(args.filename)[0] + ".json"
-    out_path = os.path.join(args.out_dir, out_name)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(out_payload, f, ensure_ascii=False, indent=2)
+    out_path = sink_path(args.out_dir, os.path.splitext(args.filename)[0], args.format, args.gzip)
+    list_key = "records" if "records" in doc else "pages"
+    write_document(out_path, out_payload, records_key=list_key, fmt=args.format, gzip=args.gzip)
     print(f"[OK] Saved -> {out_path}")
 
 if __name__ == "__main__":
@@ -7,15 +7,17 @@ pdf_ocr_rm_report_to_json.py
     python pdf_ocr_rm_report_to_json.py raw_data/rm/<filename>.pdf
 
 จะสร้างไฟล์:
-    processed_data/<ชื่อไฟล์>.json
+    processed_data/<ชื่อไฟล์>.json   (--format ndjson → .ndjson, --gzip → .gz)
 """
 
 import argparse
-import json
 import re
 from pathlib import Path
 
-from PyPDF2 import PdfReader
+from services.pdf_text import BACKENDS as TEXT_BACKENDS, extract_pages_text
+from services.record_sink import FORMATS, RecordSink, sink_path
+
+TEXT_BACKEND_DEFAULT = "pdfium"  # ได้ record เท่ากับ PyPDF2 (engine เดิม) ทุกตัว — tests/test_pdf_text_backends.py
 
 
 # ---------- helper: date ---------- #
@@ -57,21 +59,12 @@ def normalize_record_line(line: str) -> str:
 
 # ---------- core parser ---------- #
 
-def parse_remittance_pdf(pdf_path: Path):
-    reader = PdfReader(str(pdf_path))
-    text = ""
-
-    # ดึง text ทุกหน้า
-    for page in reader.pages:
-        try:
-            t = page.extract_text()
-            if t:
-                text += t + "\n"
-        except:
-            pass
+def iter_remittance_records(pdf_path: Path, text_backend=None):
+    # ดึง text ทุกหน้า (services/pdf_text; default pdfium)
+    pages, _ = extract_pages_text(str(pdf_path), text_backend, default=TEXT_BACKEND_DEFAULT)
+    text = "".join(t + "\n" for t in pages if t)
 
     lines = [l.strip() for l in text.splitlines() if l.strip()]
-    records = []
 
     # บรรทัดที่มีวันที่
     has_date_re = re.compile(r"\d{2}/\d{2}/\d{4}")
@@ -155,10 +148,12 @@ def parse_remittance_pdf(pdf_path: Path):
             "source_pdf": pdf_path.name,
         }
 
-        records.append(record)
+        yield record
         i += 1
 
-    return records
+
+def parse_remittance_pdf(pdf_path: Path, text_backend=None):
+    return list(iter_remittance_records(pdf_path, text_backend))
 
 
 # ---------- main ---------- #
@@ -166,6 +161,10 @@ def parse_remittance_pdf(pdf_path: Path):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("pdf_path", help="path ของไฟล์ PDF (input)")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="json (default) | ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output file")
+    parser.add_argument("--text-backend", choices=TEXT_BACKENDS, default=None,
+                        help="pdfium (default, or env PDF_TEXT_BACKEND) | pypdf2 (engine เดิม) | pdfminer (อ่านตารางเป็นคอลัมน์ ใช้ไม่ได้) | auto")
     args = parser.parse_args()
 
     pdf_path = Path(args.pdf_path)
@@ -173,13 +172,10 @@ def main():
         print("ไม่พบไฟล์:", pdf_path)
         return
 
-    out_dir = Path("processed_data")
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    out_json = out_dir / (pdf_path.stem + ".json")
+    out_json = sink_path(Path("processed_data"), pdf_path.stem, args.format, args.gzip)
 
-    records = parse_remittance_pdf(pdf_path)
-    out_json.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+    with RecordSink(out_json, fmt=args.format, gzip=args.gzip) as sink:
+        sink.extend(iter_remittance_records(pdf_path, args.text_backend))
 
     print(f"✔️ แปลงสำเร็จ → {out_json}")
 
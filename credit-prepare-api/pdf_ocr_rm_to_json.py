@@ -2,22 +2,25 @@
 # usage:
 #   python pdf_ocr_rm_to_json.py raw_data/rm/xxx.pdf --ocr-mode slow --debug
 #   python pdf_ocr_rm_to_json.py processed_data/xxx.json --debug
-# output: processed_data/<basename>.json
+#   python pdf_ocr_rm_to_json.py raw_data/rm/xxx.pdf --format ndjson --gzip
+# output: processed_data/<basename>.json  (ndjson: <basename>.ndjson[.gz] + <basename>_grand_totals.json)
 
 import os, re, sys, json, argparse, unicodedata, traceback
 from typing import List, Dict, Any, Tuple, Optional
 
+from services.ocr_engine import ocr_available, ocr_jobs_to_strings
+from services.page_layout import find_regions, region_pixels
+from services.pdf_raster import dpi_arg, page_count, render_pages, resolve_dpi
+from services.record_sink import FORMATS, RecordSink, sink_path
+
 PRINT = lambda *a, **k: print(*a, **k, flush=True)
 
 # ---------- Optional OCR deps ----------
 _HAS_OCR=False
 try:
-    from pdf2image import convert_from_path
-    import pytesseract
-    from PIL import Image
     import numpy as np
     import cv2
-    _HAS_OCR=True
+    _HAS_OCR=ocr_available()
 except Exception:
     _HAS_OCR=False
 
@@ -78,40 +81,75 @@ def _ensure_binaries():
     if which("tesseract") is None:
         PRINT("[WARN] Tesseract not found. macOS: brew install tesseract")
 
-def _preprocess(img: "Image.Image", mode: str):
+def _preprocess(arr: "np.ndarray", mode: str):
+    """arr: หน้า grayscale (uint8, H×W) จาก render_pages — threshold ได้ทันทีไม่ต้องแปลง/copy"""
     imgs = []
-    g = img.convert("L")
-    arr = np.array(g)
     if mode == "slow":
         th1 = cv2.threshold(arr, 0,255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)[1]
         th2 = cv2.adaptiveThreshold(arr,255,cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
                                     cv2.THRESH_BINARY, 31, 5)
         th3 = cv2.bilateralFilter(th2, 7, 50, 50)
-        imgs = [Image.fromarray(th1), Image.fromarray(th2), Image.fromarray(th3)]
+        imgs = [th1, th2, th3]
     else:
         th = cv2.threshold(arr, 0,255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)[1]
-        imgs = [Image.fromarray(th)]
+        imgs = [th]
     return imgs
 
-def ocr_pdf_to_pages_text(pdf_path: str, mode: str="slow", dpi_slow: int=350, dpi_fast:int=250, debug: bool=False) -> List[Dict[str,Any]]:
+PAGE_CONFIG = "--oem 1 --psm 6"
+LAYOUTS = ("auto", "page")
+
+def ocr_pdf_to_pages_text(pdf_path: str, mode: str="slow", dpi_slow: int=350, dpi_fast:int=250, debug: bool=False,
+                          dpi: Any="auto", layout: str="page") -> List[Dict[str,Any]]:
+    """
+    dpi="auto" → เลือกจากความสูงตัวอักษร (ไม่เกิน dpi_slow/dpi_fast ตาม mode); ตัวเลข → ใช้ตามนั้น
+    layout="page" (default) → OCR ทั้งหน้าทุกหน้า
+    layout="auto" → OCR เฉพาะ header (psm 4) + ตาราง (psm 6) ที่หาได้ด้วย services/page_layout
+                    หน้าที่แยก region ไม่ได้ OCR ทั้งหน้าเหมือนเดิม (ยังไม่ได้วัดความแม่นกับสแกนจริง)
+    แต่ละหน้าคืน {"page_number", "text", "dpi", "ocr_seconds"}
+    """
     if not _HAS_OCR:
-        raise RuntimeError("OCR libraries not installed (pdf2image, pytesseract, pillow, numpy, opencv-python).")
+        raise RuntimeError("OCR libraries not installed (poppler or pypdfium2, tesserocr or pytesseract, numpy, opencv-python).")
     _ensure_binaries()
-    dpi = dpi_slow if mode=="slow" else dpi_fast
-    pages = convert_from_path(pdf_path, dpi=dpi)
+    dpi = resolve_dpi(dpi, pdf_path, max_dpi=dpi_slow if mode=="slow" else dpi_fast)
+    # render เป็น grayscale ตรง ๆ ทีละหน้า (ไม่ถือ RGB ทั้งไฟล์ไว้ในหน่วยความจำ)
+    pages = render_pages(pdf_path, dpi, "gray")
     out = []
-    PRINT(f"[INFO] OCR pages: {len(pages)} (dpi={dpi}, mode={mode})")
-    for i, p in enumerate(pages, start=1):
+    PRINT(f"[INFO] OCR pages: {page_count(pdf_path)} (dpi={dpi}, mode={mode}, layout={layout})")
+
+    # ส่งทุก variant × region ของทุกหน้าเป็นชุดเดียว (OCR_BACKEND=batch → tesseract ครั้งเดียวต่อ psm ต่อไฟล์)
+    shapes: List[Tuple[int,int]] = []   # (จำนวน variant, จำนวน region) ต่อหน้า
+    def _jobs():
+        for i, p in enumerate(pages, start=1):
+            regions = find_regions(p) if layout == "auto" else []
+            vs = _preprocess(p, mode)
+            shapes.append((len(vs), len(regions) or 1))
+            if debug and regions:
+                pct = 100.0 * region_pixels(regions) / (p.shape[0] * p.shape[1])
+                PRINT(f"[DEBUG] page {i}: regions={[r.name for r in regions]} ({pct:.0f}% of page)")
+            for v in vs:
+                if regions:
+                    for r in regions:
+                        yield r.crop(v), r.config()
+                else:
+                    yield v, PAGE_CONFIG
+    timings: List[float] = []
+    flat = ocr_jobs_to_strings(_jobs(), lang="tha+eng", timings=timings)
+
+    pos = 0
+    for i, (n_var, n_reg) in enumerate(shapes, start=1):
         texts = []
-        for v in _preprocess(p, mode):
-            txt = pytesseract.image_to_string(v, lang="tha+eng", config="--oem 1 --psm 6")
-            t = (txt or "").strip()
+        n = n_var * n_reg
+        for k in range(pos, pos + n, n_reg):
+            parts = [(txt or "").strip() for txt in flat[k:k + n_reg]]
+            t = "\n".join(x for x in parts if x)
             if t and t not in texts:
                 texts.append(t)
+        secs = round(sum(timings[pos:pos + n]), 3)
+        pos += n
         merged = "\n".join(texts)
-        out.append({"page_number": i, "text": merged})
+        out.append({"page_number": i, "text": merged, "dpi": dpi, "ocr_seconds": secs})
         if debug:
-            PRINT(f"[DEBUG] page {i}: {len(merged.splitlines())} lines (passes={len(texts)})")
+            PRINT(f"[DEBUG] page {i}: {len(merged.splitlines())} lines (passes={len(texts)}, ocr={secs}s)")
     return out
 
 # ---------- Normalizers ----------
@@ -434,12 +472,15 @@ def parse_page(page: Dict[str,Any], debug: bool=False) -> Dict[str,Any]:
     return {"transactions": transactions, "grand_totals": grands, "_unmatched": unmatched}
 
 # ---------- Merge & Dedupe ----------
+def _row_key(r: Dict[str,Any]) -> Tuple:
+    return (r.get("วันที่"), r.get("รหัสสาขา"), r.get("ประเภทเอกสาร"),
+            r.get("เลขที่เอกสาร"), r.get("เลขที่เอกสารอ้างอิง"),
+            float(r.get("จำนวน") if r.get("จำนวน") is not None else 0.0))
+
 def dedupe_rows(rows: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
     seen = set(); out = []
     for r in rows:
-        key = (r.get("วันที่"), r.get("รหัสสาขา"), r.get("ประเภทเอกสาร"),
-               r.get("เลขที่เอกสาร"), r.get("เลขที่เอกสารอ้างอิง"),
-               float(r.get("จำนวน") if r.get("จำนวน") is not None else 0.0))
+        key = _row_key(r)
         if key in seen: continue
         seen.add(key); out.append(r)
     return out
@@ -457,27 +498,60 @@ def read_json_pages(path: str) -> List[Dict[str,Any]]:
         data = json.load(f)
     return data["pages"] if isinstance(data, dict) and "pages" in data else data
 
-def process_pages(pages: List[Dict[str,Any]], basename: str, debug: bool=False) -> str:
-    all_tx: List[Dict[str,Any]] = []
-    all_gr: List[Dict[str,Any]] = []
-    all_un: List[str] = []
-
-    for p in pages:
-        res = parse_page(p, debug=debug)
-        all_tx.extend(res["transactions"])
-        all_gr.extend(res["grand_totals"])
-        all_un.extend(res["_unmatched"])
+def ocr_summary(pages: List[Dict[str,Any]]) -> Optional[Dict[str,Any]]:
+    """{"dpi", "pages": [{"page_number", "ocr_seconds"}]} ถ้า pages มาจาก OCR; None ถ้าอ่านจาก JSON"""
+    timed = [p for p in pages if "ocr_seconds" in p]
+    if not timed:
+        return None
+    return {
+        "dpi": timed[0].get("dpi"),
+        "pages": [{"page_number": p.get("page_number"), "ocr_seconds": p["ocr_seconds"]} for p in timed],
+    }
 
-    all_tx = dedupe_rows(all_tx)
-    if debug: all_un = dedupe_list_str(all_un)
+def process_pages(pages: List[Dict[str,Any]], basename: str, debug: bool=False,
+                  fmt: str="json", gzip: bool=False) -> str:
+    """
+    Parse pages and stream transactions to disk as they are produced (dedupe by key only).
+    json   -> { "file", "transactions": [...], "grand_totals": [...] (, "_unmatched") (, "ocr") }
+    ndjson -> one transaction per line; grand totals (+ ocr) go to <stem>_grand_totals.json
+    """
+    stem = os.path.splitext(os.path.basename(basename))[0]
+    out_path = str(sink_path(OUTPUT_DIR, stem, fmt, gzip))
 
-    out = { "file": basename, "grand_totals": all_gr, "transactions": all_tx }
-    if debug: out["_unmatched"] = all_un
+    all_gr: List[Dict[str,Any]] = []
+    all_un: List[str] = []
+    seen = set()
 
-    out_path = os.path.join(OUTPUT_DIR, os.path.splitext(os.path.basename(basename))[0] + ".json")
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
-    PRINT(f"[OK] Saved -> {out_path} (tx={len(all_tx)}, grand={len(all_gr)}{', unmatched='+str(len(all_un)) if debug else ''})")
+    sink = RecordSink(out_path, fmt=fmt, gzip=gzip, envelope={"file": basename}, records_key="transactions")
+    try:
+        for p in pages:
+            res = parse_page(p, debug=debug)
+            for r in res["transactions"]:
+                key = _row_key(r)
+                if key in seen: continue
+                seen.add(key); sink.write(r)
+            all_gr.extend(res["grand_totals"])
+            all_un.extend(res["_unmatched"])
+
+        if debug: all_un = dedupe_list_str(all_un)
+
+        ocr = ocr_summary(pages)
+        tail: Dict[str,Any] = {"grand_totals": all_gr}
+        if debug: tail["_unmatched"] = all_un
+        if ocr: tail["ocr"] = ocr
+        sink.close(tail=tail)
+    except BaseException:
+        sink.abort()
+        raise
+
+    if fmt == "ndjson":
+        side = os.path.join(OUTPUT_DIR, stem + "_grand_totals.json")
+        envelope: Dict[str,Any] = {"file": basename}
+        if ocr: envelope["ocr"] = ocr
+        with RecordSink(side, envelope=envelope, records_key="grand_totals") as gs:
+            gs.extend(all_gr)
+
+    PRINT(f"[OK] Saved -> {out_path} (tx={sink.count}, grand={len(all_gr)}{', unmatched='+str(len(all_un)) if debug else ''})")
     return out_path
 
 # ---------- CLI ----------
@@ -486,7 +560,11 @@ def main():
     ap = argparse.ArgumentParser(description="Extract CPALL Remittance (transactions + grand totals with page) from PDF or JSON(pages).")
     ap.add_argument("input_path", help="PDF path or JSON path (pages).")
     ap.add_argument("--ocr-mode", choices=["slow","fast"], default="slow", help="OCR quality/performance mode (PDF only).")
+    ap.add_argument("--dpi", type=dpi_arg, default="auto", help="auto (default, from glyph height; max 350 slow / 250 fast) or a number")
+    ap.add_argument("--layout", choices=LAYOUTS, default="page", help="page (default): whole page | auto: OCR header + table regions only")
     ap.add_argument("--debug", action="store_true")
+    ap.add_argument("--format", choices=FORMATS, default="json", help="json (default) | ndjson")
+    ap.add_argument("--gzip", action="store_true", help="gzip the output file")
     args = ap.parse_args()
 
     src = args.input_path
@@ -500,17 +578,17 @@ def main():
     try:
         if ext == ".pdf":
             if not _HAS_OCR:
-                PRINT("[ERROR] OCR libraries not installed; install pdf2image, pytesseract, pillow, numpy, opencv-python")
+                PRINT("[ERROR] OCR libraries not installed; install poppler or pypdfium2, tesserocr or pytesseract, numpy, opencv-python")
                 sys.exit(1)
             PRINT(f"[INFO] Input is PDF: {basename}, mode={args.ocr_mode}")
-            pages = ocr_pdf_to_pages_text(src, mode=args.ocr_mode, debug=args.debug)
+            pages = ocr_pdf_to_pages_text(src, mode=args.ocr_mode, debug=args.debug, dpi=args.dpi, layout=args.layout)
             PRINT(f"[INFO] Parsed pages: {len(pages)} → extracting…")
-            process_pages(pages, basename, debug=args.debug)
+            process_pages(pages, basename, debug=args.debug, fmt=args.format, gzip=args.gzip)
         else:
             PRINT(f"[INFO] Input is JSON pages: {basename}")
             pages = read_json_pages(src)
             PRINT(f"[INFO] Loaded pages: {len(pages)} → extracting…")
-            process_pages(pages, basename, debug=args.debug)
+            process_pages(pages, basename, debug=args.debug, fmt=args.format, gzip=args.gzip)
     except Exception:
         PRINT("[FATAL] Exception occurred:")
         PRINT(traceback.format_exc())
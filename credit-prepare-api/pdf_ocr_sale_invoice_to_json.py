@@ -27,6 +27,8 @@ import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 
+from services.record_sink import FORMATS, RecordSink, sink_path
+
 
 # ==============================
 # OCR Extraction
@@ -218,40 +220,55 @@ def parse_tables_to_df(ocr_output: str, pdf_basename: str):
 # ==============================
 # Convert DataFrame + Metadata → JSON
 # ==============================
-def dataframe_to_enriched_rows(df: pd.DataFrame, metadata: dict):
+def _to_amount_2dp(val):
+    try:
+        return round(float(str(val).replace(",", "")), 2)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def iter_enriched_rows(df: pd.DataFrame, metadata: dict):
     start_round = convert_date_round_dd_mm_yyyy(metadata.get("start_round_date", ""))
     end_round   = convert_date_round_dd_mm_yyyy(metadata.get("end_round_date", ""))
 
-    out = []
-    for _, row in df.iterrows():
-        row_dict = {}
-        for col, val in row.items():
-            col_clean = str(col).strip()
-            if col_clean in ["จำนวนเงิน", "ภาษี", "จำนวนเงินสุทธิ"]:
-                try:
-                    row_dict[col_clean] = round(float(str(val).replace(",", "")), 2)
-                except (ValueError, TypeError):
-                    row_dict[col_clean] = 0.0
-                continue
-            if ("วันที่" in col_clean) or ("date" in col_clean.lower()):
-                row_dict[col_clean] = convert_date_round_dd_mm_yyyy(val)
-                continue
-            row_dict[col_clean] = str(val).strip() if str(val).strip() != "" else ""
+    # แปลงทีละคอลัมน์ แล้วประกอบ record จาก array ของแต่ละคอลัมน์ (ไม่ใช้ iterrows)
+    columns = {}
+    for j, col in enumerate(df.columns):
+        col_clean = str(col).strip()
+        series = df.iloc[:, j]
+        if col_clean in ["จำนวนเงิน", "ภาษี", "จำนวนเงินสุทธิ"]:
+            columns[col_clean] = [_to_amount_2dp(v) for v in series.tolist()]
+            continue
+        if ("วันที่" in col_clean) or ("date" in col_clean.lower()):
+            columns[col_clean] = [convert_date_round_dd_mm_yyyy(v) for v in series.tolist()]
+            continue
+        columns[col_clean] = series.astype(str).str.strip().tolist()
+
+    meta = {
+        "topic": metadata.get("topic", ""),
+        "start_round_date": start_round,
+        "end_round_date": end_round,
+        "supplier_name": metadata.get("supplier_name", ""),
+        "supplier_num": str(metadata.get("supplier_num", "")).strip(),
+    }
+
+    names = list(columns)
+    rows = zip(*columns.values()) if names else (() for _ in range(len(df)))
+    for values in rows:
+        row_dict = dict(zip(names, values))
+        row_dict.update(meta)
+        yield row_dict
 
-        row_dict["topic"] = metadata.get("topic", "")
-        row_dict["start_round_date"] = start_round
-        row_dict["end_round_date"] = end_round
-        row_dict["supplier_name"] = metadata.get("supplier_name", "")
-        row_dict["supplier_num"] = str(metadata.get("supplier_num", "")).strip()
 
-        out.append(row_dict)
-    return out
+def dataframe_to_enriched_rows(df: pd.DataFrame, metadata: dict):
+    return list(iter_enriched_rows(df, metadata))
 
 
 # ==============================
 # Main Processing Loop
 # ==============================
-def process_pdfs_in_folder(folder_path, api_key, task_type, max_tokens, temperature, top_p, repetition_penalty, output_dir, pages=None):
+def process_pdfs_in_folder(folder_path, api_key, task_type, max_tokens, temperature, top_p, repetition_penalty, output_dir, pages=None,
+                           fmt="json", gzip=False):
     os.makedirs(output_dir, exist_ok=True)
 
     for filename in os.listdir(folder_path):
@@ -276,10 +293,11 @@ def process_pdfs_in_folder(folder_path, api_key, task_type, max_tokens, temperat
             print(f"[WARN] Skip saving (no table rows): {filename}")
             continue
 
-        rows = dataframe_to_enriched_rows(df, meta)
-        out_path = os.path.join(output_dir, f"{pdf_base}.json")
-        with open(out_path, "w", encoding="utf-8-sig") as f:
-            json.dump(rows, f, ensure_ascii=False, indent=4)
+        out_path = sink_path(output_dir, pdf_base, fmt, gzip)
+        # BOM เฉพาะ .json (ให้ Excel/Notepad เปิดภาษาไทยได้) — NDJSON ต้องไม่มี BOM ไม่งั้นบรรทัดแรก parse ไม่ได้
+        encoding = "utf-8-sig" if fmt == "json" else "utf-8"
+        with RecordSink(out_path, fmt=fmt, gzip=gzip, indent=4, encoding=encoding) as sink:
+            sink.extend(iter_enriched_rows(df, meta))
 
         print(f"[OK] Saved JSON -> {out_path}")
 
@@ -297,6 +315,8 @@ def main():
     parser.add_argument("--top-p", type=float, default=0.6)
     parser.add_argument("--repetition-penalty", type=float, default=1.2)
     parser.add_argument("--pages", type=str, help="Optional JSON list of pages to process.")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="json (array, default) | ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output files")
 
     # ✅ Default output dir: processed_data/sale_invoice
     default_output_dir = "processed_data/sale_invoice"
@@ -312,7 +332,9 @@ def main():
         top_p=args.top_p,
         repetition_penalty=args.repetition_penalty,
         output_dir=default_output_dir,
-        pages=pages
+        pages=pages,
+        fmt=args.format,
+        gzip=args.gzip
     )
 
 
@@ -27,6 +27,8 @@ import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 
+from services.record_sink import FORMATS, RecordSink, sink_path
+
 
 # ==============================
 # OCR Extraction (OpenTyphoon)
@@ -311,7 +313,7 @@ def parse_tables_to_df(ocr_output: str, pdf_basename: str):
 # ==============================
 # DataFrame + Metadata → flattened rows
 # ==============================
-def dataframe_to_enriched_rows(df: pd.DataFrame, metadata: dict):
+def iter_enriched_rows(df: pd.DataFrame, metadata: dict):
     start_round = convert_date_round_dd_mm_yyyy(metadata.get("start_round_date", ""))
     end_round   = convert_date_round_dd_mm_yyyy(metadata.get("end_round_date", ""))
 
@@ -319,42 +321,52 @@ def dataframe_to_enriched_rows(df: pd.DataFrame, metadata: dict):
     numeric_fields_2dp = {"ราคาทุน/หน่วย", "จำนวนเงิน", "ภาษี", "จำนวนเงินสุทธิ", "ยอดสุทธิ", "ยอดรวม"}
     numeric_fields_3dp = {"จำนวนที่ขาย"}
 
-    out = []
-    for _, row in df.iterrows():
-        row_dict = {}
-        for col, val in row.items():
-            col_clean = str(col).strip()
-            sval = str(val).strip()
-
-            # ---- numeric fields (robust parser) ----
-            if col_clean in numeric_fields_2dp or col_clean in numeric_fields_3dp:
-                num = to_float_robust(sval)
-                row_dict[col_clean] = round(num, 3) if col_clean in numeric_fields_3dp else round(num, 2)
-                continue
+    # แปลงทีละคอลัมน์ แล้วประกอบ record จาก array ของแต่ละคอลัมน์ (ไม่ใช้ iterrows)
+    columns = {}
+    for j, col in enumerate(df.columns):
+        col_clean = str(col).strip()
+        svals = df.iloc[:, j].astype(str).str.strip().tolist()
 
-            # ---- date-ish fields ----
-            if ("วันที่" in col_clean) or ("date" in col_clean.lower()):
-                row_dict[col_clean] = convert_date_round_dd_mm_yyyy(sval)
-                continue
+        # ---- numeric fields (robust parser) ----
+        if col_clean in numeric_fields_2dp or col_clean in numeric_fields_3dp:
+            ndigits = 3 if col_clean in numeric_fields_3dp else 2
+            columns[col_clean] = [round(to_float_robust(v), ndigits) for v in svals]
+            continue
 
-            # ---- default as string ----
-            row_dict[col_clean] = sval if sval != "" else ""
+        # ---- date-ish fields ----
+        if ("วันที่" in col_clean) or ("date" in col_clean.lower()):
+            columns[col_clean] = [convert_date_round_dd_mm_yyyy(v) for v in svals]
+            continue
 
-        # attach supplier meta
-        row_dict["topic"] = metadata.get("topic", "")
-        row_dict["start_round_date"] = start_round
-        row_dict["end_round_date"] = end_round
-        row_dict["supplier_name"] = metadata.get("supplier_name", "")
-        row_dict["supplier_num"] = str(metadata.get("supplier_num", "")).strip()
+        # ---- default as string ----
+        columns[col_clean] = svals
 
-        out.append(row_dict)
-    return out
+    # attach supplier meta
+    meta = {
+        "topic": metadata.get("topic", ""),
+        "start_round_date": start_round,
+        "end_round_date": end_round,
+        "supplier_name": metadata.get("supplier_name", ""),
+        "supplier_num": str(metadata.get("supplier_num", "")).strip(),
+    }
+
+    names = list(columns)
+    rows = zip(*columns.values()) if names else (() for _ in range(len(df)))
+    for values in rows:
+        row_dict = dict(zip(names, values))
+        row_dict.update(meta)
+        yield row_dict
+
+
+def dataframe_to_enriched_rows(df: pd.DataFrame, metadata: dict):
+    return list(iter_enriched_rows(df, metadata))
 
 
 # ==============================
 # Batch Processing (Folder)
 # ==============================
-def process_pdfs_in_folder(folder_path, api_key, task_type, max_tokens, temperature, top_p, repetition_penalty, output_dir, pages=None):
+def process_pdfs_in_folder(folder_path, api_key, task_type, max_tokens, temperature, top_p, repetition_penalty, output_dir, pages=None,
+                           fmt="json", gzip=False):
     os.makedirs(output_dir, exist_ok=True)
 
     for filename in sorted(os.listdir(folder_path)):
@@ -379,10 +391,11 @@ def process_pdfs_in_folder(folder_path, api_key, task_type, max_tokens, temperat
             print(f"[WARN] Skip saving (no table rows): {filename}")
             continue
 
-        rows = dataframe_to_enriched_rows(df, meta)
-        out_path = os.path.join(output_dir, f"{pdf_base}.json")
-        with open(out_path, "w", encoding="utf-8-sig") as f:
-            json.dump(rows, f, ensure_ascii=False, indent=4)
+        out_path = sink_path(output_dir, pdf_base, fmt, gzip)
+        # BOM เฉพาะ .json (ให้ Excel/Notepad เปิดภาษาไทยได้) — NDJSON ต้องไม่มี BOM ไม่งั้นบรรทัดแรก parse ไม่ได้
+        encoding = "utf-8-sig" if fmt == "json" else "utf-8"
+        with RecordSink(out_path, fmt=fmt, gzip=gzip, indent=4, encoding=encoding) as sink:
+            sink.extend(iter_enriched_rows(df, meta))
 
         print(f"[OK] Saved JSON -> {out_path}")
 
@@ -400,6 +413,8 @@ def main():
     parser.add_argument("--top-p", type=float, default=0.6)
     parser.add_argument("--repetition-penalty", type=float, default=1.2)
     parser.add_argument("--pages", type=str, help="Optional JSON list of pages to process.")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="json (array, default) | ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output files")
 
     # ✅ Default output dir for supplier
     default_output_dir = "processed_data/sale_supplier"
@@ -416,7 +431,9 @@ def main():
         top_p=args.top_p,
         repetition_penalty=args.repetition_penalty,
         output_dir=default_output_dir,
-        pages=pages
+        pages=pages,
+        fmt=args.format,
+        gzip=args.gzip
     )
 
 
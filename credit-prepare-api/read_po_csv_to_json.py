@@ -23,16 +23,18 @@ read_po_csv_to_json.py
     * Order/Delivery/PO Report Date/PO Received Date -> YYYY-MM-DD
     * Send Date -> YYYY-MM-DD HH:mm:ss (24 ชม.)
 - บันทึกผลไว้ที่ processed_data/po/<same_name>.json
+  (--format ndjson → <same_name>.ndjson, --gzip → บีบอัด .gz; เขียนแบบ streaming ทีละแถว)
 """
 
 import argparse
-import json
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import pandas as pd
 
+from services.record_sink import FORMATS, RecordSink, sink_path
+
 
 # ---------- IO helpers ----------
 def read_csv_any_encoding(path: Path) -> pd.DataFrame:
@@ -310,8 +312,9 @@ def _parse_amount(s: Optional[str]) -> Optional[float]:
         return None
 
 
-# ---------- Convert one file ----------
-def convert_one(path: Path) -> Path:
+# ---------- Records of one file ----------
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """แถว output ของไฟล์เดียว (ใช้ทั้ง convert_one และ load_to_db.py)"""
     raw = read_table_any(path)
     buyer = extract_buyer_from_b3(raw)
 
@@ -326,16 +329,17 @@ def convert_one(path: Path) -> Path:
     df = build_data_df(raw)
     df = drop_trailing_totals_or_empty(df)
 
-    records: List[Dict[str, Any]] = [row_to_output(r, buyer, header_dates) for _, r in df.iterrows()]
+    for _, r in df.iterrows():
+        yield row_to_output(r, buyer, header_dates)
 
-    out_dir = Path("processed_data/po")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / path.with_suffix(".json").name
 
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(records, f, ensure_ascii=False, indent=2)
+# ---------- Convert one file ----------
+def convert_one(path: Path, fmt: str = "json", gzip: bool = False) -> Path:
+    out_path = sink_path(Path("processed_data/po"), path.stem, fmt, gzip)
+    with RecordSink(out_path, fmt=fmt, gzip=gzip) as sink:
+        sink.extend(iter_records(path))
 
-    print(f"✅ Wrote {len(records)} records -> {out_path}")
+    print(f"✅ Wrote {sink.count} records -> {out_path}")
     return out_path
 
 
@@ -351,13 +355,15 @@ def main() -> None:
         required=True,
         help="e.g. raw_data/po/po_detail_report_20251007_2050363.csv | .xlsx | .xls",
     )
+    ap.add_argument("--format", choices=FORMATS, default="json", help="json (array, default) | ndjson")
+    ap.add_argument("--gzip", action="store_true", help="gzip the output file")
     args = ap.parse_args()
 
     src = Path(args.file)
     if not src.exists():
         raise FileNotFoundError(f"File not found: {src}")
 
-    convert_one(src)
+    convert_one(src, fmt=args.format, gzip=args.gzip)
 
 
 if __name__ == "__main__":
@@ -5,15 +5,17 @@
 อ่าน Excel → JSON พร้อมแปลงวันที่แบบถูกต้อง 100%:
 - ทุกฟิลด์ที่เป็นวันที่จริง ใช้ dayfirst=True เสมอ
 - output รูปแบบ YYYY-MM-DD
+- --format ndjson: เขียนหนึ่งแถวต่อบรรทัด (มี sheet_name ในแต่ละแถว), --gzip: บีบอัด .gz
 """
 
-import json
+import argparse
 import pandas as pd
-import sys
 from pathlib import Path
 from datetime import datetime
 from pandas import Timestamp
 
+from services.record_sink import FORMATS, RecordSink, sink_path
+
 
 # -------------------------
 # list column ที่ถือว่าเป็นวันที่
@@ -77,62 +79,72 @@ def parse_date(value):
     return value
 
 
-def excel_to_json(excel_path: str):
-    excel_path = Path(excel_path)
+def iter_sheet_rows(df: pd.DataFrame, supplier_code: str):
+    df = df.where(pd.notnull(df), None)
 
-    if not excel_path.exists():
-        raise FileNotFoundError(f"ไม่พบไฟล์: {excel_path}")
+    for r in df.to_dict(orient="records"):
+        new_r = {}
 
-    supplier_code = excel_path.stem
+        for col, val in r.items():
+            if is_date_column(col):
+                new_r[col] = parse_date(val)
+            else:
+                new_r[col] = val
 
-    out_dir = Path("processed_data/rm")
-    out_dir.mkdir(parents=True, exist_ok=True)
+        new_r["supplier_code"] = supplier_code
+        yield new_r
 
-    out_path = out_dir / f"{supplier_code}.json"
 
-    xls = pd.read_excel(excel_path, sheet_name=None)
+def iter_records(excel_path: str):
+    """ทุกแถวของทุกชีต (มี sheet_name) — ใช้ใน load_to_db.py"""
+    excel_path = Path(excel_path)
+    xls = pd.ExcelFile(excel_path)
+    for sheet_name in xls.sheet_names:
+        for r in iter_sheet_rows(xls.parse(sheet_name), excel_path.stem):
+            yield {"sheet_name": sheet_name, **r}
 
-    output = {
-        "file_name": excel_path.name,
-        "supplier_code": supplier_code,
-        "sheets": []
-    }
 
-    for sheet_name, df in xls.items():
-        df = df.where(pd.notnull(df), None)
+def excel_to_json(excel_path: str, fmt: str = "json", gzip: bool = False):
+    excel_path = Path(excel_path)
 
-        rows = df.to_dict(orient="records")
-        updated = []
+    if not excel_path.exists():
+        raise FileNotFoundError(f"ไม่พบไฟล์: {excel_path}")
 
-        for r in rows:
-            new_r = {}
+    supplier_code = excel_path.stem
 
-            for col, val in r.items():
-                if is_date_column(col):
-                    new_r[col] = parse_date(val)
-                else:
-                    new_r[col] = val
+    out_path = sink_path(Path("processed_data/rm"), supplier_code, fmt, gzip)
 
-            new_r["supplier_code"] = supplier_code
-            updated.append(new_r)
+    # อ่านทีละชีต แทนการโหลดทุกชีตพร้อมกัน (sheet_name=None)
+    xls = pd.ExcelFile(excel_path)
 
-        output["sheets"].append({
-            "sheet_name": sheet_name,
-            "rows": updated
-        })
+    envelope = {
+        "file_name": excel_path.name,
+        "supplier_code": supplier_code,
+    }
 
-    out_path.write_text(
-        json.dumps(output, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    with RecordSink(out_path, fmt=fmt, gzip=gzip, envelope=envelope, records_key="sheets") as sink:
+        for sheet_name in xls.sheet_names:
+            rows = iter_sheet_rows(xls.parse(sheet_name), supplier_code)
+            if fmt == "ndjson":
+                for r in rows:
+                    sink.write({"sheet_name": sheet_name, **r})
+            else:
+                sink.write({
+                    "sheet_name": sheet_name,
+                    "rows": list(rows)
+                })
 
     print(f"✓ Completed → {out_path}")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("วิธีใช้:")
-        print('  python read_rem_detail_to_json.py "raw_data/rm/72195.xlsx"')
-        sys.exit(1)
+    ap = argparse.ArgumentParser(
+        description="Excel → JSON (remittance detail)",
+        epilog='ตัวอย่าง: python read_rem_detail_to_json.py "raw_data/rm/72195.xlsx"',
+    )
+    ap.add_argument("excel_path")
+    ap.add_argument("--format", choices=FORMATS, default="json", help="json (default) | ndjson")
+    ap.add_argument("--gzip", action="store_true", help="gzip the output file")
+    args = ap.parse_args()
 
-    excel_to_json(sys.argv[1])
+    excel_to_json(args.excel_path, fmt=args.format, gzip=args.gzip)
@@ -21,9 +21,11 @@ import re
 from pathlib import Path
 from typing import Dict, List, Tuple, Any, Optional
 
-import warnings
 import pandas as pd
 
+from services.excel_reader import read_excel_any, sniff_kind
+from services.item_index import ItemNameIndex
+
 # --------------------- mapping: TH -> EN (ชื่อรายการ) --------------------- #
 TH_TO_EN_MAP = {
     "ลูกหนี้การค้าสุทธิ": "accounts_receivable_net",
@@ -95,59 +97,12 @@ def parse_year_like(s: Any) -> Optional[int]:
     return to_gregorian(int(m.group(1))) if m else None
 
 # --------------------- sniff & read --------------------- #
-def magic_bytes(path: Path, n: int = 8) -> bytes:
-    with open(path, "rb") as f:
-        return f.read(n)
-
-def sniff_format(path: Path) -> str:
-    sig = magic_bytes(path, 8)
-    if sig.startswith(b"PK\x03\x04"):
-        return "xlsx"
-    if sig.startswith(b"\xD0\xCF\x11\xE0"):
-        return "xls"
-    return "unknown"
-
 def read_table(path: Path, sheet: Optional[str], debug: bool) -> pd.DataFrame:
-    def _ensure_df(obj) -> pd.DataFrame:
-        if isinstance(obj, dict):
-            return next(iter(obj.values()))
-        return obj
-
-    kind = sniff_format(path)
-    print(f"  ↪ detected format: {kind}")
-
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        sheet_name = 0 if (sheet is None or str(sheet).strip() == "") else sheet
-
-        # ลำดับ engine ที่พยายามใช้
-        engines = []
-        if kind == "xls":
-            engines = ["xlrd"]  # ต้องติดตั้ง xlrd==1.2.0
-        elif kind == "xlsx":
-            engines = ["openpyxl"]
-        else:
-            # ไม่แน่ใจ ลองทั้งสอง
-            engines = ["openpyxl", "xlrd"]
-
-        last_err = None
-        for eng in engines:
-            try:
-                df = pd.read_excel(path, sheet_name=sheet_name, engine=eng, header=None)
-                return _ensure_df(df)
-            except Exception as e:
-                last_err = e
-                log(debug, f"read_excel with engine={eng} failed: {e}")
-
-        # ทางหนีไฟ: ถ้าเป็นไฟล์ xls ที่จริงเป็น html-Excel ให้ลอง read_html
-        try:
-            tables = pd.read_html(path, header=None)
-            if tables:
-                return tables[0]
-        except Exception as e2:
-            last_err = e2
-
-        raise RuntimeError(f"อ่านไฟล์ไม่สำเร็จ: {path.name} (last error: {last_err})")
+    print(f"  ↪ detected format: {sniff_kind(path)}")
+    try:
+        return read_excel_any(path, sheet, debug)
+    except RuntimeError as e:
+        raise RuntimeError(f"อ่านไฟล์ไม่สำเร็จ: {path.name} ({e})") from e
 
 # --------------------- tidy --------------------- #
 def find_header_row(df: pd.DataFrame, debug: bool) -> int:
@@ -194,34 +149,44 @@ def detect_year_pairs(df: pd.DataFrame, debug: bool) -> List[Tuple[int, str, Opt
     return pairs
 
 # --------------------- item_en helper --------------------- #
+# fallback แบบยืดหยุ่น (ลำดับมีผล: ตัวแรกที่เจอชนะ)
+ITEM_INDEX = ItemNameIndex(
+    TH_TO_EN_MAP,
+    canon=normalize_th,
+    rules=[
+        ("หนี้สินไม่หมุนเวียน", "non_current_liabilities"),
+        ("ลูกหนี้การค้า", "trade_receivables"),
+        ("สินค้าคงเหลือ", "inventories"),
+        ("สินทรัพย์หมุนเวียน", "current_assets"),
+        ("สินทรัพย์ไม่หมุนเวียน", "non_current_assets"),
+        ("สินทรัพย์รวม", "total_assets"),
+        ("หนี้สินหมุนเวียน", "current_liabilities"),
+        ("หนี้สินรวมและส่วนของผู้ถือหุ้น", "total_equity_and_liabilities"),
+        ("หนี้สินรวม", "total_liabilities"),
+        ("ผู้ถือหุ้น", "shareholders_equity"),
+    ],
+)
+
 def get_item_en(th_name: str) -> str:
-    name = normalize_th(th_name)
-    if name in TH_TO_EN_MAP:
-        return TH_TO_EN_MAP[name]
-    # fallback แบบยืดหยุ่น
-    if "หนี้สินไม่หมุนเวียน" in name:
-        return "non_current_liabilities"
-    if "ลูกหนี้การค้า" in name:
-        return "trade_receivables"
-    if "สินค้าคงเหลือ" in name:
-        return "inventories"
-    if "สินทรัพย์หมุนเวียน" in name:
-        return "current_assets"
-    if "สินทรัพย์ไม่หมุนเวียน" in name:
-        return "non_current_assets"
-    if "สินทรัพย์รวม" in name:
-        return "total_assets"
-    if "หนี้สินหมุนเวียน" in name:
-        return "current_liabilities"
-    if "หนี้สินรวมและส่วนของผู้ถือหุ้น" in name:
-        return "total_equity_and_liabilities"
-    if "หนี้สินรวม" in name:
-        return "total_liabilities"
-    if "ผู้ถือหุ้น" in name:
-        return "shareholders_equity"
-    return "unknown"
+    return ITEM_INDEX.lookup(normalize_th(th_name))
 
 # --------------------- main transform --------------------- #
+def coerce_numeric_column(work: pd.DataFrame, col: Optional[str]) -> List[float]:
+    """
+    coerce_numeric ทั้งคอลัมน์ (None → 0.0)
+    - คอลัมน์ตัวเลขล้วนแปลงแบบ vectorized; คอลัมน์ที่มีข้อความใช้ coerce_numeric ทีละค่า
+    - ชื่อคอลัมน์ซ้ำ (เช่น %เปลี่ยนแปลง หลายคอลัมน์) ได้ 0.0 ทั้งหมด เหมือนพฤติกรรมเดิมของ row.get()
+    """
+    if not col:
+        return [0.0] * len(work)
+    s = work[col]
+    if isinstance(s, pd.DataFrame):
+        return [0.0] * len(work)
+    s = s.infer_objects()
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype("float64").fillna(0.0).tolist()
+    return [0.0 if v is None else float(v) for v in map(coerce_numeric, s.tolist())]
+
 def dataframe_to_year_json(df: pd.DataFrame, tax_id: str, debug: bool) -> Dict[str, List[Dict[str, Any]]]:
     label_col = df.columns[0]
     work = df.copy()
@@ -232,35 +197,21 @@ def dataframe_to_year_json(df: pd.DataFrame, tax_id: str, debug: bool) -> Dict[s
     if not pairs:
         raise RuntimeError("ไม่พบคอลัมน์ปีใน header")
 
+    items = work[label_col].tolist()
+    en_by_th = {th: get_item_en(th) for th in set(items)}
+    items_en = [en_by_th[th] for th in items]
+
     by_year: Dict[str, List[Dict[str, Any]]] = {}
     for y, val_col, pct_col in pairs:
-        year_key = str(y)
-        rows: List[Dict[str, Any]] = []
-        for _, row in work.iterrows():
-            th_item = normalize_th(row.get(label_col))
-            if th_item in IGNORE_ROW_TOKENS:
-                continue
-
-            amount = coerce_numeric(row.get(val_col))
-            pct = coerce_numeric(row.get(pct_col)) if pct_col else 0.0
-
-            # บังคับ default 0.0 ตามเงื่อนไข
-            if amount is None:
-                amount = 0.0
-            if pct is None:
-                pct = 0.0
-
-            rec = {
-                "item": th_item,
-                "item_en": get_item_en(th_item),
-                "amount": float(amount),
-                "pct_change": float(pct),
-                "tax_id": tax_id,
-            }
-            rows.append(rec)
-
+        # amount / pct_change เป็น 0.0 ถ้าว่างหรือแปลงไม่ได้ (บังคับ default ตามเงื่อนไข)
+        amounts = coerce_numeric_column(work, val_col)
+        pcts = coerce_numeric_column(work, pct_col)
+        rows = [
+            {"item": th, "item_en": en, "amount": amt, "pct_change": pct, "tax_id": tax_id}
+            for th, en, amt, pct in zip(items, items_en, amounts, pcts)
+        ]
         if rows:
-            by_year.setdefault(year_key, []).extend(rows)
+            by_year.setdefault(str(y), []).extend(rows)
 
     return by_year
 
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+script_read_dbd_financials.py — แปลง DBD balance / income / ratios ของทุกบริษัทในครั้งเดียว
+
+- ค้นหา <tax_id>_balance.xls[x], <tax_id>_income.xls[x], <tax_id>_ratios.xls[x] ในโฟลเดอร์
+- ประมวลผลบริษัทละหนึ่งงานบน process pool (--workers)
+- ใช้ตัวอ่าน/tidy เดิมของ script_read_dbd_balance / _income / _ratios (ผลลัพธ์ตรงกับสคริปต์เดิม)
+- เขียนตาราง long-format ไฟล์เดียว (Parquet):
+    tax_id, year, statement, item, item_en, amount, pct_change
+- --legacy-json: เขียน <tax_id>_<statement>.json แบบเดิมลง --outdir ด้วย
+
+Usage:
+  pip install pyarrow
+  python script_read_dbd_financials.py --folder ./downloads --out ./out_json/dbd_financials.parquet
+  python script_read_dbd_financials.py --folder ./downloads --out ./out_json/dbd_financials.parquet \\
+      --workers 8 --legacy-json --outdir ./out_json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import script_read_dbd_balance as balance
+import script_read_dbd_income as income
+import script_read_dbd_ratios as ratios
+
+STATEMENTS = ("balance", "income", "ratios")
+FILE_RE = re.compile(r"^(?P<tax>\d{10,13})_(?P<stmt>balance|income|ratios)\.xlsx?$", re.IGNORECASE)
+COLUMNS = ["tax_id", "year", "statement", "item", "item_en", "amount", "pct_change"]
+
+
+# ---------------- per-statement converters ---------------- #
+
+def _convert_balance(path: Path, tax_id: str, sheet: Optional[str], debug: bool) -> Dict[str, List[Dict[str, Any]]]:
+    df_raw = balance.read_table(path, sheet, debug)
+    hdr = balance.find_header_row(df_raw, debug)
+    df = balance.tidy_after_header(df_raw, hdr, debug)
+    return balance.dataframe_to_year_json(df, tax_id, debug)
+
+
+def _convert_income(path: Path, tax_id: str, sheet: Optional[str], debug: bool) -> Dict[str, List[Dict[str, Any]]]:
+    df_raw = income.read_income_table(path, debug)
+    df_tidy = income.tidy_income_table(df_raw, debug)
+    return income.dataframe_to_year_json(df_tidy, tax_id, debug)
+
+
+def _convert_ratios(path: Path, tax_id: str, sheet: Optional[str], debug: bool) -> Dict[str, List[Dict[str, Any]]]:
+    df_raw = ratios.read_ratios_table(path, sheet, debug)
+    df_tidy = ratios.tidy_ratios_table(df_raw, debug)
+    return ratios.dataframe_to_year_json(df_tidy, tax_id, debug)
+
+
+CONVERTERS = {
+    "balance": _convert_balance,
+    "income": _convert_income,
+    "ratios": _convert_ratios,
+}
+
+
+# ---------------- discovery ---------------- #
+
+def discover_companies(folder: Path) -> Dict[str, Dict[str, Path]]:
+    """คืน {tax_id: {statement: path}} เรียงตาม tax_id"""
+    found: Dict[str, Dict[str, Path]] = {}
+    for p in sorted(folder.iterdir()):
+        m = FILE_RE.match(p.name)
+        if not m or not p.is_file():
+            continue
+        found.setdefault(m.group("tax"), {})[m.group("stmt").lower()] = p
+    return dict(sorted(found.items()))
+
+
+# ---------------- worker ---------------- #
+
+def year_json_to_rows(data: Dict[str, List[Dict[str, Any]]], statement: str) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for year, items in data.items():
+        for rec in items:
+            rows.append({
+                "tax_id": rec.get("tax_id"),
+                "year": int(year),
+                "statement": statement,
+                "item": rec.get("item"),
+                "item_en": rec.get("item_en"),
+                "amount": rec.get("amount"),
+                "pct_change": rec.get("pct_change"),
+            })
+    return rows
+
+
+def process_company(
+    tax_id: str,
+    files: Dict[str, Path],
+    sheet: Optional[str],
+    legacy_outdir: Optional[Path],
+    debug: bool,
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, str]]:
+    """แปลงทุก statement ของบริษัทเดียว คืน (tax_id, long rows, errors)"""
+    rows: List[Dict[str, Any]] = []
+    errors: Dict[str, str] = {}
+    for stmt in STATEMENTS:
+        path = files.get(stmt)
+        if path is None:
+            continue
+        try:
+            data = CONVERTERS[stmt](path, tax_id, sheet, debug)
+        except Exception as e:
+            errors[stmt] = str(e)
+            continue
+        rows.extend(year_json_to_rows(data, stmt))
+        if legacy_outdir is not None:
+            legacy_outdir.mkdir(parents=True, exist_ok=True)
+            with open(legacy_outdir / f"{tax_id}_{stmt}.json", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+    return tax_id, rows, errors
+
+
+# ---------------- output ---------------- #
+
+def rows_to_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df["year"] = df["year"].astype("int16")
+    df["statement"] = df["statement"].astype("category")
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").astype("float64")
+    df["pct_change"] = pd.to_numeric(df["pct_change"], errors="coerce").astype("float64")
+    return df
+
+
+def parquet_engine_available() -> bool:
+    return any(importlib.util.find_spec(m) is not None for m in ("pyarrow", "fastparquet"))
+
+
+def write_parquet(df: pd.DataFrame, out_path: Path) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, out_path)
+
+
+# ---------------- CLI ---------------- #
+
+def main():
+    ap = argparse.ArgumentParser(description="Read all DBD *_balance/_income/_ratios Excel → one long-format Parquet table")
+    ap.add_argument("--folder", required=True, help="input folder (e.g. ./downloads)")
+    ap.add_argument("--out", required=True, help="output .parquet path")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="process pool size (default: CPU count)")
+    ap.add_argument("--sheet", default=None, help="sheet name for balance/ratios (default: first sheet)")
+    ap.add_argument("--legacy-json", action="store_true", help="also write <tax_id>_<statement>.json like the single scripts")
+    ap.add_argument("--outdir", default=None, help="folder for --legacy-json (default: folder of --out)")
+    ap.add_argument("--debug", action="store_true")
+    args = ap.parse_args()
+
+    folder = Path(args.folder).expanduser().resolve()
+    out_path = Path(args.out).expanduser().resolve()
+    legacy_outdir = None
+    if args.legacy_json:
+        legacy_outdir = Path(args.outdir).expanduser().resolve() if args.outdir else out_path.parent
+
+    if not parquet_engine_available():
+        print("❌ Parquet engine missing; pip install pyarrow", file=sys.stderr)
+        sys.exit(2)
+
+    companies = discover_companies(folder)
+    if not companies:
+        print("No *_balance/_income/_ratios .xls/.xlsx files found.")
+        return
+
+    n_files = sum(len(v) for v in companies.values())
+    print(f"▶ {len(companies)} companies, {n_files} files, workers={args.workers}")
+
+    t0 = time.time()
+    all_rows: List[Dict[str, Any]] = []
+    failures: Dict[str, Dict[str, str]] = {}
+
+    if args.workers <= 1:
+        results = (process_company(tid, files, args.sheet, legacy_outdir, args.debug) for tid, files in companies.items())
+        for tid, rows, errors in results:
+            all_rows.extend(rows)
+            if errors:
+                failures[tid] = errors
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            futs = [
+                ex.submit(process_company, tid, files, args.sheet, legacy_outdir, args.debug)
+                for tid, files in companies.items()
+            ]
+            for fut in as_completed(futs):
+                tid, rows, errors = fut.result()
+                all_rows.extend(rows)
+                if errors:
+                    failures[tid] = errors
+
+    df = rows_to_frame(all_rows)
+    df = df.sort_values(["tax_id", "statement", "year"], kind="stable").reset_index(drop=True)
+    write_parquet(df, out_path)
+
+    elapsed = time.time() - t0
+    print(f"✔ wrote {out_path} (rows={len(df)}, companies={len(companies)}, {elapsed:.1f}s)")
+    if legacy_outdir is not None:
+        print(f"✔ legacy JSON → {legacy_outdir}")
+    for tid, errors in failures.items():
+        for stmt, msg in errors.items():
+            print(f"  ⚠ {tid} {stmt}: {msg}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,12 @@ script_read_dbd_income.py — robust reader for DBD *_income.xls/xlsx → JSON (
 - คง "รายการ" (item_th) และลำดับตามไฟล์จริง (orig_index)
 - map item_en ตาม TH_TO_EN_INCOME (ยืดหยุ่นเรื่องวงเล็บ/ช่องว่าง) ไม่เจอแมป → "unknown"
 - รองรับ .xls/.xlsx และกรณี .xlsx ที่จริงเป็น .xls (BadZipFile)
-- ลองอ่านตามชนิดไฟล์: xlsx→openpyxl ; xls→xlrd(<2.0)→calamine ; ท้ายสุด read_html
+- เลือก engine จาก magic bytes ครั้งเดียว (calamine ก่อน) และจำ engine ที่สำเร็จต่อชนิดไฟล์
 - ค่า '-', '–', '—', '0', '0.0' หรือค่าเลขที่เป็นศูนย์ → 0.0 เสมอ (และจะถูกเขียนลง JSON)
 - JSON รูปแบบ: { "<year>": [ { item, item_en, amount, pct_change, tax_id }, ... ] }
 
 วิธีใช้:
-  pip install "xlrd==1.2.0" pandas openpyxl pandas-calamine
+  pip install "pandas>=2.2" python-calamine openpyxl "xlrd==1.2.0"
   python script_read_dbd_income.py --folder ./downloads --outdir ./out_json --debug
 """
 
@@ -26,6 +26,9 @@ from typing import Any, Dict, List, Optional
 
 import pandas as pd
 
+from services.excel_reader import read_excel_any
+from services.item_index import ItemNameIndex
+
 
 # ---------------- Utils ---------------- #
 
@@ -142,125 +145,39 @@ def _canon_title(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
+# ดัชนีสร้างครั้งเดียว:
+#   1) ชื่อหลัง _canon_title ตรง key
+#   2) ลบวงเล็บทั้งหมดเป็น fallback
+#   3) regex fallback สำหรับกลุ่ม "กำไร(ขาดทุน) ..."
+#      - ขั้นต้น → gross_profit
+#      - ก่อนภาษี → profit_before_tax
+#      - สุทธิ → net_profit
+ITEM_INDEX = ItemNameIndex(
+    TH_TO_EN_INCOME,
+    canon=_canon_title,
+    canon_keys=False,  # เทียบกับ key ตามที่เขียนไว้ใน TH_TO_EN_INCOME เท่านั้น (พฤติกรรมเดิม)
+    variants=[lambda name: re.sub(r"[()（）\[\]{}]", "", name).strip()],
+    rules=[
+        (r"^กำไร\(ขาดทุน\).*ขั้นต้น", "gross_profit"),
+        (r"^กำไร\(ขาดทุน\).*ก่อนภาษี", "profit_before_tax"),
+        (r"^กำไร\(ขาดทุน\).*สุทธิ", "net_profit"),
+    ],
+)
+
 def map_item_th_to_en(th_name: Any) -> str:
     if is_none_or_nan(th_name):
         return "unknown"
-
-    name = _canon_title(str(th_name))
-
-    # 1) ลองตรง ๆ ก่อน
-    if name in TH_TO_EN_INCOME:
-        return TH_TO_EN_INCOME[name]
-
-    # 2) ลบวงเล็บทั้งหมดเป็น fallback
-    name_no_paren = re.sub(r"[()（）\[\]{}]", "", name).strip()
-    if name_no_paren in TH_TO_EN_INCOME:
-        return TH_TO_EN_INCOME[name_no_paren]
-
-    # 3) regex fallback สำหรับกลุ่ม "กำไร(ขาดทุน) ..."
-    #    - ขั้นต้น → gross_profit
-    #    - ก่อนภาษี → profit_before_tax
-    #    - สุทธิ → net_profit
-    if name.startswith("กำไร(ขาดทุน)"):
-        if "ขั้นต้น" in name:
-            return "gross_profit"
-        if "ก่อนภาษี" in name:
-            return "profit_before_tax"
-        if "สุทธิ" in name:
-            return "net_profit"
-
-    return "unknown"
+    return ITEM_INDEX.lookup(th_name)
 
 
 # ---------------- Sniff & Readers ---------------- #
 
-def magic_bytes(path: Path, n: int = 8) -> bytes:
-    with open(path, "rb") as f:
-        return f.read(n)
-
-def sniff_kind(path: Path) -> str:
-    sig = magic_bytes(path, 8)
-    if sig.startswith(b"PK\x03\x04"):
-        return "xlsx"
-    if sig.startswith(b"\xD0\xCF\x11\xE0"):
-        return "xls"
-    # ถ้า magic bytes ไม่ชัดเจน ใช้นามสกุลช่วยตัดสิน
-    ext = path.suffix.lower()
-    if ext == ".xlsx":
-        return "xlsx"
-    if ext == ".xls":
-        return "xls"
-    return "unknown"
-
-def _read_openpyxl(path: Path) -> pd.DataFrame:
-    return pd.read_excel(path, engine="openpyxl", header=None)
-
-def _read_xlrd(path: Path) -> pd.DataFrame:
-    # ต้อง xlrd<2.0 สำหรับ .xls
-    return pd.read_excel(path, engine="xlrd", header=None)
-
-def _read_calamine(path: Path) -> pd.DataFrame:
-    # ต้องติดตั้ง pandas-calamine
-    return pd.read_excel(path, engine="calamine", header=None)
-
 def read_income_table(path: Path, debug: bool) -> pd.DataFrame:
     """
     อ่านไฟล์ Excel income ให้ได้ DataFrame ดิบ (ไม่ tidy)
-    ลำดับความพยายาม:
-      - ถ้า sniff เป็น xlsx: openpyxl → (เผื่อไฟล์จริงเป็น xls) xlrd → calamine → read_html
-      - ถ้า sniff เป็น xls/unknown: xlrd → calamine → (เผื่อจริงเป็น xlsx) openpyxl → read_html
+    เลือก engine จาก magic bytes ตั้งแต่ครั้งแรก (calamine ก่อนถ้ามี) ดู services/excel_reader.py
     """
-    kind = sniff_kind(path)
-    log(debug, f"  ↪ sniffed kind: {kind} for {path.name}")
-    tried = []
-
-    if kind == "xlsx":
-        try:
-            df = _read_openpyxl(path)
-            log(debug, f"  ✔ read with openpyxl: shape={df.shape}")
-            return df
-        except Exception as e:
-            tried.append(("openpyxl", str(e)))
-            log(debug, f"  ⚠ openpyxl failed (maybe actually .xls): {e}")
-        for eng_name, reader in (("xlrd", _read_xlrd), ("calamine", _read_calamine)):
-            try:
-                df = reader(path)
-                log(debug, f"  ✔ read with {eng_name}: shape={df.shape}")
-                return df
-            except Exception as e:
-                tried.append((eng_name, str(e)))
-                log(debug, f"  ⚠ failed read with {eng_name}: {e}")
-    else:
-        # xls หรือ unknown
-        for eng_name, reader in (("xlrd", _read_xlrd), ("calamine", _read_calamine)):
-            try:
-                df = reader(path)
-                log(debug, f"  ✔ read with {eng_name}: shape={df.shape}")
-                return df
-            except Exception as e:
-                tried.append((eng_name, str(e)))
-                log(debug, f"  ⚠ failed read with {eng_name}: {e}")
-        # เผื่อเป็น xlsx จริง
-        try:
-            df = _read_openpyxl(path)
-            log(debug, f"  ✔ read with openpyxl (fallback): shape={df.shape}")
-            return df
-        except Exception as e:
-            tried.append(("openpyxl", str(e)))
-            log(debug, f"  ⚠ openpyxl fallback failed: {e}")
-
-    # ทางหนีไฟ: html/ตารางฝัง
-    try:
-        tables = pd.read_html(path, header=None)
-        if tables:
-            df = tables[0]
-            log(debug, f"  ✔ read with read_html: shape={df.shape}")
-            return df
-    except Exception as e:
-        tried.append(("read_html", str(e)))
-        log(debug, f"  ⚠ failed read_html: {e}")
-
-    raise RuntimeError(f"Cannot read Excel file: {path.name}; tried={tried}")
+    return read_excel_any(path, None, debug)
 
 
 # ---------------- Tidy ---------------- #
@@ -357,30 +274,30 @@ def dataframe_to_year_json(df: pd.DataFrame, tax_id: str, debug: bool) -> Dict[s
 
     years = [c for c in df.columns if c not in ("item_th", "orig_index")]
     out: Dict[str, List[Dict[str, Any]]] = {y: [] for y in years}
-
-    for _, row in df.iterrows():
-        item_th = str(row["item_th"]).strip()
-        item_en = map_item_th_to_en(item_th)
-        order = int(row["orig_index"])
-
-        for y in years:
-            val = row[y]
-            if is_none_or_nan(val):
-                continue
-            out[y].append({
-                "item": item_th,
-                "item_en": item_en,
+    if not years:
+        return out
+
+    items = df["item_th"].astype(str).str.strip()
+    wide = df[years].copy()
+    wide.insert(0, "_item", items)
+    wide.insert(1, "_order", df["orig_index"].astype(int))
+    long = wide.melt(id_vars=["_item", "_order"], value_vars=years, var_name="_year", value_name="_amount")
+    long = long[long["_amount"].notna()]
+
+    en_by_th = {th: map_item_th_to_en(th) for th in set(items)}
+    for y, grp in long.groupby("_year", sort=False):
+        # เรียงตามลำดับเดิม
+        grp = grp.sort_values("_order", kind="stable")
+        out[y] = [
+            {
+                "item": th,
+                "item_en": en_by_th[th],
                 "amount": float(val),   # '-' / 0 ถูกแปลงเป็น 0.0 แล้ว
                 "pct_change": None,     # งบกำไรขาดทุนทั่วไปไม่มี %change
                 "tax_id": tax_id,
-                "_order": order,
-            })
-
-    # เรียงตามลำดับเดิม
-    for y in years:
-        out[y].sort(key=lambda d: d["_order"])
-        for d in out[y]:
-            d.pop("_order", None)
+            }
+            for th, val in zip(grp["_item"].tolist(), grp["_amount"].tolist())
+        ]
 
     return out
 
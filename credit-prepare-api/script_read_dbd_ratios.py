@@ -12,7 +12,7 @@ script_read_dbd_ratios.py (v2.2)
 - กัน "None"/NaN ทั้งใน item และ amount ไม่ให้หลุดลง JSON
 
 Usage:
-  pip install "xlrd==1.2.0" pandas openpyxl pandas-calamine
+  pip install "pandas>=2.2" python-calamine openpyxl "xlrd==1.2.0"
   python script_read_dbd_ratios.py --folder ./downloads --outdir ./out_json --debug
 """
 
@@ -26,6 +26,9 @@ from typing import Any, Dict, List, Optional
 
 import pandas as pd
 
+from services.excel_reader import read_excel_any
+from services.item_index import ItemNameIndex
+
 # ========= Utils ========= #
 
 def log(debug: bool, *args):
@@ -104,60 +107,39 @@ TH_TO_EN_FULL: Dict[str, str] = {
     "อัตราส่วนหนี้สินรวมต่อทุนดำเนินงาน (เท่า)": "debt_to_working_capital_ratio_times",
 }
 
+# ดัชนีสร้างครั้งเดียว: key เทียบหลัง normalize_spaces, ที่เหลือใช้ regex fallback ตามลำดับ
+ITEM_INDEX = ItemNameIndex(
+    TH_TO_EN_FULL,
+    canon=normalize_spaces,
+    rules=[
+        (r"(?i)ROA", "return_on_assets_roa_percent"),
+        (r"(?i)ROE", "return_on_equity_roe_percent"),
+        (r"กำไรขั้นต้น", "gross_profit_margin_percent"),
+        (r"กำไรการดำเนินงาน|กำไรจากการดำเนินงาน", "operating_profit_margin_percent"),
+        (r"กำไรสุทธิ", "net_profit_margin_percent"),
+        (r"ทุนหมุนเวียน", "current_ratio_times"),
+        (r"ลูกหนี้", "accounts_receivable_turnover_times"),
+        (r"สินค้าคงเหลือ", "inventory_turnover_times"),
+        (r"เจ้าหนี้", "accounts_payable_turnover_times"),
+        (r"^(?=.*สินทรัพย์รวม)(?=.*หมุนเวียน)", "total_asset_turnover_times"),
+        (r"ค่าใช้จ่ายการดำเนินงานต่อรายได้รวม", "operating_expense_ratio_percent"),
+        (r"สินทรัพย์รวมต่อส่วนของผู้ถือหุ้น", "total_assets_to_shareholders_equity_ratio_times"),
+        (r"หนี้สินรวมต่อสินทรัพย์รวม", "total_liabilities_to_total_assets_ratio_times"),
+        (r"หนี้สินรวมต่อส่วนของผู้ถือหุ้น", "debt_to_equity_ratio_times"),
+        (r"หนี้สินรวมต่อทุนดำเนินงาน", "debt_to_working_capital_ratio_times"),
+    ],
+)
+
 def map_item_th_to_en(th_name: Any) -> str:
     if is_none_or_nan(th_name):
         return "unknown"
-    s = str(th_name).strip()
-    if s in TH_TO_EN_FULL:
-        return TH_TO_EN_FULL[s]
-    s_norm = normalize_spaces(s)
-    for k, v in TH_TO_EN_FULL.items():
-        if normalize_spaces(k) == s_norm:
-            return v
-    up = s.upper()
-    if "ROA" in up: return "return_on_assets_roa_percent"
-    if "ROE" in up: return "return_on_equity_roe_percent"
-    if "กำไรขั้นต้น" in s: return "gross_profit_margin_percent"
-    if "กำไรการดำเนินงาน" in s or "กำไรจากการดำเนินงาน" in s: return "operating_profit_margin_percent"
-    if "กำไรสุทธิ" in s: return "net_profit_margin_percent"
-    if "ทุนหมุนเวียน" in s: return "current_ratio_times"
-    if "ลูกหนี้" in s: return "accounts_receivable_turnover_times"
-    if "สินค้าคงเหลือ" in s: return "inventory_turnover_times"
-    if "เจ้าหนี้" in s: return "accounts_payable_turnover_times"
-    if "สินทรัพย์รวม" in s and "หมุนเวียน" in s: return "total_asset_turnover_times"
-    if "ค่าใช้จ่ายการดำเนินงานต่อรายได้รวม" in s: return "operating_expense_ratio_percent"
-    if "สินทรัพย์รวมต่อส่วนของผู้ถือหุ้น" in s: return "total_assets_to_shareholders_equity_ratio_times"
-    if "หนี้สินรวมต่อสินทรัพย์รวม" in s: return "total_liabilities_to_total_assets_ratio_times"
-    if "หนี้สินรวมต่อส่วนของผู้ถือหุ้น" in s: return "debt_to_equity_ratio_times"
-    if "หนี้สินรวมต่อทุนดำเนินงาน" in s: return "debt_to_working_capital_ratio_times"
-    return "unknown"
+    return ITEM_INDEX.lookup(th_name)
 
 # ========= Readers ========= #
 
-def detect_ooxml_zip_signature(path: Path) -> bool:
-    try:
-        with path.open("rb") as f:
-            return f.read(4) == b"PK\x03\x04"
-    except Exception:
-        return False
-
 def read_ratios_table(path: Path, sheet: Optional[str], debug: bool) -> pd.DataFrame:
-    suffix = path.suffix.lower()
-    is_zip = detect_ooxml_zip_signature(path)
-    log(debug, f"  ↪ detected suffix: {suffix}, is_zip={is_zip}")
-    sheet_name = sheet if sheet is not None else 0
-
-    engines = (["openpyxl"] if is_zip else []) + ["xlrd", "calamine", None]
-    tried = []
-    for engine in engines:
-        try:
-            df = pd.read_excel(path, engine=engine, header=None, sheet_name=sheet_name)
-            log(debug, f"  ✔ read_excel({engine or 'auto'}) ok: shape={df.shape}")
-            return df
-        except Exception as e:
-            tried.append((engine or "auto", str(e)))
-            log(debug, f"  ⚠ failed read_excel({engine or 'auto'}): {e}")
-    raise RuntimeError(f"Cannot read Excel file: {path.name}; tried={tried}")
+    log(debug, f"  ↪ detected suffix: {path.suffix.lower()}")
+    return read_excel_any(path, sheet, debug)
 
 # ========= Tidy ========= #
 
@@ -207,18 +189,12 @@ def tidy_ratios_table(df_raw: pd.DataFrame, debug: bool) -> pd.DataFrame:
     sample = body_all.head(80)
 
     # ใช้ mapping ไทยเพื่อช่วยบอกคะแนน
-    th_keys = set(TH_TO_EN_FULL.keys())
+    def in_map(x):
+        return not is_none_or_nan(x) and x in ITEM_INDEX
 
     for c in non_year_candidates:
         col_series = sample.iloc[:, c]
         label_like = col_series.map(_looks_like_label).sum()
-
-        def in_map(x):
-            if is_none_or_nan(x):
-                return False
-            s = normalize_spaces(str(x))
-            return s in th_keys or normalize_spaces(s) in {normalize_spaces(k) for k in th_keys}
-
         mapped_cnt = col_series.map(in_map).sum()
         # ถ้า cell เป็น label-like มาก + เจอใน mapping จะได้คะแนนสูง
         score = int(label_like) * 2 + int(mapped_cnt) * 3
@@ -265,36 +241,34 @@ def tidy_ratios_table(df_raw: pd.DataFrame, debug: bool) -> pd.DataFrame:
 def dataframe_to_year_json(df: pd.DataFrame, tax_id: str, debug: bool) -> Dict[str, List[Dict[str, Any]]]:
     years = [c for c in df.columns if c not in ("item_th", "orig_index")]
     out: Dict[str, List[Dict[str, Any]]] = {y: [] for y in years}
-
-    for _, row in df.iterrows():
-        if is_none_or_nan(row["item_th"]):
-            # กัน item ว่าง (จะไม่ปล่อย "None" ลง JSON)
-            continue
-        item_th = str(row["item_th"]).strip()
-        if item_th == "":
-            continue
-
-        item_en = map_item_th_to_en(item_th)
-        order = int(row["orig_index"])
-
-        for y in years:
-            val = row[y]
-            if is_none_or_nan(val):
-                continue
-            out[y].append({
-                "item": item_th,          # ไทยตามไฟล์ (trim)
-                "item_en": item_en,       # อังกฤษ snake_case
-                "amount": float(val),     # ไม่ปล่อย NaN
+    if df.empty or not years:
+        return out
+
+    # กัน item ว่าง (จะไม่ปล่อย "None" ลง JSON)
+    work = df[~df["item_th"].map(is_none_or_nan)]
+    items = work["item_th"].astype(str).str.strip()
+    work, items = work[items != ""], items[items != ""]
+
+    wide = work[years].copy()
+    wide.insert(0, "_item", items)
+    wide.insert(1, "_order", work["orig_index"].astype(int))
+    long = wide.melt(id_vars=["_item", "_order"], value_vars=years, var_name="_year", value_name="_amount")
+    long = long[long["_amount"].notna()]
+
+    en_by_th = {th: map_item_th_to_en(th) for th in set(items)}
+    for y, grp in long.groupby("_year", sort=False):
+        # เรียงตามลำดับเดิมในไฟล์
+        grp = grp.sort_values("_order", kind="stable")
+        out[y] = [
+            {
+                "item": th,                 # ไทยตามไฟล์ (trim)
+                "item_en": en_by_th[th],    # อังกฤษ snake_case
+                "amount": float(val),       # ไม่ปล่อย NaN
                 "pct_change": None,
                 "tax_id": tax_id,
-                "_order": order
-            })
-
-    # เรียงตามลำดับเดิมในไฟล์
-    for y in years:
-        out[y].sort(key=lambda d: d["_order"])
-        for d in out[y]:
-            d.pop("_order", None)
+            }
+            for th, val in zip(grp["_item"].tolist(), grp["_amount"].tolist())
+        ]
     return out
 
 # ========= Orchestration ========= #
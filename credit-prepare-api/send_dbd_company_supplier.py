@@ -23,9 +23,19 @@ send_dbd_company_supplier.py
   # เพิ่มฟิลด์เอง
   python send_dbd_company_supplier.py downloads --extra project=SMF source=dbd
 
+  # ส่งพร้อมกัน 8 request (session เดียว, connection pool), แสดง payload/response เต็ม
+  python send_dbd_company_supplier.py downloads --concurrency 8 --verbose
+
+  # bulk: รวม 50 บริษัทต่อ request ไปที่ <api-url>/bulk (Laravel bootstrap + transaction ครั้งเดียวต่อ batch)
+  python send_dbd_company_supplier.py downloads --bulk --batch-size 50 --concurrency 2
+
 หมายเหตุ:
 - จะดึง juristic_id อัตโนมัติจากชื่อไฟล์และแนบเป็นฟิลด์ 'juristic_id'
 - ถ้าไฟล์ JSON มี key เดียวกัน จะไม่เขียนทับค่าเดิม
+- ค่าเริ่มต้นพิมพ์หนึ่งบรรทัดต่อไฟล์ (ไม่ dump payload) — ใช้ --verbose เมื่อต้องการดู body
+- hash ของ payload ที่ส่งสำเร็จถูกเก็บใน --ledger → รันซ้ำจะข้ามบริษัทที่ข้อมูลไม่เปลี่ยน (--force ส่งทั้งหมด)
+  (ledger ผูกกับ --api-url ทั้งโหมดปกติและ --bulk → สลับโหมดแล้วไม่ส่งซ้ำ)
+- --bulk: ผลรายบริษัท (results[].index) ถูก map กลับไปยังไฟล์; บริษัทที่ล้มเหลวไม่กระทบบริษัทอื่นใน batch
 """
 
 import argparse
@@ -34,13 +44,49 @@ import json
 import os
 import re
 import sys
-from typing import Dict, List, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+
+from services.sent_ledger import SentLedger, canonical_json
 
 # -------------------------------
 # CONFIG / PATTERN
 # -------------------------------
 JID_FROM_NAME = re.compile(r"^(\d{10,13})_company_info_structured\.json$", re.IGNORECASE)
 
+OK, FAIL, SKIPPED = "ok", "fail", "skipped"
+
+
+@dataclass
+class SendResult:
+    path: str
+    status: str                        # ok | fail | skipped
+    http_status: Optional[int] = None
+    seconds: float = 0.0               # เวลา request (ไม่รวมโหลดไฟล์); bulk = เวลาของทั้ง batch
+    message: str = ""
+    batch: int = 0                     # จำนวนบริษัทใน request เดียวกัน (bulk)
+
+    def line(self, api_url: str) -> str:
+        name = os.path.basename(self.path)
+        took = f"{self.seconds:.2f}s" + (f", batch of {self.batch}" if self.batch else "")
+        if self.status == SKIPPED:
+            return f"⏩ unchanged {name} (ส่งแล้ว)"
+        if self.status == OK:
+            return f"✅ OK [{self.http_status}] {name} → {api_url} ({took})"
+        code = self.http_status if self.http_status is not None else "ERR"
+        return f"❌ FAIL [{code}] {name} → {api_url} ({took}) {self.message}".rstrip()
+
+
+@dataclass
+class Prepared:
+    path: str
+    key: str        # juristic_id (หรือชื่อไฟล์) สำหรับ ledger
+    payload: Dict[str, Any]
+    body: bytes     # JSON แบบ canonical ที่ส่งจริง
+    digest: str
+
 
 # -------------------------------
 # HELPERS
@@ -82,30 +128,13 @@ def load_json(path: str) -> Dict[str, Any]:
         return json.load(f)
 
 
-def post_json(
+def build_payload(
     json_path: str,
-    api_url: str,
-    timeout: int,
     auto_jid: bool,
     extra_fields: Optional[Dict[str, str]] = None,
-) -> bool:
-    """ส่งไฟล์ JSON เป็น raw JSON body"""
-    try:
-        import requests
-    except ImportError:
-        print("❌ ต้องติดตั้ง requests ก่อน: pip install requests", file=sys.stderr)
-        return False
-
-    if not os.path.isfile(json_path):
-        print(f"❌ ไม่พบไฟล์: {json_path}", file=sys.stderr)
-        return False
-
-    # โหลดเนื้อหา JSON
-    try:
-        payload = load_json(json_path)
-    except Exception as e:
-        print(f"❌ โหลด JSON ไม่ได้ ({json_path}): {e}", file=sys.stderr)
-        return False
+) -> Dict[str, Any]:
+    """โหลด JSON + แนบ juristic_id / extra fields (ไม่ทับ key ที่มีอยู่)"""
+    payload = load_json(json_path)
 
     # แนบ juristic_id จากชื่อไฟล์
     if auto_jid:
@@ -118,30 +147,177 @@ def post_json(
         for k, v in extra_fields.items():
             if k not in payload:
                 payload[k] = v
+    return payload
+
+
+def prepare(json_path: str, auto_jid: bool, extra_fields: Optional[Dict[str, str]] = None) -> Prepared:
+    """โหลด + สร้าง payload + body/hash สำหรับส่งและเทียบ ledger"""
+    payload = build_payload(json_path, auto_jid, extra_fields)
+    body, digest = canonical_json(payload)
+    key = str(payload.get("juristic_id") or os.path.basename(json_path))
+    return Prepared(json_path, key, payload, body, digest)
+
+
+def make_session(pool_size: int = 1):
+    """requests.Session ที่ใช้ connection ซ้ำ (keep-alive) รองรับ pool_size request พร้อมกัน"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Content-Type"] = "application/json; charset=utf-8"
+    return session
+
+
+def send_one(
+    json_path: str,
+    api_url: str,
+    timeout: int,
+    auto_jid: bool,
+    extra_fields: Optional[Dict[str, str]] = None,
+    session=None,
+    ledger: Optional[SentLedger] = None,
+    force: bool = False,
+    verbose: bool = False,
+) -> SendResult:
+    """ส่งไฟล์ JSON หนึ่งไฟล์; ถ้ามี ledger และ payload ไม่เปลี่ยนจากครั้งที่ส่งสำเร็จ → skipped"""
+    if not os.path.isfile(json_path):
+        return SendResult(json_path, FAIL, message="ไม่พบไฟล์")
+
+    # โหลดเนื้อหา JSON
+    try:
+        item = prepare(json_path, auto_jid, extra_fields)
+    except Exception as e:
+        return SendResult(json_path, FAIL, message=f"โหลด JSON ไม่ได้: {e}")
+
+    if ledger is not None and not force and ledger.unchanged(api_url, item.key, item.digest):
+        return SendResult(json_path, SKIPPED)
 
-    # แสดง log body (preview)
-    preview = json.dumps(payload, ensure_ascii=False, indent=2)
-    print(f"📦 Payload for {os.path.basename(json_path)}:\n{preview}\n")
+    if verbose:
+        preview = json.dumps(item.payload, ensure_ascii=False, indent=2)
+        print(f"📦 Payload for {os.path.basename(json_path)}:\n{preview}\n")
 
     # ส่งไปยัง API
+    own_session = session is None
+    if own_session:
+        session = make_session()
+    t0 = time.monotonic()
     try:
-        resp = requests.post(api_url, json=payload, timeout=timeout)
-        status = resp.status_code
-        body_preview = (resp.text or "")[:800]
-        if 200 <= status < 300:
-            print(f"✅ OK [{status}] {os.path.basename(json_path)} → {api_url}")
-            if body_preview:
-                print(f"    Response: {body_preview}")
-            return True
-        else:
-            print(f"❌ FAIL [{status}] {os.path.basename(json_path)} → {api_url}", file=sys.stderr)
-            if body_preview:
-                print(f"    Response: {body_preview}", file=sys.stderr)
-            return False
+        resp = session.post(api_url, data=item.body, timeout=timeout)
     except Exception as e:
-        print(f"❌ ERROR posting {json_path}: {e}", file=sys.stderr)
+        return SendResult(json_path, FAIL, seconds=time.monotonic() - t0, message=str(e))
+    finally:
+        if own_session:
+            session.close()
+    seconds = time.monotonic() - t0
+
+    status = resp.status_code
+    body_preview = (resp.text or "")[:800]
+    if 200 <= status < 300:
+        if ledger is not None:
+            ledger.record(api_url, item.key, item.digest)
+        if verbose and body_preview:
+            print(f"    Response: {body_preview}")
+        return SendResult(json_path, OK, status, seconds)
+    return SendResult(json_path, FAIL, status, seconds, message=body_preview if verbose else body_preview[:200])
+
+
+def post_json(
+    json_path: str,
+    api_url: str,
+    timeout: int,
+    auto_jid: bool,
+    extra_fields: Optional[Dict[str, str]] = None,
+    session=None,
+    verbose: bool = False,
+) -> bool:
+    """ส่งไฟล์ JSON เป็น raw JSON body"""
+    try:
+        import requests  # noqa: F401
+    except ImportError:
+        print("❌ ต้องติดตั้ง requests ก่อน: pip install requests", file=sys.stderr)
         return False
 
+    res = send_one(json_path, api_url, timeout, auto_jid, extra_fields, session=session, verbose=verbose)
+    print(res.line(api_url), file=sys.stdout if res.status == OK else sys.stderr)
+    return res.status == OK
+
+
+def bulk_url_for(api_url: str) -> str:
+    return api_url.rstrip("/") + "/bulk"
+
+
+def send_batch(
+    items: List[Prepared],
+    bulk_url: str,
+    ledger_url: str,
+    timeout: int,
+    session=None,
+    ledger: Optional[SentLedger] = None,
+    verbose: bool = False,
+) -> Tuple[List[SendResult], float]:
+    """
+    ส่งหลายบริษัทเป็น JSON array ใน request เดียว → (ผลรายไฟล์, เวลา request)
+    response: {"results": [{"index": i, "ok": bool, "status": 201|200|422|500, ...}, ...]}
+    request ล้มทั้งก้อน (network / non-2xx) → ทุกไฟล์ใน batch เป็น FAIL
+    """
+    n = len(items)
+    body = b"[" + b",".join(it.body for it in items) + b"]"
+    own_session = session is None
+    if own_session:
+        session = make_session()
+    t0 = time.monotonic()
+    try:
+        resp = session.post(bulk_url, data=body, timeout=timeout)
+    except Exception as e:
+        seconds = time.monotonic() - t0
+        return [SendResult(it.path, FAIL, seconds=seconds, message=str(e), batch=n) for it in items], seconds
+    finally:
+        if own_session:
+            session.close()
+    seconds = time.monotonic() - t0
+
+    status = resp.status_code
+    try:
+        per_item = {int(r["index"]): r for r in resp.json().get("results", [])}
+    except Exception:
+        per_item = {}
+    if not (200 <= status < 300) or not per_item:
+        text = resp.text or ""
+        msg = text[:800] if verbose else text[:200]
+        return [SendResult(it.path, FAIL, status, seconds, msg or "ไม่มีผลรายบริษัท", batch=n) for it in items], seconds
+
+    out: List[SendResult] = []
+    for i, it in enumerate(items):
+        r = per_item.get(i)
+        if r is None:
+            out.append(SendResult(it.path, FAIL, status, seconds, "ไม่มีผลของรายการนี้ใน response", batch=n))
+        elif r.get("ok"):
+            if ledger is not None:
+                ledger.record(ledger_url, it.key, it.digest)
+            out.append(SendResult(it.path, OK, r.get("status", status), seconds, batch=n))
+        else:
+            detail = r.get("messages") or r.get("error") or ""
+            msg = json.dumps(detail, ensure_ascii=False) if not isinstance(detail, str) else detail
+            out.append(SendResult(it.path, FAIL, r.get("status"), seconds, msg if verbose else msg[:200], batch=n))
+    if verbose:
+        print(f"    Response: {(resp.text or '')[:800]}")
+    return out, seconds
+
+
+def latency_summary(latencies: List[float], wall: float, items: int) -> str:
+    xs = sorted(latencies)
+    if not xs:
+        return ""
+    p = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))]
+    rate = f"{len(xs) / wall:.1f} req/s, {items / wall:.1f} companies/s" if wall else ""
+    return (
+        f"⏱ request latency: n={len(xs)} p50={p(0.5):.2f}s p90={p(0.9):.2f}s p99={p(0.99):.2f}s max={xs[-1]:.2f}s"
+        f" · wall {wall:.1f}s · {rate}"
+    )
+
 
 # -------------------------------
 # MAIN
@@ -154,6 +330,14 @@ def main():
     ap.add_argument("--timeout", type=int, default=30, help="timeout วินาที")
     ap.add_argument("--extra", nargs="*", default=[], help="แนบฟิลด์เพิ่มเติม key=value หลายคู่ได้")
     ap.add_argument("--no-auto-jid", action="store_true", help="ไม่ต้องเพิ่ม juristic_id อัตโนมัติจากชื่อไฟล์")
+    ap.add_argument("--concurrency", type=int, default=1, help="จำนวน request พร้อมกัน (thread + connection pool)")
+    ap.add_argument("--verbose", action="store_true", help="แสดง payload และ response เต็ม (ช้าเมื่อไฟล์เยอะ)")
+    ap.add_argument("--ledger", default="./pipeline/dbd_sent_ledger.sqlite", help="ไฟล์ SQLite เก็บ hash ของ payload ที่ส่งสำเร็จ")
+    ap.add_argument("--no-ledger", action="store_true", help="ไม่ใช้ ledger (ส่งทุกไฟล์ ไม่บันทึก)")
+    ap.add_argument("--force", action="store_true", help="ส่งทุกไฟล์แม้ payload ไม่เปลี่ยน (ยังบันทึก ledger)")
+    ap.add_argument("--bulk", action="store_true", help="ส่งหลายบริษัทต่อ request ไปที่ bulk endpoint")
+    ap.add_argument("--batch-size", type=int, default=50, help="จำนวนบริษัทต่อ request ในโหมด --bulk")
+    ap.add_argument("--bulk-url", default=None, help="ปลายทาง bulk (default: <api-url>/bulk)")
 
     args = ap.parse_args()
 
@@ -174,25 +358,91 @@ def main():
     print(f"พบ {len(files)} ไฟล์")
     print(f"API URL : {args.api_url}")
     print(f"Timeout : {args.timeout}s")
+    print(f"Workers : {max(1, args.concurrency)}")
+    bulk_url = args.bulk_url or bulk_url_for(args.api_url)
+    batch_size = max(1, args.batch_size)
+    if args.bulk:
+        print(f"Bulk    : {batch_size}/request → {bulk_url}")
     if extra_fields:
         print(f"Extra   : {extra_fields}")
     print("------------------------------------------------------------")
 
-    ok, fail = 0, 0
-    for i, fp in enumerate(files, start=1):
-        print(f"[{i}/{len(files)}] {fp}")
-        success = post_json(
+    try:
+        session = make_session(args.concurrency)
+    except ImportError:
+        print("❌ ต้องติดตั้ง requests ก่อน: pip install requests", file=sys.stderr)
+        sys.exit(2)
+    ledger = None if args.no_ledger else SentLedger(args.ledger)
+
+    def job(fp: str) -> SendResult:
+        return send_one(
             json_path=fp,
             api_url=args.api_url,
             timeout=args.timeout,
             auto_jid=not args.no_auto_jid,
             extra_fields=extra_fields,
+            session=session,
+            ledger=ledger,
+            force=args.force,
+            verbose=args.verbose,
         )
-        ok += 1 if success else 0
-        fail += 0 if success else 1
 
+    def batch_job(items: List[Prepared]) -> Tuple[List[SendResult], float]:
+        return send_batch(items, bulk_url, args.api_url, args.timeout, session=session, ledger=ledger, verbose=args.verbose)
+
+    results: List[SendResult] = []
+    latencies: List[float] = []
+
+    def report(res: SendResult) -> None:
+        results.append(res)
+        print(f"[{len(results)}/{len(files)}] {res.line(bulk_url if res.batch else args.api_url)}",
+              file=sys.stderr if res.status == FAIL else sys.stdout)
+
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        if args.bulk:
+            # เตรียม payload + กรองที่ไม่เปลี่ยนออกก่อน แล้วส่งทีละ batch-size
+            futures, pending = [], []
+            for fp in files:
+                try:
+                    item = prepare(fp, not args.no_auto_jid, extra_fields)
+                except Exception as e:
+                    report(SendResult(fp, FAIL, message=f"โหลด JSON ไม่ได้: {e}"))
+                    continue
+                if ledger is not None and not args.force and ledger.unchanged(args.api_url, item.key, item.digest):
+                    report(SendResult(fp, SKIPPED))
+                    continue
+                pending.append(item)
+                if len(pending) >= batch_size:
+                    futures.append(pool.submit(batch_job, pending))
+                    pending = []
+            if pending:
+                futures.append(pool.submit(batch_job, pending))
+            for fut in as_completed(futures):
+                batch_results, seconds = fut.result()
+                latencies.append(seconds)
+                for res in batch_results:
+                    report(res)
+        else:
+            futures = [pool.submit(job, fp) for fp in files]
+            for fut in as_completed(futures):
+                res = fut.result()
+                report(res)
+                if res.status != SKIPPED and res.seconds > 0:
+                    latencies.append(res.seconds)
+    wall = time.monotonic() - t0
+    session.close()
+    if ledger is not None:
+        ledger.close()
+
+    ok = sum(1 for r in results if r.status == OK)
+    fail = sum(1 for r in results if r.status == FAIL)
+    skipped = sum(1 for r in results if r.status == SKIPPED)
     print("------------------------------------------------------------")
-    print(f"เสร็จสิ้น ✅  สำเร็จ: {ok}, ล้มเหลว: {fail}")
+    print(f"เสร็จสิ้น ✅  สำเร็จ: {ok}, ล้มเหลว: {fail}, ข้าม (ไม่เปลี่ยน): {skipped}")
+    summary = latency_summary(latencies, wall, ok + fail)
+    if summary:
+        print(summary)
     sys.exit(0 if fail == 0 else 1)
 
 
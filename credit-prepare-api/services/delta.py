@@ -0,0 +1,74 @@
+# services/delta.py
+"""
+Delta publishing: ส่งเฉพาะแถวที่เปลี่ยนจากครั้งที่ส่งสำเร็จล่าสุด
+
+- hash ต่อแถวแบบ vectorized (pd.util.hash_pandas_object ทุกคอลัมน์) เทียบกับ snapshot ใน SentLedger
+  ที่ key = "<company_id>|<year>" → แยกเป็น insert (ไม่เคยส่ง) / update (hash เปลี่ยน) / unchanged
+- ส่งแล้วสำเร็จค่อย commit_delta() → snapshot ใหม่ (ส่งไม่ผ่าน = รอบหน้าส่งซ้ำ)
+- full=True: ส่งทุกแถว (ยังนับ insert/update/unchanged และ commit snapshot ตามปกติ)
+
+    delta = diff_rows(df, ["company_id", "year"], ledger, endpoint)
+    if len(delta.rows):
+        requests.post(endpoint, data=delta.rows.to_json(orient="records"), ...)
+    commit_delta(delta, ledger, endpoint)
+
+หมายเหตุ: hash ขึ้นกับ dtype/ค่าที่ pandas เห็น — เปลี่ยนเวอร์ชัน pandas หรือรูปแบบคอลัมน์ อาจทำให้ส่งใหม่ทั้งชุดหนึ่งรอบ (ปลอดภัย เพราะปลายทาง upsert)
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from services.sent_ledger import SentLedger
+
+INSERT, UPDATE, UNCHANGED = "insert", "update", "unchanged"
+
+
+@dataclass
+class Delta:
+    rows: pd.DataFrame     # แถวที่ต้องส่ง (insert + update หรือทั้งหมดเมื่อ full)
+    keys: pd.Series        # key ของ rows
+    hashes: pd.Series      # hash ของ rows
+    inserted: int
+    updated: int
+    unchanged: int
+
+    def counts(self) -> Dict[str, int]:
+        return {"inserted": self.inserted, "updated": self.updated, "unchanged": self.unchanged, "sent": len(self.rows)}
+
+
+def row_keys(df: pd.DataFrame, key_cols: List[str]) -> pd.Series:
+    keys = df[key_cols[0]].astype(str)
+    for c in key_cols[1:]:
+        keys = keys + "|" + df[c].astype(str)
+    return keys
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """hash 64-bit ต่อแถว (ทุกคอลัมน์ ไม่รวม index) เป็นข้อความเพื่อเก็บใน SentLedger"""
+    return pd.util.hash_pandas_object(df, index=False).astype("int64").astype(str)
+
+
+def diff_rows(df: pd.DataFrame, key_cols: List[str], ledger: SentLedger, target: str, full: bool = False) -> Delta:
+    keys = row_keys(df, key_cols)
+    hashes = row_hashes(df)
+    prev = keys.map(ledger.load(target))
+
+    status = np.select([prev.isna(), prev.ne(hashes)], [INSERT, UPDATE], UNCHANGED)
+    changed = status != UNCHANGED
+    send = np.ones(len(df), dtype=bool) if full else changed
+    return Delta(
+        rows=df[send],
+        keys=keys[send],
+        hashes=hashes[send],
+        inserted=int((status == INSERT).sum()),
+        updated=int((status == UPDATE).sum()),
+        unchanged=int((~changed).sum()),
+    )
+
+
+def commit_delta(delta: Delta, ledger: SentLedger, target: str) -> int:
+    """บันทึก hash ของแถวที่ส่งสำเร็จ"""
+    return ledger.record_many(target, zip(delta.keys.tolist(), delta.hashes.tolist()))
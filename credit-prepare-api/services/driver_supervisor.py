@@ -0,0 +1,243 @@
+# services/driver_supervisor.py
+"""
+ดูแล Selenium driver สำหรับรอบ scrape ยาว ๆ
+
+- recycle: ปิดแล้วเปิด Chrome ใหม่ทุก recycle_every บริษัท หรือเมื่อ RSS ของ Chrome ทั้งชุด
+  (chromedriver + browser + renderer) เกิน max_rss_mb → หน่วยความจำ/ความช้าไม่สะสมไปจนท้ายรอบ
+- isolate: error ของบริษัทหนึ่งไม่หยุดทั้งรอบ; บริษัทถัดไปเริ่มจากหน้า index ใหม่ (fresh)
+  error ที่แปลว่า browser ตาย/ค้าง (FATAL_MARKERS) หรือพลาดติดกัน max_failures ครั้ง → restart driver
+- latency: เก็บเวลาต่อ id แล้วสรุป p50/p90/p99 และเทียบช่วงต้น/ท้ายรอบ (ดูว่าท้ายรอบช้าลงไหม)
+
+    sup = DriverSupervisor(lambda: make_driver(out_dir), recycle_every=100, max_rss_mb=2500)
+    for jid in ids:
+        sup.run(jid, lambda driver, fresh: scrape_one(driver, jid, fresh))
+    print(sup.summary()); sup.close()
+
+RSS ใช้ psutil ถ้าติดตั้ง ไม่งั้นอ่าน /proc (Linux); ไม่มีทั้งคู่ → ไม่ตรวจ RSS
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+_HAS_PSUTIL = False
+try:
+    import psutil
+    _HAS_PSUTIL = True
+except Exception:
+    _HAS_PSUTIL = False
+
+T = TypeVar("T")
+
+# ข้อความ error จาก chromedriver ที่แปลว่า session ใช้ต่อไม่ได้
+FATAL_MARKERS = (
+    "invalid session id",
+    "chrome not reachable",
+    "disconnected",
+    "tab crashed",
+    "session deleted",
+    "timed out receiving message from renderer",
+    "no such window",
+    "target window already closed",
+    "connection refused",
+    "max retries exceeded",
+)
+
+
+@dataclass
+class _Sample:
+    key: str
+    seconds: float
+    ok: bool
+
+
+def is_fatal(exc: BaseException) -> bool:
+    msg = str(exc).lower()
+    return any(m in msg for m in FATAL_MARKERS)
+
+
+# ---------- RSS ---------- #
+def _proc_children() -> Dict[int, List[int]]:
+    tree: Dict[int, List[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                stat = f.read()
+            # comm อาจมีช่องว่าง → ตัดถึง ')' ตัวสุดท้าย
+            ppid = int(stat[stat.rindex(b")") + 2:].split()[1])
+        except Exception:
+            continue
+        tree.setdefault(ppid, []).append(int(name))
+    return tree
+
+
+def _proc_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return 0
+
+
+def tree_rss_mb(root_pid: int) -> Optional[float]:
+    """RSS รวมของ process และลูกหลานทั้งหมด (MB); วัดไม่ได้ → None"""
+    if _HAS_PSUTIL:
+        try:
+            root = psutil.Process(root_pid)
+            procs = [root] + root.children(recursive=True)
+            total = 0
+            for p in procs:
+                try:
+                    total += p.memory_info().rss
+                except Exception:
+                    continue
+            return total / (1024 * 1024)
+        except Exception:
+            return None
+    if not os.path.isdir("/proc"):
+        return None
+    tree = _proc_children()
+    stack, total_kb = [root_pid], 0
+    while stack:
+        pid = stack.pop()
+        total_kb += _proc_rss_kb(pid)
+        stack.extend(tree.get(pid, []))
+    return total_kb / 1024
+
+
+def _driver_pid(driver) -> Optional[int]:
+    try:
+        return driver.service.process.pid
+    except Exception:
+        return None
+
+
+def _pct(sorted_xs: List[float], q: float) -> float:
+    return sorted_xs[min(len(sorted_xs) - 1, int(q * len(sorted_xs)))]
+
+
+# ---------- supervisor ---------- #
+class DriverSupervisor:
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        recycle_every: int = 0,
+        max_rss_mb: Optional[float] = None,
+        max_failures: int = 3,
+        on_restart: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        factory      : สร้าง driver ใหม่
+        recycle_every: restart ทุก N บริษัทที่สำเร็จ (0 = ไม่ใช้)
+        max_rss_mb   : restart เมื่อ RSS ของ Chrome เกินค่านี้ (None = ไม่ใช้)
+        max_failures : restart เมื่อพลาดติดกันครบจำนวนนี้
+        on_restart   : callback(driver ใหม่) เช่นผูก NetMeter กับ driver ใหม่
+        """
+        self.factory = factory
+        self.recycle_every = recycle_every
+        self.max_rss_mb = max_rss_mb
+        self.max_failures = max(1, max_failures)
+        self.on_restart = on_restart
+        self._driver = None
+        self.fresh = True
+        self.since_start = 0
+        self.consecutive_failures = 0
+        self.restarts: Dict[str, int] = {}
+        self.samples: List[_Sample] = []
+        self.peak_rss_mb = 0.0
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.factory()
+            self.fresh = True
+            self.since_start = 0
+            if self.on_restart:
+                self.on_restart(self._driver)
+        return self._driver
+
+    @property
+    def current(self):
+        """driver ที่เปิดอยู่ (ไม่สร้างใหม่) หรือ None"""
+        return self._driver
+
+    def rss_mb(self) -> Optional[float]:
+        if self._driver is None:
+            return None
+        pid = _driver_pid(self._driver)
+        return tree_rss_mb(pid) if pid else None
+
+    def restart(self, reason: str) -> None:
+        self.restarts[reason] = self.restarts.get(reason, 0) + 1
+        print(f"♻ restart Chrome ({reason})")
+        self.close()
+
+    def close(self) -> None:
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+        self._driver = None
+        self.fresh = True
+
+    def run(self, key: str, fn: Callable[[Any, bool], T]) -> T:
+        """เรียก fn(driver, fresh) สำหรับ id หนึ่ง; error ถูก raise ต่อหลังจัดการ driver แล้ว"""
+        driver = self.driver
+        fresh = self.fresh
+        t0 = time.monotonic()
+        try:
+            out = fn(driver, fresh)
+        except Exception as e:
+            self.samples.append(_Sample(key, time.monotonic() - t0, False))
+            self.consecutive_failures += 1
+            self.fresh = True  # หน้าเว็บอยู่ในสภาพไม่แน่นอน → id ถัดไปเริ่มจาก index
+            if is_fatal(e):
+                self.restart("browser error")
+                self.consecutive_failures = 0
+            elif self.consecutive_failures >= self.max_failures:
+                self.restart(f"{self.consecutive_failures} consecutive failures")
+                self.consecutive_failures = 0
+            raise
+        self.samples.append(_Sample(key, time.monotonic() - t0, True))
+        self.consecutive_failures = 0
+        self.fresh = False
+        self.since_start += 1
+        self._maybe_recycle()
+        return out
+
+    def _maybe_recycle(self) -> None:
+        if self.recycle_every and self.since_start >= self.recycle_every:
+            self.restart(f"every {self.recycle_every}")
+            return
+        if self.max_rss_mb:
+            rss = self.rss_mb()
+            if rss is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb, rss)
+                if rss > self.max_rss_mb:
+                    self.restart(f"rss {rss:.0f} MB > {self.max_rss_mb:.0f} MB")
+
+    def summary(self) -> str:
+        if not self.samples:
+            return ""
+        ok = sorted(s.seconds for s in self.samples if s.ok)
+        n_fail = sum(1 for s in self.samples if not s.ok)
+        lines = [f"⏱ per-id: ok={len(ok)} failed={n_fail}"]
+        if ok:
+            lines[0] += f"  p50={_pct(ok, 0.5):.1f}s p90={_pct(ok, 0.9):.1f}s p99={_pct(ok, 0.99):.1f}s max={ok[-1]:.1f}s"
+        ok_in_order = [s.seconds for s in self.samples if s.ok]
+        if len(ok_in_order) >= 8:
+            q = len(ok_in_order) // 4
+            first, last = sorted(ok_in_order[:q]), sorted(ok_in_order[-q:])
+            lines.append(f"   first {q}: p50={_pct(first, 0.5):.1f}s   last {q}: p50={_pct(last, 0.5):.1f}s")
+        if self.restarts:
+            lines.append("   restarts: " + ", ".join(f"{r} ×{n}" for r, n in self.restarts.items()))
+        if self.peak_rss_mb:
+            lines.append(f"   peak Chrome RSS: {self.peak_rss_mb:.0f} MB")
+        return "\n".join(lines)
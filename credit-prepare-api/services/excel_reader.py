@@ -0,0 +1,132 @@
+# services/excel_reader.py
+"""
+อ่านไฟล์ Excel ของ DBD (balance / income / ratios) ด้วย engine ที่ถูกต้องตั้งแต่ครั้งแรก
+
+- sniff_kind() ดู magic bytes: PK.. → xlsx, D0CF11E0 → xls (OLE2), "<..." → html (html-Excel)
+- เลือก engine ตามชนิดไฟล์ โดยให้ calamine มาก่อน (เร็วที่สุด, อ่านได้ทั้ง xls/xlsx) ถ้าติดตั้งไว้
+- จำ engine ที่อ่านสำเร็จต่อ signature ไว้ใน process (_WINNERS) ไฟล์ถัดไปชนิดเดียวกันจะลอง engine นั้นก่อน
+- engine ที่ไม่ได้ติดตั้งจะถูกข้ามไปเลย ไม่เสียเวลาเปิดไฟล์ซ้ำ
+"""
+
+import importlib.util
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+
+# engine → โมดูลที่ต้องมี
+_ENGINE_MODULES = {
+    "calamine": "python_calamine",
+    "openpyxl": "openpyxl",
+    "xlrd": "xlrd",
+    "html": None,  # read_html ใช้ lxml หรือ bs4 ตัวใดตัวหนึ่ง
+}
+
+# ลำดับ engine ต่อชนิดไฟล์ (ก่อนกรองด้วยสิ่งที่ติดตั้ง)
+_ENGINE_ORDER = {
+    "xlsx": ["calamine", "openpyxl"],
+    "xls": ["calamine", "xlrd"],
+    "html": ["html"],
+    "unknown": ["calamine", "openpyxl", "xlrd", "html"],
+}
+
+# signature → engine ที่อ่านสำเร็จล่าสุด
+_WINNERS: Dict[str, str] = {}
+_AVAILABLE: Dict[str, bool] = {}
+
+
+def magic_bytes(path: Path, n: int = 8) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(n)
+
+
+def sniff_kind(path: Path) -> str:
+    sig = magic_bytes(path, 64)
+    if sig.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if sig.startswith(b"\xD0\xCF\x11\xE0"):
+        return "xls"
+    head = sig.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if head.startswith(b"<"):
+        return "html"
+    # ถ้า magic bytes ไม่ชัดเจน ใช้นามสกุลช่วยตัดสิน
+    ext = path.suffix.lower()
+    if ext == ".xlsx":
+        return "xlsx"
+    if ext == ".xls":
+        return "xls"
+    return "unknown"
+
+
+def engine_available(engine: str) -> bool:
+    if engine not in _AVAILABLE:
+        mod = _ENGINE_MODULES.get(engine)
+        ok = mod is None or importlib.util.find_spec(mod) is not None
+        if ok and engine == "calamine":
+            # pandas รองรับ engine="calamine" ตั้งแต่ 2.2
+            major, minor = (int(x) for x in pd.__version__.split(".")[:2])
+            ok = (major, minor) >= (2, 2)
+        _AVAILABLE[engine] = ok
+    return _AVAILABLE[engine]
+
+
+def engine_plan(kind: str) -> List[str]:
+    order = [e for e in _ENGINE_ORDER.get(kind, _ENGINE_ORDER["unknown"]) if engine_available(e)]
+    winner = _WINNERS.get(kind)
+    if winner in order:
+        order.remove(winner)
+        order.insert(0, winner)
+    return order
+
+
+def _read_with(path: Path, engine: str, sheet_name: Union[int, str]) -> pd.DataFrame:
+    if engine == "html":
+        tables = pd.read_html(path, header=None)
+        if not tables:
+            raise ValueError("no <table> found")
+        return tables[0]
+    df = pd.read_excel(path, engine=engine, header=None, sheet_name=sheet_name)
+    if isinstance(df, dict):
+        df = next(iter(df.values()))
+    return df
+
+
+def read_excel_any(
+    path: Path,
+    sheet: Optional[Union[int, str]] = None,
+    debug: bool = False,
+    log: Optional[Callable[..., None]] = None,
+) -> pd.DataFrame:
+    """
+    อ่านไฟล์เป็น DataFrame ดิบ (header=None)
+    ปกติสำเร็จในครั้งแรก; ถ้าไม่สำเร็จจะลอง engine ถัดไปของชนิดเดียวกัน แล้วค่อยลองชนิดอื่นเป็นทางหนีไฟ
+    """
+    def _log(*args):
+        if debug:
+            (log or print)(*args)
+
+    kind = sniff_kind(path)
+    sheet_name = 0 if (sheet is None or str(sheet).strip() == "") else sheet
+
+    plan = engine_plan(kind)
+    for e in engine_plan("unknown"):
+        if e not in plan:
+            plan.append(e)
+    _log(f"  ↪ sniffed kind: {kind} for {path.name}; engines={plan}")
+
+    tried = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for engine in plan:
+            try:
+                df = _read_with(path, engine, sheet_name)
+            except Exception as e:
+                tried.append((engine, str(e)))
+                _log(f"  ⚠ failed read with {engine}: {e}")
+                continue
+            _WINNERS[kind] = engine
+            _log(f"  ✔ read with {engine}: shape={df.shape}")
+            return df
+
+    raise RuntimeError(f"Cannot read Excel file: {path.name}; tried={tried}")
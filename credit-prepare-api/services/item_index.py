@@ -0,0 +1,86 @@
+# services/item_index.py
+"""
+ItemNameIndex — ดัชนีแปลงชื่อรายการภาษาไทย (งบ DBD) → รหัสภาษาอังกฤษ สร้างครั้งเดียวต่อ process
+
+ลำดับการค้นหา:
+  1) canon(name) ตรงกับ key (รูปเดิม และรูป canonical ถ้า canon_keys=True) → O(1) dict lookup
+  2) variants: รูปแบบสำรองของ canon(name) เช่น ตัดวงเล็บ   → O(1) dict lookup ต่อ variant
+  3) rules: regex (คอมไพล์ไว้แล้ว) ค้นใน canon(name) ตามลำดับ  → ตัวแรกที่เจอชนะ
+  4) default ("unknown")
+
+ผลลัพธ์ต่อชื่อถูกจำไว้ด้วย LRU cache ชื่อเดิมที่ซ้ำในหลายปี/หลายบริษัทจึงไม่ต้องผ่าน regex อีก
+
+ตัวอย่าง:
+    INDEX = ItemNameIndex(TH_TO_EN, canon=normalize_spaces, rules=[(r"ROA", "return_on_assets")])
+    INDEX.lookup("อัตราผลตอบแทนจากสินทรัพย์รวม(ROA) (%)")
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Pattern, Sequence, Tuple, Union
+
+Rule = Tuple[Union[str, Pattern], str]
+
+
+def _is_missing(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+class ItemNameIndex:
+    def __init__(
+        self,
+        mapping: Mapping[str, str],
+        canon: Callable[[str], str] = str.strip,
+        variants: Sequence[Callable[[str], str]] = (),
+        rules: Iterable[Rule] = (),
+        default: str = "unknown",
+        maxsize: Optional[int] = 4096,
+        canon_keys: bool = True,
+    ):
+        self.canon = canon
+        self.variants = tuple(variants)
+        self.default = default
+        # เก็บ key ตามที่เขียนไว้ + รูปที่ canonicalize แล้ว (ถ้า canon_keys); ถ้าซ้ำกัน ตัวแรกตามลำดับใน mapping ชนะ
+        self.index: Dict[str, str] = {}
+        for k, v in mapping.items():
+            self.index.setdefault(k, v)
+            if canon_keys:
+                self.index.setdefault(canon(k), v)
+        self.rules = [
+            (re.compile(p) if isinstance(p, str) else p, code)
+            for p, code in rules
+        ]
+        self._canon_cached = lru_cache(maxsize=maxsize)(canon)
+        self._lookup_cached = lru_cache(maxsize=maxsize)(self._lookup)
+
+    def canonical(self, name: Any) -> str:
+        return self._canon_cached(str(name))
+
+    def __contains__(self, name: Any) -> bool:
+        """มี key ตรง (หลัง canonicalize) หรือไม่ — ไม่นับ variants/rules"""
+        if _is_missing(name):
+            return False
+        return self.canonical(name) in self.index
+
+    def lookup(self, name: Any) -> str:
+        if _is_missing(name):
+            return self.default
+        return self._lookup_cached(str(name))
+
+    def _lookup(self, name: str) -> str:
+        key = self._canon_cached(name)
+        hit = self.index.get(key)
+        if hit is not None:
+            return hit
+        for variant in self.variants:
+            hit = self.index.get(variant(key))
+            if hit is not None:
+                return hit
+        for pat, code in self.rules:
+            if pat.search(key):
+                return code
+        return self.default
+
+    def cache_info(self):
+        return self._lookup_cached.cache_info()
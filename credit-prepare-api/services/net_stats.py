@@ -0,0 +1,120 @@
+# services/net_stats.py
+"""
+วัด bandwidth / จำนวน request ต่อบริษัทจาก Chrome performance log (CDP Network.* events)
+
+ต้องเปิด capability ก่อนสร้าง driver:  enable_perf_log(options)
+แล้วใช้ NetMeter(driver):
+    meter.begin()                 # ทิ้ง event เก่า เริ่มนับใหม่
+    ... ค้นหา / scrape ...
+    stats = meter.end(label)      # รวม event ตั้งแต่ begin → NetStats และพิมพ์หนึ่งบรรทัด
+    print(meter.summary())        # ค่าเฉลี่ย/รวมทุกบริษัท
+
+- bytes = ผลรวม encodedDataLength ของ Network.loadingFinished (ขนาดที่รับจริงจากเครือข่าย รวม header)
+- blocked = request ที่ถูก Network.setBlockedURLs ตัด (loadingFailed.blockedReason)
+- ไฟล์ที่ Chrome ดาวน์โหลด (PDF/XLS) ไม่ถูกนับ — วัดเฉพาะการโหลดหน้า
+"""
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+def enable_perf_log(options) -> None:
+    """เปิด performance log (Network events) ใน ChromeOptions"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+@dataclass
+class NetStats:
+    label: str
+    seconds: float = 0.0
+    requests: int = 0
+    bytes: int = 0
+    blocked: int = 0
+    failed: int = 0
+    by_type: Dict[str, int] = field(default_factory=dict)  # bytes ต่อ resource type
+
+    def line(self) -> str:
+        top = sorted(self.by_type.items(), key=lambda kv: -kv[1])[:4]
+        types = ", ".join(f"{t} {_fmt_bytes(b)}" for t, b in top)
+        return (
+            f"📶 {self.label}: {_fmt_bytes(self.bytes)} in {self.requests} request(s)"
+            f" (blocked {self.blocked}, failed {self.failed}) · {self.seconds:.1f}s"
+            + (f"  [{types}]" if types else "")
+        )
+
+
+class NetMeter:
+    def __init__(self, driver):
+        self.driver = driver
+        self.results: List[NetStats] = []
+        self._t0: Optional[float] = None
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception:
+            return []
+        out = []
+        for e in entries:
+            try:
+                out.append(json.loads(e["message"])["message"])
+            except Exception:
+                continue
+        return out
+
+    def begin(self) -> None:
+        self._drain()
+        self._t0 = time.monotonic()
+
+    def end(self, label: str, verbose: bool = True) -> NetStats:
+        st = NetStats(label=label, seconds=time.monotonic() - (self._t0 or time.monotonic()))
+        types: Dict[str, str] = {}
+        for msg in self._drain():
+            method = msg.get("method", "")
+            p = msg.get("params", {})
+            rid = p.get("requestId")
+            if method == "Network.requestWillBeSent":
+                if not p.get("request", {}).get("url", "").startswith("data:"):
+                    st.requests += 1
+                types[rid] = p.get("type") or "Other"
+            elif method == "Network.responseReceived":
+                types[rid] = p.get("type") or types.get(rid, "Other")
+            elif method == "Network.loadingFinished":
+                n = int(p.get("encodedDataLength") or 0)
+                st.bytes += n
+                t = types.get(rid, "Other")
+                st.by_type[t] = st.by_type.get(t, 0) + n
+            elif method == "Network.loadingFailed":
+                if p.get("blockedReason"):
+                    st.blocked += 1
+                elif not p.get("canceled"):
+                    st.failed += 1
+        self.results.append(st)
+        if verbose:
+            print(st.line())
+        return st
+
+    def summary(self) -> str:
+        if not self.results:
+            return ""
+        n = len(self.results)
+        tot_b = sum(r.bytes for r in self.results)
+        tot_r = sum(r.requests for r in self.results)
+        tot_blk = sum(r.blocked for r in self.results)
+        secs = sorted(r.seconds for r in self.results)
+        return (
+            f"📶 {n} compan{'y' if n == 1 else 'ies'}: {_fmt_bytes(tot_b)} total, {_fmt_bytes(tot_b / n)}/company, "
+            f"{tot_r / n:.0f} request(s)/company (blocked {tot_blk / n:.0f}), "
+            f"time p50={secs[n // 2]:.1f}s max={secs[-1]:.1f}s"
+        )
@@ -0,0 +1,368 @@
+# services/ocr_engine.py
+"""
+OCR backend กลางสำหรับสคริปต์ pdf_ocr_*
+
+- ถ้ามี tesserocr (ผูกกับ tesseract C API): เก็บ engine ที่ init แล้วไว้ต่อ thread ต่อ (lang, oem)
+  โหลด traineddata (เช่น tha+eng) ครั้งเดียว แล้วส่ง numpy buffer เข้า engine ตรง ๆ (ไม่มี PNG ชั่วคราว / subprocess)
+- ถ้าไม่มี: ใช้ pytesseract เหมือนเดิม (ผลลัพธ์เท่าเดิม แค่ช้ากว่า)
+- batch: ไม่ต้องมี tesserocr — เขียนภาพทุกหน้าลงไฟล์ชั่วคราว แล้วเรียก tesseract ครั้งเดียวด้วย list file
+  (โหลดโมเดลครั้งเดียวต่อ batch) แล้วแยกผลกลับเป็นรายหน้าด้วย page separator (\f)
+- เลือก backend ได้ด้วย env OCR_BACKEND=auto|tesserocr|pytesseract|batch
+  (auto: tesserocr → pytesseract → batch ถ้ามีแค่ binary tesseract)
+
+ใช้งาน:
+    from services.ocr_engine import ocr_image_to_string
+    txt = ocr_image_to_string(arr_or_pil, lang="tha+eng", config="--oem 1 --psm 6")
+    texts = ocr_images_to_strings(iter_of_images, lang="tha+eng", config="--oem 1 --psm 6")  # ใช้ batch ได้
+    texts = ocr_jobs_to_strings([(header_img, "--psm 4"), (table_img, "--psm 6")])         # config ต่อภาพ
+
+Benchmark (เทียบเวลา/หน้า ระหว่าง backend):
+    python -m services.ocr_engine --bench raw_data/rm/xxx.pdf --dpi 300 --pages 3
+"""
+
+import argparse
+import atexit
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_HAS_TESSEROCR = False
+try:
+    import tesserocr
+    _HAS_TESSEROCR = True
+except Exception:
+    _HAS_TESSEROCR = False
+
+_HAS_PYTESSERACT = False
+try:
+    import pytesseract
+    _HAS_PYTESSERACT = True
+except Exception:
+    _HAS_PYTESSERACT = False
+
+try:
+    import numpy as np
+except Exception:  # numpy มากับ pandas อยู่แล้ว แต่กันไว้
+    np = None
+
+BACKENDS = ("auto", "tesserocr", "pytesseract", "batch")
+
+_local = threading.local()
+_all_engines: List[Any] = []
+_all_lock = threading.Lock()
+
+
+# ---------- backend selection ---------- #
+def tesseract_cmd() -> str:
+    if os.getenv("TESSERACT_CMD"):
+        return os.environ["TESSERACT_CMD"]
+    if _HAS_PYTESSERACT:
+        return pytesseract.pytesseract.tesseract_cmd
+    return "tesseract"
+
+
+def ocr_available() -> bool:
+    return _HAS_TESSEROCR or _HAS_PYTESSERACT or shutil.which(tesseract_cmd()) is not None
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    want = (backend or os.getenv("OCR_BACKEND") or "auto").strip().lower()
+    if want not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {want} (expected one of {BACKENDS})")
+    if want == "tesserocr" and not _HAS_TESSEROCR:
+        raise RuntimeError("OCR_BACKEND=tesserocr but tesserocr is not installed (pip install tesserocr)")
+    if want == "pytesseract" and not _HAS_PYTESSERACT:
+        raise RuntimeError("OCR_BACKEND=pytesseract but pytesseract is not installed")
+    if want == "batch" and shutil.which(tesseract_cmd()) is None:
+        raise RuntimeError(f"OCR_BACKEND=batch but tesseract binary not found ({tesseract_cmd()})")
+    if want == "auto":
+        if _HAS_TESSEROCR:
+            return "tesserocr"
+        if _HAS_PYTESSERACT:
+            return "pytesseract"
+        if shutil.which(tesseract_cmd()) is not None:
+            return "batch"
+        raise RuntimeError("No OCR backend installed. pip install tesserocr (or pytesseract)")
+    return want
+
+
+# ---------- config parsing ---------- #
+def parse_config(config: str) -> Tuple[Optional[int], Optional[int], Dict[str, str]]:
+    """แปลง config แบบ CLI ('--oem 1 --psm 6 -c key=val') → (oem, psm, variables)"""
+    oem: Optional[int] = None
+    psm: Optional[int] = None
+    variables: Dict[str, str] = {}
+    toks = shlex.split(config or "")
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        nxt = toks[i + 1] if i + 1 < len(toks) else None
+        if t == "--oem" and nxt is not None:
+            oem = int(nxt); i += 2; continue
+        if t == "--psm" and nxt is not None:
+            psm = int(nxt); i += 2; continue
+        if t == "-c" and nxt is not None and "=" in nxt:
+            k, v = nxt.split("=", 1)
+            variables[k] = v; i += 2; continue
+        m = re.match(r"^-c(\w+)=(.*)$", t)
+        if m:
+            variables[m.group(1)] = m.group(2)
+        i += 1
+    return oem, psm, variables
+
+
+# ---------- tesserocr engine pool ---------- #
+def _get_engine(lang: str, oem: Optional[int]):
+    engines = getattr(_local, "engines", None)
+    if engines is None:
+        engines = _local.engines = {}
+    key = (lang, oem)
+    api = engines.get(key)
+    if api is None:
+        kwargs = {"lang": lang}
+        if oem is not None:
+            kwargs["oem"] = oem
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        engines[key] = api
+        with _all_lock:
+            _all_engines.append(api)
+    return api
+
+
+def close_engines() -> None:
+    """ปิด engine ทั้งหมด (เรียกอัตโนมัติตอนจบ process)"""
+    with _all_lock:
+        while _all_engines:
+            api = _all_engines.pop()
+            try:
+                api.End()
+            except Exception:
+                pass
+    if hasattr(_local, "engines"):
+        _local.engines = {}
+
+
+atexit.register(close_engines)
+
+
+def _to_gray_or_rgb_array(image: Any):
+    """PIL.Image | numpy → numpy uint8 (H, W) หรือ (H, W, C) ที่ C-contiguous"""
+    if np is None:
+        raise RuntimeError("numpy is required for the tesserocr backend")
+    if isinstance(image, np.ndarray):
+        arr = image
+    else:
+        mode = getattr(image, "mode", None)
+        if mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("L")
+        arr = np.asarray(image)
+    if arr.dtype == bool:
+        arr = arr.astype(np.uint8) * 255
+    elif arr.dtype != np.uint8:
+        arr = arr.astype(np.uint8)
+    return np.ascontiguousarray(arr)
+
+
+def _tesserocr_image_to_string(image: Any, lang: str, config: str) -> str:
+    oem, psm, variables = parse_config(config)
+    api = _get_engine(lang, oem)
+    api.Clear()
+    # psm ตั้งต่อครั้ง (engine เดียวกันใช้ได้หลาย psm); ค่าเริ่มต้นเท่ากับ CLI (PSM 3 = AUTO)
+    api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+    for k, v in variables.items():
+        api.SetVariable(k, v)
+    arr = _to_gray_or_rgb_array(image)
+    h, w = arr.shape[:2]
+    bpp = 1 if arr.ndim == 2 else arr.shape[2]
+    api.SetImageBytes(arr.tobytes(), w, h, bpp, w * bpp)
+    return api.GetUTF8Text() or ""
+
+
+# ---------- batch (one tesseract process per list of images) ---------- #
+def _save_pnm(image: Any, path: str) -> None:
+    """PNM ไม่บีบอัด เขียน/อ่านเร็วที่สุด (leptonica อ่านได้ตรง)"""
+    if np is not None and isinstance(image, np.ndarray) and image.ndim == 2:
+        # grayscale จาก render_pages → PGM (P5) เขียน buffer ตรง ๆ ไม่ผ่าน PIL
+        arr = _to_gray_or_rgb_array(image)
+        with open(path, "wb") as f:
+            f.write(b"P5\n%d %d\n255\n" % (arr.shape[1], arr.shape[0]))
+            f.write(arr.tobytes())
+        return
+    from PIL import Image
+    if np is not None and isinstance(image, np.ndarray):
+        image = Image.fromarray(_to_gray_or_rgb_array(image))
+    if image.mode == "RGBA":
+        image = image.convert("RGB")
+    elif image.mode not in ("1", "L", "RGB"):
+        image = image.convert("L")
+    image.save(path, format="PPM")
+
+
+def _run_tesseract_list(paths: List[str], lang: str, config: str, tmp: str, tag: str) -> List[str]:
+    list_file = os.path.join(tmp, f"{tag}.txt")
+    with open(list_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(paths) + "\n")
+
+    out_base = os.path.join(tmp, f"{tag}_out")
+    cmd = [tesseract_cmd(), list_file, out_base, "-l", lang, *shlex.split(config or ""), "txt"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"tesseract batch failed ({proc.returncode}): {proc.stderr.decode('utf-8', 'replace')[-500:]}")
+    with open(out_base + ".txt", "r", encoding="utf-8") as f:
+        text = f.read()
+
+    # tesseract ต่อท้ายทุกหน้าด้วย page separator (\f) → ตัวสุดท้ายเป็นสตริงว่าง
+    parts = text.split("\f")
+    if parts and parts[-1].strip() == "":
+        parts = parts[:-1]
+    if len(parts) != len(paths):
+        raise RuntimeError(f"tesseract batch returned {len(parts)} pages for {len(paths)} images")
+    return parts
+
+
+def _batch_jobs_to_strings(jobs: Iterable[Tuple[Any, str]], lang: str) -> List[str]:
+    """jobs: (image, config) — หนึ่ง tesseract process ต่อ config ที่ต่างกัน"""
+    with tempfile.TemporaryDirectory(prefix="ocr_batch_") as tmp:
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        n = 0
+        # เขียนทีละภาพแล้วปล่อย ไม่ต้องถือภาพทุกหน้าไว้ในหน่วยความจำ
+        for i, (image, config) in enumerate(jobs):
+            path = os.path.join(tmp, f"p{i:05d}.pnm")
+            _save_pnm(image, path)
+            groups.setdefault(config, []).append((i, path))
+            n = i + 1
+        out = [""] * n
+        for g, (config, items) in enumerate(groups.items()):
+            texts = _run_tesseract_list([p for _, p in items], lang, config, tmp, f"g{g}")
+            for (i, _), t in zip(items, texts):
+                out[i] = t
+    return out
+
+
+def _batch_images_to_strings(images: Iterable[Any], lang: str, config: str) -> List[str]:
+    return _batch_jobs_to_strings(((im, config) for im in images), lang)
+
+
+# ---------- public API ---------- #
+def ocr_image_to_string(image: Any, lang: str = "tha+eng", config: str = "", backend: Optional[str] = None) -> str:
+    """เทียบเท่า pytesseract.image_to_string(image, lang=lang, config=config)"""
+    be = resolve_backend(backend)
+    if be == "tesserocr":
+        return _tesserocr_image_to_string(image, lang, config)
+    if be == "batch":
+        return _batch_images_to_strings([image], lang, config)[0]
+    return pytesseract.image_to_string(image, lang=lang, config=config)
+
+
+def ocr_images_to_strings(images: Iterable[Any], lang: str = "tha+eng", config: str = "",
+                          backend: Optional[str] = None, timings: Optional[List[float]] = None) -> List[str]:
+    """
+    OCR หลายภาพ คืนข้อความตามลำดับเดิม
+    - batch: tesseract ครั้งเดียวทั้งชุด
+    - อื่น ๆ: ทีละภาพ (tesserocr ใช้ engine เดิมซ้ำอยู่แล้ว)
+    timings: ถ้าส่ง list มา จะเติมเวลา OCR (วินาที) ต่อภาพ; โหมด batch เป็นค่าเฉลี่ยของทั้งชุด
+    """
+    return ocr_jobs_to_strings(((im, config) for im in images), lang=lang, backend=backend, timings=timings)
+
+
+def iter_ocr_images(images: Iterable[Any], lang: str = "tha+eng", config: str = "",
+                    backend: Optional[str] = None) -> Iterator[Tuple[str, float]]:
+    """
+    OCR ทีละภาพแบบ lazy: yield (text, seconds) — caller หยุดอ่านเมื่อได้ข้อมูลครบ = ไม่ OCR/render หน้าที่เหลือ
+    batch: ต้อง OCR ทั้งชุดในครั้งเดียวก่อน แล้วค่อย yield ทีละหน้า (หยุดก่อนไม่ได้)
+    """
+    be = resolve_backend(backend)
+    if be == "batch":
+        timings: List[float] = []
+        texts = ocr_images_to_strings(images, lang=lang, config=config, backend=be, timings=timings)
+        yield from zip(texts, timings)
+        return
+    for im in images:
+        t0 = time.perf_counter()
+        txt = ocr_image_to_string(im, lang=lang, config=config, backend=be)
+        yield txt, time.perf_counter() - t0
+
+
+def ocr_jobs_to_strings(jobs: Iterable[Tuple[Any, str]], lang: str = "tha+eng",
+                        backend: Optional[str] = None, timings: Optional[List[float]] = None) -> List[str]:
+    """
+    เหมือน ocr_images_to_strings แต่ config ต่อภาพ: jobs = (image, config) เช่น crop แต่ละ region คนละ psm
+    batch: tesseract หนึ่งครั้งต่อ config
+    """
+    be = resolve_backend(backend)
+    if be == "batch":
+        t0 = time.perf_counter()
+        texts = _batch_jobs_to_strings(jobs, lang)
+        if timings is not None and texts:
+            avg = (time.perf_counter() - t0) / len(texts)
+            timings.extend([avg] * len(texts))
+        return texts
+    texts = []
+    for im, config in jobs:
+        t0 = time.perf_counter()
+        texts.append(ocr_image_to_string(im, lang=lang, config=config, backend=be))
+        if timings is not None:
+            timings.append(time.perf_counter() - t0)
+    return texts
+
+
+# ---------- benchmark ---------- #
+def _bench(pdf_path: str, dpi: int, pages: int, lang: str, config: str) -> None:
+    from services.pdf_raster import render_pages
+
+    arrays = list(render_pages(pdf_path, dpi, "gray", first_page=1, last_page=pages))
+    print(f"▶ {os.path.basename(pdf_path)}: {len(arrays)} pages @ {dpi} dpi, lang={lang}, config='{config}'")
+
+    results: Dict[str, List[str]] = {}
+    for be in ("pytesseract", "tesserocr", "batch"):
+        try:
+            resolve_backend(be)
+        except Exception as e:
+            print(f"  ⚠ {be}: skipped ({e})")
+            continue
+        if be == "batch":
+            t0 = time.perf_counter()
+            texts = ocr_images_to_strings(arrays, lang=lang, config=config, backend=be)
+            total = time.perf_counter() - t0
+            print(f"  {be:12s} total={total:7.2f}s  per_page={total / len(arrays):6.2f}s  (one tesseract process)")
+            results[be] = texts
+            continue
+        # engine แรกของ tesserocr มีค่า init (โหลดโมเดล) แยกให้เห็น
+        t0 = time.perf_counter()
+        texts = [ocr_image_to_string(arrays[0], lang=lang, config=config, backend=be)]
+        first = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        for arr in arrays[1:]:
+            texts.append(ocr_image_to_string(arr, lang=lang, config=config, backend=be))
+        rest = time.perf_counter() - t1
+        per_page = (first + rest) / len(arrays)
+        steady = rest / (len(arrays) - 1) if len(arrays) > 1 else first
+        print(f"  {be:12s} total={first + rest:7.2f}s  per_page={per_page:6.2f}s  first={first:6.2f}s  steady={steady:6.2f}s")
+        results[be] = texts
+
+    if "pytesseract" in results:
+        for be in ("tesserocr", "batch"):
+            if be in results:
+                same = sum(a.strip() == b.strip() for a, b in zip(results["pytesseract"], results[be]))
+                print(f"  {be}: identical text to pytesseract on {same}/{len(arrays)} pages")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="OCR backend benchmark (pytesseract subprocess vs pooled tesserocr vs batch list file)")
+    ap.add_argument("--bench", required=True, help="PDF to OCR")
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--pages", type=int, default=3, help="first N pages")
+    ap.add_argument("--lang", default="tha+eng")
+    ap.add_argument("--config", default="--oem 1 --psm 6")
+    args = ap.parse_args()
+    _bench(args.bench, args.dpi, args.pages, args.lang, args.config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# services/page_layout.py
+"""
+หา region ที่ต้อง OCR ในหน้าสแกน (OpenCV) — ไม่ต้อง OCR โลโก้/ขอบกระดาษ/พื้นที่ว่างทั้งหน้า
+
+find_regions(gray) คืน [header, table] หรือ [] (หาไม่เจอ → caller OCR ทั้งหน้าเหมือนเดิม)
+  1) ink box: กรอบของหมึกทั้งหน้า (ตัด noise เล็ก ๆ ก่อน) → ตัดขอบกระดาษ
+  2) table top:
+     - มีเส้นตาราง (เส้นนอนยาว ≥ 1/3 ของความกว้างหมึก) อย่างน้อย MIN_RULES เส้น → เส้นแรก
+     - ไม่มีเส้น: รวมคำเป็นบรรทัด (dilate แนวนอน) แล้วหาบรรทัดกว้าง (≥ WIDE_LINE ของความกว้างหมึก)
+       ติดกัน MIN_WIDE_RUN บรรทัดแรก = แถวรายการ
+  3) header = ink top → table top (เลขผู้ขาย / วันที่จ่าย / วันที่เอกสาร)
+     component ที่สูงเกิน LOGO_GLYPHS เท่าของตัวอักษร (โลโก้/ตรา) ถูกทาขาวก่อน OCR
+     table = table top → ink bottom (รวมบรรทัดยอดรวมใต้ตาราง)
+
+psm: header ใช้ 4 (คอลัมน์ตัวอักษรหลายขนาด), table ใช้ 6 (บล็อกข้อความสม่ำเสมอ เหมือนค่าเดิมทั้งหน้า)
+crop เป็น view ของ array เดิม (ไม่ copy) ยกเว้น region ที่ต้องทาขาวโลโก้
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+_HAS_LAYOUT = False
+try:
+    import numpy as np
+    import cv2
+    _HAS_LAYOUT = True
+except Exception:
+    _HAS_LAYOUT = False
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+HEADER_PSM = 4
+TABLE_PSM = 6
+MIN_RULES = 2
+WIDE_LINE = 0.6
+MIN_WIDE_RUN = 3
+LOGO_GLYPHS = 3.0
+MIN_HEADER_PX = 20
+
+
+@dataclass
+class Region:
+    name: str
+    box: Box
+    psm: int
+    blank: List[Box] = field(default_factory=list)  # พิกัดภายใน region ที่ต้องทาขาว
+
+    def crop(self, arr: "np.ndarray") -> "np.ndarray":
+        x0, y0, x1, y1 = self.box
+        view = arr[y0:y1, x0:x1]
+        if not self.blank:
+            return view
+        out = view.copy()
+        for bx0, by0, bx1, by1 in self.blank:
+            out[by0:by1, bx0:bx1] = 255
+        return out
+
+    def config(self, oem: int = 1) -> str:
+        return f"--oem {oem} --psm {self.psm}"
+
+
+def _ink_mask(gray: "np.ndarray") -> "np.ndarray":
+    bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    return cv2.morphologyEx(bw, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+
+
+def _ink_box(bw: "np.ndarray") -> Optional[Box]:
+    pts = cv2.findNonZero(bw)
+    if pts is None:
+        return None
+    x, y, w, h = cv2.boundingRect(pts)
+    return x, y, x + w, y + h
+
+
+def _first_rule_y(bw: "np.ndarray", ink: Box) -> Optional[int]:
+    x0, y0, x1, y1 = ink
+    klen = max(40, (x1 - x0) // 3)
+    lines = cv2.morphologyEx(bw[y0:y1, x0:x1], cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (klen, 1)))
+    rows = np.flatnonzero(lines.any(axis=1))
+    if rows.size == 0:
+        return None
+    # แถวติดกันคือเส้นเดียว (เส้นหนาหลาย pixel)
+    n_rules = 1 + int(np.count_nonzero(np.diff(rows) > 1))
+    if n_rules < MIN_RULES:
+        return None
+    return y0 + int(rows[0])
+
+
+def _text_lines(bw: "np.ndarray", ink: Box, glyph: int) -> List[Box]:
+    x0, y0, x1, y1 = ink
+    merged = cv2.dilate(bw[y0:y1, x0:x1], cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, glyph * 2), 1)))
+    n, _, stats, _ = cv2.connectedComponentsWithStats(merged, connectivity=8)
+    boxes = [
+        (x0 + int(s[0]), y0 + int(s[1]), x0 + int(s[0] + s[2]), y0 + int(s[1] + s[3]))
+        for s in stats[1:n]
+        if s[3] >= 3
+    ]
+    return sorted(boxes, key=lambda b: b[1])
+
+
+def _first_wide_run_y(lines: List[Box], ink: Box) -> Optional[int]:
+    width = ink[2] - ink[0]
+    run: List[Box] = []
+    for b in lines:
+        if b[2] - b[0] >= WIDE_LINE * width:
+            run.append(b)
+            if len(run) >= MIN_WIDE_RUN:
+                return run[0][1]
+        else:
+            run = []
+    return None
+
+
+def _glyph_px(bw: "np.ndarray") -> int:
+    n, _, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    h = stats[1:n, cv2.CC_STAT_HEIGHT]
+    w = stats[1:n, cv2.CC_STAT_WIDTH]
+    h = h[(h >= 3) & (w <= 4 * h) & (h <= bw.shape[0] / 20)]
+    return int(np.percentile(h, 75)) if h.size else 10
+
+
+def _logo_boxes(bw: "np.ndarray", box: Box, glyph: int) -> List[Box]:
+    x0, y0, x1, y1 = box
+    n, _, stats, _ = cv2.connectedComponentsWithStats(bw[y0:y1, x0:x1], connectivity=8)
+    out: List[Box] = []
+    for s in stats[1:n]:
+        x, y, w, h = int(s[0]), int(s[1]), int(s[2]), int(s[3])
+        if h > LOGO_GLYPHS * glyph and w > glyph:
+            out.append((x, y, x + w, y + h))
+    return out
+
+
+def find_regions(gray: "np.ndarray", header_psm: int = HEADER_PSM, table_psm: int = TABLE_PSM) -> List[Region]:
+    """gray: หน้า grayscale (uint8) → [header, table] หรือ [] ถ้าแยกไม่ได้"""
+    if not _HAS_LAYOUT:
+        return []
+    bw = _ink_mask(gray)
+    ink = _ink_box(bw)
+    if ink is None:
+        return []
+    H, W = gray.shape[:2]
+    pad = max(8, H // 200)
+    x0, y0, x1, y1 = max(0, ink[0] - pad), max(0, ink[1] - pad), min(W, ink[2] + pad), min(H, ink[3] + pad)
+
+    top = _first_rule_y(bw, ink)
+    glyph = _glyph_px(bw)
+    if top is None:
+        top = _first_wide_run_y(_text_lines(bw, ink, glyph), ink)
+    if top is None:
+        return []
+    top = max(y0, top - pad)
+
+    regions: List[Region] = []
+    if top - y0 >= MIN_HEADER_PX:
+        hbox = (x0, y0, x1, top)
+        regions.append(Region("header", hbox, header_psm, _logo_boxes(bw, hbox, glyph)))
+    regions.append(Region("table", (x0, top, x1, y1), table_psm))
+    return regions
+
+
+def region_pixels(regions: List[Region]) -> int:
+    return sum((r.box[2] - r.box[0]) * (r.box[3] - r.box[1]) for r in regions)
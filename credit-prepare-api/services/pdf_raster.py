@@ -0,0 +1,204 @@
+# services/pdf_raster.py
+"""
+Rasterize PDF สำหรับ OCR
+
+render_pages(): ขอภาพ grayscale (หรือขาวดำ) จาก renderer ตรง ๆ แล้วคืนเป็น numpy uint8 ทีละหน้า
+  - pypdfium2 (ถ้าติดตั้ง): render ลง buffer แล้ว to_numpy() ไม่ผ่าน PIL
+  - ไม่มี: pdftoppm -gray / -mono (poppler) ทีละหน้า เขียน PGM/PBM ลงโฟลเดอร์ชั่วคราว แล้วอ่านด้วย OpenCV
+  ภาพ 1 channel แทน RGB 3 channel → หน่วยความจำต่อหน้าลด ~3 เท่า และไม่ต้อง convert("L") / np.array ซ้ำ
+  ถือภาพไว้ทีละหน้า (generator) ไม่ต้องโหลดทั้งไฟล์เข้าหน่วยความจำ
+
+เลือก DPI จากขนาดตัวอักษรจริงในหน้า (choose_dpi):
+- render หน้าตัวอย่างที่ความละเอียดต่ำ (PROBE_DPI) แบบ grayscale
+- threshold (Otsu, กลับสี) แล้วหา connected components ด้วย OpenCV
+- กรองเอาเฉพาะ component ที่มีรูปร่างเหมือนตัวอักษร แล้วใช้ percentile ที่ 75 ของความสูงเป็นความสูงตัวอักษร
+  (ภาษาไทยมีสระ/วรรณยุกต์เป็น component เล็ก ๆ แยกออกมา ค่า median จึงต่ำเกินจริง)
+- เลือก DPI ต่ำสุดที่ทำให้ตัวอักษรสูงประมาณ TARGET_GLYPH_PX (ช่วงที่ Tesseract อ่านแม่นที่สุด)
+  ปัดขึ้นเป็นขั้นละ DPI_STEP และไม่เกิน max_dpi (ค่า DPI เดิมที่ hard-code ไว้ในแต่ละสคริปต์)
+
+ถ้าไม่มี OpenCV หรือหน้าไม่มีตัวอักษรพอให้วัด → ใช้ max_dpi (พฤติกรรมเดิม)
+"""
+
+import glob
+import math
+import os
+import re
+import subprocess
+import tempfile
+from typing import Iterator, List, Optional, Union
+
+_HAS_PROBE = False
+try:
+    import numpy as np
+    import cv2
+    _HAS_PROBE = True
+except Exception:
+    _HAS_PROBE = False
+
+_HAS_PDFIUM = False
+try:
+    import pypdfium2 as pdfium
+    _HAS_PDFIUM = True
+except Exception:
+    _HAS_PDFIUM = False
+
+COLORS = ("gray", "mono")
+
+PROBE_DPI = 100
+TARGET_GLYPH_PX = 32     # ความสูงตัวอักษร (รวมหาง) ที่ต้องการหลัง rasterize
+MIN_DPI = 150
+DPI_STEP = 25
+MIN_COMPONENTS = 30      # component น้อยกว่านี้ถือว่าวัดไม่ได้
+
+
+def dpi_arg(value: str) -> Union[int, str]:
+    """argparse type: 'auto' หรือจำนวนเต็ม"""
+    if str(value).strip().lower() == "auto":
+        return "auto"
+    return int(value)
+
+
+# ---------- rasterize ---------- #
+def page_count(pdf_path: str) -> int:
+    if _HAS_PDFIUM:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    proc = subprocess.run([os.environ.get("PDFINFO_CMD", "pdfinfo"), pdf_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    m = re.search(rb"^Pages:\s*(\d+)", proc.stdout, re.MULTILINE)
+    if proc.returncode != 0 or not m:
+        raise RuntimeError(f"pdfinfo failed ({proc.returncode}): {proc.stderr.decode('utf-8', 'replace').strip()}")
+    return int(m.group(1))
+
+
+def _render_pdfium(pdf_path: str, dpi: int, color: str, first_page: int, last_page: Optional[int]) -> Iterator["np.ndarray"]:
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        last = min(last_page or len(pdf), len(pdf))
+        for i in range(first_page - 1, last):
+            page = pdf[i]
+            try:
+                bitmap = page.render(scale=dpi / 72.0, grayscale=True)
+                arr = bitmap.to_numpy()
+                if arr.ndim == 3:
+                    arr = arr[:, :, 0]
+                arr = np.ascontiguousarray(arr)
+            finally:
+                page.close()
+            if color == "mono":
+                arr = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+            yield arr
+    finally:
+        pdf.close()
+
+
+def _pdftoppm(pdf_path: str, out_dir: str, dpi: int, color_args: List[str], page_no: int) -> str:
+    """render หน้าเดียวด้วย pdftoppm คืน path ของไฟล์ภาพ"""
+    base = os.path.join(out_dir, "page")
+    cmd = [os.environ.get("PDFTOPPM_CMD", "pdftoppm"), "-r", str(dpi), *color_args,
+           "-f", str(page_no), "-l", str(page_no), "-singlefile", pdf_path, base]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"pdftoppm failed ({proc.returncode}): {proc.stderr.decode('utf-8', 'replace').strip()}")
+    paths = glob.glob(base + ".*")
+    if not paths:
+        raise RuntimeError(f"pdftoppm wrote no image for page {page_no}: {pdf_path}")
+    return paths[0]
+
+
+def _render_poppler(pdf_path: str, dpi: int, color: str, first_page: int, last_page: Optional[int]) -> Iterator["np.ndarray"]:
+    total = page_count(pdf_path)
+    last = min(last_page or total, total)
+    with tempfile.TemporaryDirectory(prefix="raster_") as tmp:
+        # pdftoppm -gray → PGM, -mono → PBM; render ทีละหน้า (-f n -l n) เหมือน pdfium
+        # → ดิสก์ชั่วคราวมีภาพแค่หน้าเดียว และหน้าแรกพร้อม OCR โดยไม่ต้องรอทั้งไฟล์
+        for page_no in range(first_page, last + 1):
+            path = _pdftoppm(pdf_path, tmp, dpi, ["-gray"] if color == "gray" else ["-mono"], page_no)
+            arr = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            os.remove(path)
+            if arr is None:
+                raise RuntimeError(f"cannot read rasterized page: {path}")
+            yield arr
+
+
+def render_pages(
+    pdf_path: str,
+    dpi: int,
+    color: str = "gray",
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+) -> Iterator["np.ndarray"]:
+    """
+    คืน numpy uint8 (H, W) ทีละหน้า: color="gray" (0-255) หรือ "mono" (0/255)
+    ใช้ pypdfium2 ถ้ามี ไม่งั้นใช้ pdftoppm ของ poppler
+    """
+    if color not in COLORS:
+        raise ValueError(f"Unsupported color: {color} (expected one of {COLORS})")
+    if not _HAS_PROBE:
+        raise RuntimeError("numpy and opencv-python are required to rasterize pages")
+    if _HAS_PDFIUM:
+        return _render_pdfium(pdf_path, dpi, color, first_page, last_page)
+    return _render_poppler(pdf_path, dpi, color, first_page, last_page)
+
+
+# ---------- DPI probe ---------- #
+def glyph_height_px(gray: "np.ndarray") -> Optional[float]:
+    """ความสูงตัวอักษรโดยประมาณ (pixel) จากภาพ grayscale; None ถ้าวัดไม่ได้"""
+    h_img = gray.shape[0]
+    bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    n, _, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    if n <= 1:
+        return None
+    w = stats[1:, cv2.CC_STAT_WIDTH]
+    h = stats[1:, cv2.CC_STAT_HEIGHT]
+    area = stats[1:, cv2.CC_STAT_AREA]
+    # ตัดจุด/noise, เส้นตาราง, โลโก้/ภาพ
+    keep = (h >= 3) & (h <= h_img / 20) & (w <= 4 * h) & (area >= 6)
+    h = h[keep]
+    if h.size < MIN_COMPONENTS:
+        return None
+    return float(np.percentile(h, 75))
+
+
+def probe_glyph_height(pdf_path: str, pages: Optional[List[int]] = None, probe_dpi: int = PROBE_DPI) -> Optional[float]:
+    """วัดความสูงตัวอักษรที่ probe_dpi จากหน้าตัวอย่าง (ค่าเริ่มต้น: หน้าแรก)"""
+    pages = pages or [1]
+    heights: List[float] = []
+    for pno in pages:
+        for gray in render_pages(pdf_path, probe_dpi, "gray", first_page=pno, last_page=pno):
+            gh = glyph_height_px(gray)
+            if gh is not None:
+                heights.append(gh)
+    if not heights:
+        return None
+    return float(np.median(heights))
+
+
+def choose_dpi(
+    pdf_path: str,
+    max_dpi: int,
+    min_dpi: int = MIN_DPI,
+    target_px: int = TARGET_GLYPH_PX,
+    pages: Optional[List[int]] = None,
+) -> int:
+    """DPI ต่ำสุดที่ทำให้ตัวอักษรสูง ~target_px, อยู่ในช่วง [min_dpi, max_dpi]"""
+    if not _HAS_PROBE:
+        return max_dpi
+    try:
+        gh = probe_glyph_height(pdf_path, pages)
+    except Exception:
+        return max_dpi
+    if not gh:
+        return max_dpi
+    want = PROBE_DPI * target_px / gh
+    dpi = int(math.ceil(want / DPI_STEP) * DPI_STEP)
+    return max(min_dpi, min(max_dpi, dpi))
+
+
+def resolve_dpi(dpi: Union[int, str], pdf_path: str, max_dpi: int) -> int:
+    """dpi='auto' → choose_dpi(); ตัวเลข → ใช้ตามนั้น"""
+    if dpi == "auto":
+        return choose_dpi(pdf_path, max_dpi=max_dpi)
+    return int(dpi)
@@ -0,0 +1,171 @@
+# services/pdf_text.py
+"""
+ดึง text layer ของ PDF (ไม่ใช่ OCR) แบบเลือก backend ได้
+
+- pdfium   : pypdfium2 (PDFium text API, C++) — เร็วที่สุด
+- pdfminer : pdfminer.six ต่อ LTTextContainer ตามเดิม (layout analysis เต็ม ช้าบนไฟล์ใหญ่)
+- pypdf2   : PyPDF2 page.extract_text() ตามเดิม (pure Python)
+
+เลือกด้วย backend="auto"|ชื่อ หรือ env PDF_TEXT_BACKEND; ไม่ระบุทั้งคู่ → default ของผู้เรียก
+(ข้อความของแต่ละ backend เว้นวรรค/ขึ้นบรรทัดไม่เหมือนกัน → default ต่อสคริปต์ตาม golden test tests/test_pdf_text_backends.py:
+ pdf_ocr_rm_report_to_json = pdfium (ผลเท่ากับ PyPDF2 เดิม), pdf_ocr_dbd_to_json = pdfminer (pdfium ให้ status ต่างจากเดิม))
+auto: ลองตามลำดับ AUTO_ORDER ตัวที่ติดตั้งและเปิดไฟล์ได้ตัวแรกชนะ (ไฟล์ที่ backend หนึ่งอ่านพัง → ลองตัวถัดไป)
+ผลลัพธ์: list ข้อความต่อหน้า (ขึ้นบรรทัดด้วย \\n) — หน้าไม่มี text layer ได้สตริงว่าง
+
+Benchmark (pages/sec ต่อ backend + เทียบข้อความกับ backend แรก):
+    python -m services.pdf_text --bench raw_data/rm/xxx.pdf downloads/0105541008416_company_info.pdf
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+_HAS_PDFIUM = False
+try:
+    import pypdfium2 as pdfium
+    _HAS_PDFIUM = True
+except Exception:
+    _HAS_PDFIUM = False
+
+_HAS_PDFMINER = False
+try:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    _HAS_PDFMINER = True
+except Exception:
+    _HAS_PDFMINER = False
+
+_HAS_PYPDF2 = False
+try:
+    from PyPDF2 import PdfReader
+    _HAS_PYPDF2 = True
+except Exception:
+    _HAS_PYPDF2 = False
+
+BACKENDS = ("auto", "pdfium", "pdfminer", "pypdf2")
+AUTO_ORDER = ("pdfium", "pdfminer", "pypdf2")
+
+
+# ---------- backends ---------- #
+def _pdfium_pages(pdf_path: str) -> List[str]:
+    pdf = pdfium.PdfDocument(pdf_path)
+    out: List[str] = []
+    try:
+        for i in range(len(pdf)):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                txt = textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+            # PDFium ขึ้นบรรทัดด้วย \r\n
+            out.append(txt.replace("\r\n", "\n").replace("\r", "\n"))
+    finally:
+        pdf.close()
+    return out
+
+
+def _pdfminer_pages(pdf_path: str) -> List[str]:
+    return [
+        "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+        for layout in extract_pages(pdf_path)
+    ]
+
+
+def _pypdf2_pages(pdf_path: str) -> List[str]:
+    reader = PdfReader(pdf_path)
+    out: List[str] = []
+    for page in reader.pages:
+        try:
+            out.append(page.extract_text() or "")
+        except Exception:
+            out.append("")
+    return out
+
+
+_IMPL: Dict[str, Tuple[bool, Callable[[str], List[str]]]] = {
+    "pdfium": (_HAS_PDFIUM, _pdfium_pages),
+    "pdfminer": (_HAS_PDFMINER, _pdfminer_pages),
+    "pypdf2": (_HAS_PYPDF2, _pypdf2_pages),
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name in AUTO_ORDER if _IMPL[name][0]]
+
+
+def _candidates(backend: Optional[str], default: str) -> List[str]:
+    want = (backend or os.environ.get("PDF_TEXT_BACKEND") or default).strip().lower()
+    if want not in BACKENDS:
+        raise ValueError(f"Unknown PDF text backend: {want} (expected one of {BACKENDS})")
+    if want == "auto":
+        return available_backends()
+    if not _IMPL[want][0]:
+        raise RuntimeError(f"PDF text backend '{want}' is not installed")
+    return [want]
+
+
+# ---------- public API ---------- #
+def extract_pages_text(pdf_path: str, backend: Optional[str] = None, default: str = "auto") -> Tuple[List[str], str]:
+    """
+    คืน (ข้อความต่อหน้า, ชื่อ backend ที่ใช้)
+    default: backend เมื่อไม่ได้ระบุ backend และไม่มี env PDF_TEXT_BACKEND
+    ไม่มี backend ติดตั้งเลย หรือทุกตัวเปิดไฟล์ไม่ได้ → RuntimeError
+    """
+    errors: List[str] = []
+    for name in _candidates(backend, default):
+        try:
+            return _IMPL[name][1](pdf_path), name
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    if not errors:
+        raise RuntimeError("No PDF text backend installed (pip install pypdfium2 | pdfminer.six | PyPDF2)")
+    raise RuntimeError(f"Cannot extract text from {pdf_path} ({'; '.join(errors)})")
+
+
+# ---------- benchmark ---------- #
+def _squash(s: str) -> str:
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _bench(pdf_paths: List[str], repeat: int) -> None:
+    backends = available_backends()
+    if not backends:
+        print("❌ no backend installed")
+        return
+    ref: Dict[str, List[str]] = {}
+    for be in backends:
+        n_pages, total = 0, 0.0
+        same, n_cmp = 0, 0
+        for path in pdf_paths:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                pages, _ = extract_pages_text(path, be)
+            total += time.perf_counter() - t0
+            n_pages += len(pages) * repeat
+            if path not in ref:
+                ref[path] = pages
+            else:
+                # เทียบแบบไม่สนช่องว่าง/ขึ้นบรรทัด กับ backend แรก
+                a, b = [_squash(x) for x in ref[path]], [_squash(x) for x in pages]
+                n_cmp += max(len(a), len(b))
+                same += sum(1 for x, y in zip(a, b) if x == y)
+        pps = n_pages / total if total else float("inf")
+        cmp = f"  same text as {backends[0]}: {same}/{n_cmp} pages" if n_cmp else ""
+        print(f"  {be:9s} pages={n_pages:5d}  {total:7.2f}s  {pps:8.1f} pages/s{cmp}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="PDF text-layer backends")
+    ap.add_argument("--bench", nargs="+", metavar="PDF", required=True, help="PDF files to benchmark")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    print(f"▶ {len(args.bench)} file(s), repeat={args.repeat}, backends={available_backends()}")
+    _bench(args.bench, max(1, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
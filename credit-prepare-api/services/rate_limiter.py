@@ -0,0 +1,268 @@
+# services/rate_limiter.py
+"""
+Token bucket ที่ทุก worker บนเครื่องเดียวกันใช้ร่วมกันผ่าน SQLite (ไฟล์เดียว, WAL) + ปรับ rate อัตโนมัติ
+
+- acquire(): รอจนมี token (BEGIN IMMEDIATE → หลาย process ไม่แย่ง token ชิ้นเดียวกัน)
+  rate / token / ช่วงพักถูกเก็บใน DB → scraper หลายตัว (pipeline, --shard บนเครื่องเดียวกัน) เห็นค่าเดียวกัน
+  และค่าที่เรียนรู้ได้คงอยู่ข้ามรอบการรัน
+- feedback(seconds, outcome) แบบ AIMD:
+    ok       → rate += max_rate / RAMP_STEPS (ค่อย ๆ เร่งกลับ)
+    ok แต่ช้า (เกิน SLOW_FACTOR × ค่าเฉลี่ย EWMA) → rate × SLOW_BACKOFF
+    error    → rate × ERROR_BACKOFF (เฉพาะปัญหาฝั่ง transport: timeout / เชื่อมต่อไม่ได้ / browser error — ดู is_transient)
+    blocked  → rate × BLOCK_BACKOFF และพักทุก worker cooldown วินาที (หน้า CAPTCHA / ถูกปฏิเสธ / 429 / 5xx)
+  rate อยู่ในช่วง [min_rate, max_rate] เสมอ
+  exception อื่น (เช่น parse ไม่ได้, หา element ไม่เจอ, เขียนไฟล์ไม่ได้) ไม่เกี่ยวกับภาระของเว็บ → ไม่ปรับ rate
+
+    limiter = SharedRateLimiter("./pipeline/dbd_rate.sqlite", rate_per_min=10, max_per_min=30)
+    with limiter.request():        # acquire → ทำงาน → feedback ตามผล (BlockedError = blocked, transient = error)
+        scrape_one(...)
+
+หมายเหตุ: SQLite ใช้ร่วมกันได้เฉพาะเครื่องเดียวกัน (ไม่ใช้บน network filesystem); หลาย VM → แต่ละเครื่องมี bucket ของตัวเอง
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from selenium.common.exceptions import (
+        ElementClickInterceptedException,
+        ElementNotInteractableException,
+        NoSuchElementException,
+        StaleElementReferenceException,
+        TimeoutException,
+        WebDriverException,
+    )
+    _HAS_SELENIUM = True
+except ImportError:
+    _HAS_SELENIUM = False
+
+OK, ERROR, BLOCKED = "ok", "error", "blocked"
+
+RAMP_STEPS = 20
+SLOW_FACTOR = 2.0
+SLOW_BACKOFF = 0.8
+ERROR_BACKOFF = 0.5
+BLOCK_BACKOFF = 0.25
+EWMA_ALPHA = 0.2
+MIN_SAMPLES = 5
+MAX_SLEEP = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name           TEXT PRIMARY KEY,
+    tokens         REAL NOT NULL,
+    rate           REAL NOT NULL,
+    updated        REAL NOT NULL,
+    cooldown_until REAL NOT NULL DEFAULT 0,
+    lat_ewma       REAL,
+    n_ok           INTEGER NOT NULL DEFAULT 0,
+    n_error        INTEGER NOT NULL DEFAULT 0,
+    n_blocked      INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class BlockedError(RuntimeError):
+    """เว็บปลายทางปฏิเสธ/ขอ CAPTCHA — ให้ทุก worker ชะลอ"""
+
+
+_TRANSIENT: tuple = (TimeoutError, ConnectionError)
+_NOT_TRANSIENT: tuple = ()
+if _HAS_SELENIUM:
+    _TRANSIENT += (TimeoutException, WebDriverException)
+    # WebDriverException ครอบทั้ง error ของ element บนหน้า — เป็นเรื่องโครงสร้างหน้า ไม่ใช่ภาระของเว็บ
+    _NOT_TRANSIENT += (
+        NoSuchElementException,
+        StaleElementReferenceException,
+        ElementNotInteractableException,
+        ElementClickInterceptedException,
+    )
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    timeout / เชื่อมต่อไม่ได้ / browser error → ควรชะลอ (ERROR); อย่างอื่นไม่นับ
+    ไล่ตาม __cause__ / __context__ ด้วย: scraper มัก raise RuntimeError("ไม่พบ...") ใน except ของ wait ที่ timeout
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, _TRANSIENT) and not isinstance(exc, _NOT_TRANSIENT):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class SharedRateLimiter:
+    def __init__(
+        self,
+        db_path: str,
+        name: str = "dbd",
+        rate_per_min: float = 10.0,
+        min_per_min: float = 1.0,
+        max_per_min: float = 30.0,
+        burst: float = 2.0,
+        cooldown: float = 300.0,
+        timeout: float = 30.0,
+        verbose: bool = True,
+    ):
+        self.db_path = os.path.abspath(db_path)
+        self.name = name
+        self.min_rate = min_per_min / 60.0
+        self.max_rate = max(max_per_min, min_per_min) / 60.0
+        self.burst = max(1.0, burst)
+        self.cooldown = cooldown
+        self.verbose = verbose
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._con = sqlite3.connect(self.db_path, timeout=timeout, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_SCHEMA)
+        start = min(self.max_rate, max(self.min_rate, rate_per_min / 60.0))
+        self._con.execute(
+            "INSERT OR IGNORE INTO buckets (name, tokens, rate, updated) VALUES (?, ?, ?, ?)",
+            (name, self.burst, start, time.time()),
+        )
+
+    # ---------- tokens ---------- #
+    def acquire(self) -> float:
+        """รอจนได้ token หนึ่งชิ้น คืนเวลาที่รอ (วินาที)"""
+        t0 = time.monotonic()
+        while True:
+            con = self._con
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, rate, updated, cooldown_until = con.execute(
+                    "SELECT tokens, rate, updated, cooldown_until FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                now = time.time()
+                rate = min(self.max_rate, max(self.min_rate, rate))
+                if now < cooldown_until:
+                    wait = cooldown_until - now
+                    con.execute("COMMIT")
+                else:
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * rate)
+                    if tokens >= 1.0:
+                        con.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens - 1.0, now, self.name))
+                        con.execute("COMMIT")
+                        return time.monotonic() - t0
+                    wait = (1.0 - tokens) / rate
+                    con.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name))
+                    con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            time.sleep(min(MAX_SLEEP, wait))
+
+    # ---------- adaptation ---------- #
+    def feedback(self, seconds: float, outcome: str = OK) -> float:
+        """ปรับ rate ตามผลของงานล่าสุด คืน rate ใหม่ (ต่อนาที)"""
+        con = self._con
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            rate, ewma, n_ok = con.execute(
+                "SELECT rate, lat_ewma, n_ok FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            old = rate
+            note = ""
+            if outcome == BLOCKED:
+                rate *= BLOCK_BACKOFF
+                con.execute(
+                    "UPDATE buckets SET cooldown_until = ?, n_blocked = n_blocked + 1 WHERE name = ?",
+                    (time.time() + self.cooldown, self.name),
+                )
+                note = f"blocked → pause {self.cooldown:.0f}s"
+            elif outcome == ERROR:
+                rate *= ERROR_BACKOFF
+                con.execute("UPDATE buckets SET n_error = n_error + 1 WHERE name = ?", (self.name,))
+                note = "error"
+            else:
+                if ewma is not None and n_ok >= MIN_SAMPLES and seconds > SLOW_FACTOR * ewma:
+                    rate *= SLOW_BACKOFF
+                    note = f"slow {seconds:.1f}s vs avg {ewma:.1f}s"
+                else:
+                    rate += self.max_rate / RAMP_STEPS
+                ewma = seconds if ewma is None else (1 - EWMA_ALPHA) * ewma + EWMA_ALPHA * seconds
+                con.execute(
+                    "UPDATE buckets SET lat_ewma = ?, n_ok = n_ok + 1 WHERE name = ?", (ewma, self.name)
+                )
+            rate = min(self.max_rate, max(self.min_rate, rate))
+            con.execute("UPDATE buckets SET rate = ? WHERE name = ?", (rate, self.name))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        if self.verbose and note and rate < old:
+            print(f"🚦 rate {old * 60:.1f} → {rate * 60:.1f}/min ({note})")
+        return rate * 60.0
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """acquire → ทำงาน → feedback: BlockedError = blocked, is_transient = error, exception อื่นไม่ปรับ rate"""
+        self.acquire()
+        t0 = time.monotonic()
+        try:
+            yield
+        except BlockedError:
+            self.feedback(time.monotonic() - t0, BLOCKED)
+            raise
+        except Exception as e:
+            if is_transient(e):
+                self.feedback(time.monotonic() - t0, ERROR)
+            raise
+        self.feedback(time.monotonic() - t0, OK)
+
+    # ---------- reporting ---------- #
+    def state(self) -> Dict[str, Any]:
+        row = self._con.execute(
+            "SELECT rate, tokens, cooldown_until, lat_ewma, n_ok, n_error, n_blocked FROM buckets WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        rate, tokens, cooldown_until, ewma, n_ok, n_error, n_blocked = row
+        return {
+            "rate_per_min": rate * 60.0,
+            "tokens": tokens,
+            "cooling_down_s": max(0.0, cooldown_until - time.time()),
+            "avg_seconds": ewma,
+            "ok": n_ok,
+            "error": n_error,
+            "blocked": n_blocked,
+        }
+
+    def describe(self) -> str:
+        st = self.state()
+        avg = f"{st['avg_seconds']:.1f}s" if st["avg_seconds"] is not None else "?"
+        cool = f", cooling down {st['cooling_down_s']:.0f}s" if st["cooling_down_s"] else ""
+        return (
+            f"🚦 {self.name}: rate {st['rate_per_min']:.1f}/min (avg {avg}/request){cool}"
+            f" — ok {st['ok']}, error {st['error']}, blocked {st['blocked']} (shared, {self.db_path})"
+        )
+
+    def close(self) -> None:
+        self._con.close()
+
+
+def open_limiter(args) -> Optional[SharedRateLimiter]:
+    """สร้าง limiter จาก argparse (--rate-db, --rate-per-min, --min/max-rate-per-min, --block-cooldown, --no-rate-limit)"""
+    if getattr(args, "no_rate_limit", False):
+        return None
+    return SharedRateLimiter(
+        args.rate_db,
+        rate_per_min=args.rate_per_min,
+        min_per_min=args.min_rate_per_min,
+        max_per_min=args.max_rate_per_min,
+        cooldown=args.block_cooldown,
+    )
+
+
+def add_rate_args(ap) -> None:
+    """flag ชุดเดียวกันสำหรับทุกสคริปต์ที่ใช้ limiter"""
+    ap.add_argument("--rate-db", default=os.environ.get("DBD_RATE_DB", "./pipeline/dbd_rate.sqlite"),
+                    help="ไฟล์ SQLite ที่ทุก worker บนเครื่องใช้ร่วมกัน (env DBD_RATE_DB)")
+    ap.add_argument("--rate-per-min", type=float, default=10.0, help="rate เริ่มต้น (บริษัท/นาที) เมื่อยังไม่มีค่าใน DB")
+    ap.add_argument("--min-rate-per-min", type=float, default=1.0)
+    ap.add_argument("--max-rate-per-min", type=float, default=30.0)
+    ap.add_argument("--block-cooldown", type=float, default=300.0, help="พักทุก worker กี่วินาทีเมื่อเจอ CAPTCHA/ถูกปฏิเสธ")
+    ap.add_argument("--no-rate-limit", action="store_true", help="ไม่จำกัด rate")
@@ -0,0 +1,193 @@
+# services/record_sink.py
+"""
+RecordSink — เขียน record ลงไฟล์ทีละรายการ (streaming) แทนการเก็บทั้งหมดใน list แล้ว json.dump
+
+รองรับ 2 รูปแบบ:
+  - "json"   : JSON array แบบเดิม (indent เหมือน json.dump) เพื่อ backward compatibility
+               ถ้าระบุ envelope/records_key จะได้ object เช่น {"file": ..., "transactions": [...], ...}
+  - "ndjson" : หนึ่ง record ต่อหนึ่งบรรทัด (envelope/tail จะถูกละไว้)
+
+- ถ้าชื่อไฟล์ลงท้าย .gz หรือ gzip=True จะบีบอัดด้วย gzip
+- เขียนลงไฟล์ชั่วคราว <name>.tmp ก่อน แล้ว os.replace เมื่อ close() สำเร็จ (atomic rename)
+  ถ้าเกิด exception ภายใน with-block ไฟล์ชั่วคราวจะถูกลบ และไฟล์เดิม (ถ้ามี) ไม่ถูกแตะ
+
+ตัวอย่าง:
+    with RecordSink(out_path) as sink:
+        for rec in produce_records():
+            sink.write(rec)
+"""
+
+import gzip as _gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+FORMATS = ("json", "ndjson")
+
+
+def sink_path(out_dir: Union[str, Path], stem: str, fmt: str = "json", gzip: bool = False) -> Path:
+    """คืน path ของไฟล์ผลลัพธ์ตามรูปแบบ: <stem>.json | <stem>.ndjson (+ .gz)"""
+    ext = ".ndjson" if fmt == "ndjson" else ".json"
+    if gzip:
+        ext += ".gz"
+    return Path(out_dir) / f"{stem}{ext}"
+
+
+def _indent_block(text: str, prefix: str) -> str:
+    return "\n".join(prefix + ln for ln in text.split("\n"))
+
+
+class RecordSink:
+    def __init__(
+        self,
+        out_path: Union[str, Path],
+        fmt: str = "json",
+        gzip: Optional[bool] = None,
+        indent: Optional[int] = 2,
+        encoding: str = "utf-8",
+        envelope: Optional[Dict[str, Any]] = None,
+        records_key: Optional[str] = None,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported sink format: {fmt} (expected one of {FORMATS})")
+        self.path = Path(out_path)
+        self.fmt = fmt
+        self.gzip = self.path.suffix.lower() == ".gz" if gzip is None else gzip
+        self.indent = indent
+        self.encoding = encoding
+        self.envelope = dict(envelope or {})
+        self.records_key = records_key or ("records" if envelope else None)
+        self.count = 0
+
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._fh = None
+        self._closed = False
+
+    # ---------- lifecycle ---------- #
+    def open(self) -> "RecordSink":
+        if self._fh is not None:
+            return self
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.gzip:
+            self._fh = _gzip.open(self._tmp, "wt", encoding=self.encoding)
+        else:
+            self._fh = open(self._tmp, "w", encoding=self.encoding)
+        if self.fmt == "json":
+            self._write_head()
+        return self
+
+    def __enter__(self) -> "RecordSink":
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def close(self, tail: Optional[Dict[str, Any]] = None) -> Path:
+        """ปิดไฟล์และ rename ไฟล์ชั่วคราวไปยังปลายทาง; tail = field ที่จะต่อท้าย object (โหมด json)"""
+        if self._closed:
+            return self.path
+        self.open()
+        if self.fmt == "json":
+            self._write_tail(tail or {})
+        self._fh.close()
+        os.replace(self._tmp, self.path)
+        self._closed = True
+        return self.path
+
+    def abort(self) -> None:
+        if self._closed:
+            return
+        try:
+            if self._fh is not None:
+                self._fh.close()
+        finally:
+            self._closed = True
+            if self._tmp.exists():
+                self._tmp.unlink()
+
+    # ---------- writing ---------- #
+    def write(self, rec: Any) -> None:
+        self.open()
+        if self.fmt == "ndjson":
+            self._fh.write(json.dumps(rec, ensure_ascii=False))
+            self._fh.write("\n")
+        else:
+            self._fh.write("\n" if self.count == 0 else ",\n")
+            self._fh.write(_indent_block(self._dumps(rec), self._item_prefix()))
+        self.count += 1
+
+    def extend(self, records: Iterable[Any]) -> int:
+        n = 0
+        for rec in records:
+            self.write(rec)
+            n += 1
+        return n
+
+    # ---------- json (array) mode helpers ---------- #
+    def _dumps(self, obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, indent=self.indent)
+
+    def _pad(self, level: int) -> str:
+        return " " * (self.indent or 0) * level if self.indent else ""
+
+    def _item_prefix(self) -> str:
+        return self._pad(2 if self.records_key else 1)
+
+    def _write_head(self) -> None:
+        if not self.records_key:
+            self._fh.write("[")
+            return
+        self._fh.write("{")
+        for k, v in self.envelope.items():
+            self._fh.write(f"\n{self._pad(1)}{json.dumps(k, ensure_ascii=False)}: ")
+            self._fh.write(_indent_block(self._dumps(v), self._pad(1)).lstrip(" "))
+            self._fh.write(",")
+        self._fh.write(f"\n{self._pad(1)}{json.dumps(self.records_key, ensure_ascii=False)}: [")
+
+    def _write_tail(self, tail: Dict[str, Any]) -> None:
+        close_arr = f"\n{self._pad(1 if self.records_key else 0)}]" if self.count else "]"
+        self._fh.write(close_arr)
+        if not self.records_key:
+            return
+        for k, v in tail.items():
+            self._fh.write(f",\n{self._pad(1)}{json.dumps(k, ensure_ascii=False)}: ")
+            self._fh.write(_indent_block(self._dumps(v), self._pad(1)).lstrip(" "))
+        self._fh.write("\n}")
+
+
+def write_document(
+    out_path: Union[str, Path],
+    doc: Any,
+    records_key: Optional[str] = None,
+    fmt: str = "json",
+    gzip: Optional[bool] = None,
+    **kwargs: Any,
+) -> int:
+    """
+    เขียน payload ที่ประกอบเสร็จแล้ว (list หรือ dict ที่มี list อยู่ใน records_key) ผ่าน RecordSink
+    โหมด json ได้ผลเหมือน json.dump ทุกไบต์; โหมด ndjson เขียนเฉพาะรายการใน records_key
+    คืนจำนวน record ที่เขียน
+    """
+    if isinstance(doc, dict) and records_key in doc:
+        keys = list(doc.keys())
+        pos = keys.index(records_key)
+        envelope = {k: doc[k] for k in keys[:pos]}
+        tail = {k: doc[k] for k in keys[pos + 1:]}
+        sink = RecordSink(out_path, fmt=fmt, gzip=gzip, envelope=envelope, records_key=records_key, **kwargs)
+        records = doc[records_key]
+    else:
+        tail = None
+        sink = RecordSink(out_path, fmt=fmt, gzip=gzip, **kwargs)
+        records = doc
+    try:
+        sink.extend(records)
+        sink.close(tail=tail)
+    except BaseException:
+        sink.abort()
+        raise
+    return sink.count
@@ -0,0 +1,111 @@
+# services/sent_ledger.py
+"""
+บันทึก hash ของ payload ที่ส่ง API สำเร็จแล้ว (SQLite ไฟล์เดียว) → รอบถัดไปข้ามรายการที่ไม่เปลี่ยน
+
+- หนึ่งแถวต่อ (target, key) เช่น ("http://api/.../dbd-company-supplier", "0105541008416")
+- hash = sha256 ของ JSON แบบ canonical (sort_keys, ไม่มีช่องว่าง) → ลำดับ key ใน dict ไม่มีผล
+- บันทึกเฉพาะที่ส่งสำเร็จ; ส่งไม่ผ่าน → รอบหน้าส่งใหม่
+
+    ledger = SentLedger("./pipeline/dbd_sent_ledger.sqlite")
+    body, h = canonical_json(payload)
+    if not ledger.unchanged(url, jid, h):
+        ... POST body ...
+        ledger.record(url, jid, h)
+
+แต่ละ thread ใช้ connection ของตัวเอง (sqlite3 ห้ามแชร์ข้าม thread)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent (
+    target  TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    hash    TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (target, key)
+);
+"""
+
+
+def canonical_json(payload: Any) -> Tuple[bytes, str]:
+    """คืน (body UTF-8 แบบ canonical, sha256 hex)"""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()
+
+
+class SentLedger:
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db_path = os.path.abspath(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            self._local.con = con
+        return con
+
+    def get(self, target: str, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT hash FROM sent WHERE target = ? AND key = ?", (target, key)).fetchone()
+        return row[0] if row else None
+
+    def unchanged(self, target: str, key: str, digest: str) -> bool:
+        return self.get(target, key) == digest
+
+    def record(self, target: str, key: str, digest: str) -> None:
+        self._conn().execute(
+            "INSERT INTO sent (target, key, hash, sent_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(target, key) DO UPDATE SET hash = excluded.hash, sent_at = excluded.sent_at",
+            (target, key, digest, time.time()),
+        )
+
+    def load(self, target: str) -> Dict[str, str]:
+        """key → hash ทั้งหมดของ target (ใช้เทียบทีละหลายแถว เช่น services/delta.py)"""
+        return dict(self._conn().execute("SELECT key, hash FROM sent WHERE target = ?", (target,)).fetchall())
+
+    def record_many(self, target: str, items: Iterable[Tuple[str, str]]) -> int:
+        """บันทึก (key, hash) หลายรายการใน transaction เดียว"""
+        now = time.time()
+        rows = [(target, k, h, now) for k, h in items]
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.executemany(
+                "INSERT INTO sent (target, key, hash, sent_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(target, key) DO UPDATE SET hash = excluded.hash, sent_at = excluded.sent_at",
+                rows,
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def forget(self, target: str, key: Optional[str] = None) -> int:
+        """ลบประวัติ (ทั้ง target หรือรายการเดียว) → ส่งใหม่รอบหน้า"""
+        if key is None:
+            cur = self._conn().execute("DELETE FROM sent WHERE target = ?", (target,))
+        else:
+            cur = self._conn().execute("DELETE FROM sent WHERE target = ? AND key = ?", (target, key))
+        return cur.rowcount
+
+    def count(self, target: Optional[str] = None) -> Dict[str, int]:
+        sql = "SELECT target, COUNT(*) FROM sent" + (" WHERE target = ?" if target else "") + " GROUP BY target"
+        return dict(self._conn().execute(sql, (target,) if target else ()).fetchall())
+
+    def close(self) -> None:
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
@@ -0,0 +1,64 @@
+# services/sharding.py
+"""
+แบ่งงานเป็น shard แบบกำหนดตายตัว (ไม่ต้องมีตัวกลางประสานระหว่างเครื่อง)
+
+--shard i/N  (i = 1..N) → เครื่องที่ i ทำเฉพาะ key ที่ shard_index(key, N) == i - 1
+- hash = 8 byte แรกของ md5(key) → เหมือนกันทุกเครื่อง/ทุก process (ไม่ใช้ hash() ของ Python ที่สุ่ม seed)
+- key ของไฟล์ = เลขนิติบุคคลที่ขึ้นต้นชื่อไฟล์ (<id>_company_info.pdf) → บริษัทเดียวกันอยู่ shard เดียวกัน
+  ทั้งตอน scrape และ OCR; ไฟล์ที่ไม่มีเลขนำหน้าใช้ชื่อไฟล์ทั้งชื่อ
+- ไม่ขึ้นกับลำดับหรือจำนวนรายการในไฟล์ ids → เพิ่ม/ลบ id ไม่ทำให้ id อื่นย้าย shard
+"""
+
+import argparse
+import hashlib
+import os
+import re
+from typing import Callable, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+Shard = Tuple[int, int]  # (i, N) แบบ 1-based
+
+_SHARD_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+_ID_PREFIX_RE = re.compile(r"^(\d{10,13})_")
+
+
+def shard_arg(value: str) -> Shard:
+    """argparse type: 'i/N' (1 ≤ i ≤ N)"""
+    m = _SHARD_RE.match(str(value))
+    if not m:
+        raise argparse.ArgumentTypeError(f"expected i/N (e.g. 1/4), got {value!r}")
+    i, n = int(m.group(1)), int(m.group(2))
+    if n < 1 or not 1 <= i <= n:
+        raise argparse.ArgumentTypeError(f"shard index must be within 1..N, got {value!r}")
+    return i, n
+
+
+def shard_index(key: str, n: int) -> int:
+    """0-based shard ของ key เมื่อแบ่ง n ส่วน"""
+    digest = hashlib.md5(key.strip().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % n
+
+
+def file_key(path: str) -> str:
+    """key ของไฟล์: เลขนิติบุคคลนำหน้าชื่อไฟล์ ถ้าไม่มีใช้ชื่อไฟล์"""
+    name = os.path.basename(path)
+    m = _ID_PREFIX_RE.match(name)
+    return m.group(1) if m else name
+
+
+def in_shard(key: str, shard: Optional[Shard]) -> bool:
+    if shard is None:
+        return True
+    i, n = shard
+    return shard_index(key, n) == i - 1
+
+
+def select_shard(items: Iterable[T], shard: Optional[Shard], key: Callable[[T], str] = str) -> List[T]:
+    """กรองรายการที่อยู่ใน shard (คงลำดับเดิม); shard=None → คืนทั้งหมด"""
+    return [it for it in items if in_shard(key(it), shard)]
+
+
+def describe(shard: Optional[Shard], selected: int, total: int) -> str:
+    if shard is None:
+        return f"{total} item(s)"
+    return f"shard {shard[0]}/{shard[1]}: {selected} of {total} item(s)"
@@ -0,0 +1,308 @@
+# services/title_card.py
+"""
+Parse การ์ด "ข้อมูลนิติบุคคล" ของ DBD Data Warehouse จาก HTML (ไม่ต้องใช้ WebDriver)
+
+scraper ดึง outerHTML ของ .cac-certified + การ์ดด้วย execute_script ครั้งเดียว (SNAPSHOT_JS)
+แล้วแปลงที่นี่ แทนการเรียก find_element / .text / get_attribute ทีละช่อง (ทุกครั้งคือ HTTP ไป chromedriver)
+
+- ใช้ html.parser ของ stdlib: outerHTML ที่ browser serialize มาปิด tag ครบอยู่แล้ว ไม่ต้องพึ่ง lxml
+- text ของ element เลียนแบบ WebElement.text หลัง norm_txt: <br> และขอบ block element = ช่องว่าง,
+  ข้าม script/style และ element ที่ซ่อนด้วย hidden / display:none
+- selector เหมือนเดิม: .cac-certified h3/h4, การ์ด = div[class*=card-infos] ที่ครอบ h5[class*=card-title] "ข้อมูลนิติบุคคล",
+  แถว = .card-body .row .col-6 (คู่ label/value), ปีงบ = .tab1fiscal (title หรือ text)
+
+ทดสอบกับไฟล์ HTML ที่บันทึกไว้ (เช่น debug_*.html จาก save_debug หรือหน้าเว็บที่ save จาก browser):
+    python -m services.title_card downloads/debug_company_title_not_found_1700000000.html
+    python -m services.title_card page.html --bench 200
+"""
+
+import argparse
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+CARD_TITLE = "ข้อมูลนิติบุคคล"
+
+# scrollIntoView เหมือนเดิม + คืน HTML ที่ต้องใช้ทั้งหมดใน round-trip เดียว
+SNAPSHOT_JS = """
+const title = arguments[0];
+if (title) title.scrollIntoView({block: 'center'});
+const cac = document.querySelector('.cac-certified');
+const card = document.evaluate(
+  "//h5[contains(@class,'card-title')][contains(.,'%s')]/ancestor::div[contains(@class,'card-infos')]",
+  document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return (cac ? cac.outerHTML : '') + (card ? card.outerHTML : '');
+""" % CARD_TITLE
+
+MONTHS_TH = {
+    "ม.ค.": 1, "ก.พ.": 2, "มี.ค.": 3, "เม.ย.": 4, "พ.ค.": 5, "มิ.ย.": 6,
+    "ก.ค.": 7, "ส.ค.": 8, "ก.ย.": 9, "ต.ค.": 10, "พ.ย.": 11, "ธ.ค.": 12
+}
+
+_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_SKIP = {"script", "style", "template", "noscript", "head"}
+_BLOCK = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+_DISPLAY_NONE_RE = re.compile(r"display\s*:\s*none", re.IGNORECASE)
+
+
+# ---------- minimal DOM ---------- #
+@dataclass
+class _Node:
+    tag: str
+    attrs: Dict[str, str]
+    parent: Optional["_Node"] = None
+    children: List[Union["_Node", str]] = field(default_factory=list)
+
+    def classes(self) -> List[str]:
+        return self.attrs.get("class", "").split()
+
+    def has_class(self, name: str) -> bool:
+        """CSS .name (token ตรงตัว)"""
+        return name in self.classes()
+
+    def class_contains(self, part: str) -> bool:
+        """XPath contains(@class, part)"""
+        return part in self.attrs.get("class", "")
+
+    def iter(self) -> Iterator["_Node"]:
+        """ลูกหลานทั้งหมดตามลำดับเอกสาร (ไม่รวมตัวเอง)"""
+        for ch in self.children:
+            if isinstance(ch, _Node):
+                yield ch
+                yield from ch.iter()
+
+    def find(self, pred: Callable[["_Node"], bool]) -> Optional["_Node"]:
+        return next((n for n in self.iter() if pred(n)), None)
+
+    def find_all(self, pred: Callable[["_Node"], bool]) -> List["_Node"]:
+        return [n for n in self.iter() if pred(n)]
+
+    def ancestors(self) -> Iterator["_Node"]:
+        p = self.parent
+        while p is not None:
+            yield p
+            p = p.parent
+
+    def string_value(self) -> str:
+        """XPath string(.) — text node ทั้งหมดต่อกัน"""
+        return "".join(ch if isinstance(ch, str) else ch.string_value() for ch in self.children)
+
+    def _hidden(self) -> bool:
+        return self.tag in _SKIP or "hidden" in self.attrs or bool(_DISPLAY_NONE_RE.search(self.attrs.get("style", "")))
+
+    def _rendered(self, out: List[str]) -> None:
+        for ch in self.children:
+            if isinstance(ch, str):
+                out.append(ch)
+            elif ch.tag == "br":
+                out.append(" ")
+            elif not ch._hidden():
+                block = ch.tag in _BLOCK
+                if block:
+                    out.append(" ")
+                ch._rendered(out)
+                if block:
+                    out.append(" ")
+
+    @property
+    def text(self) -> str:
+        """เทียบเท่า WebElement.text หลัง norm_txt"""
+        out: List[str] = []
+        self._rendered(out)
+        return norm_txt("".join(out))
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#document", {})
+        self._stack: List[_Node] = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, {k: (v if v is not None else "") for k, v in attrs}, parent=self._stack[-1])
+        self._stack[-1].children.append(node)
+        if tag not in _VOID:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        # ปิดถึง tag ที่ตรงกันล่าสุด; end tag ที่ไม่มีคู่ → ข้าม
+        for i in range(len(self._stack) - 1, 0, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+
+def parse_html(html: str) -> _Node:
+    tb = _TreeBuilder()
+    tb.feed(html)
+    tb.close()
+    return tb.root
+
+
+# ---------- field helpers ---------- #
+def norm_txt(s: str) -> str:
+    return " ".join((s or "").replace("\xa0", " ").split()).strip()
+
+
+def thai_date_to_iso(date_text: str) -> Optional[str]:
+    try:
+        parts = date_text.strip().split()
+        if len(parts) != 3:
+            return None
+        day = int(parts[0])
+        month_th = parts[1]
+        year_th = int(parts[2])
+        month = MONTHS_TH.get(month_th)
+        if not month:
+            return None
+        year = year_th - 543 if year_th > 2400 else year_th
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    except Exception:
+        return None
+
+
+def _find_card(root: _Node) -> Optional[_Node]:
+    for h5 in root.find_all(lambda n: n.tag == "h5" and n.class_contains("card-title")):
+        if CARD_TITLE not in h5.string_value():
+            continue
+        cards = [a for a in h5.ancestors() if a.tag == "div" and a.class_contains("card-infos")]
+        if cards:
+            return cards[-1]  # ตัวแรกตามลำดับเอกสาร = ตัวนอกสุด (เหมือน find_element ด้วย XPath)
+    return None
+
+
+def _card_rows(card: _Node) -> List[_Node]:
+    """.card-body .row .col-6 ภายในการ์ด"""
+    def match(n: _Node) -> bool:
+        if not n.has_class("col-6"):
+            return False
+        anc = list(n.ancestors())
+        for i, a in enumerate(anc):
+            if a.has_class("row") and any(b.has_class("card-body") for b in anc[i + 1:]):
+                return True
+        return False
+    return card.find_all(match)
+
+
+# ---------- public API ---------- #
+def parse_title_card(html: str) -> Dict[str, Any]:
+    """
+    HTML (snapshot จาก SNAPSHOT_JS หรือทั้งหน้า) → dict schema เดียวกับ <id>_company_title.json
+    ไม่พบการ์ด → RuntimeError
+    """
+    root = parse_html(html)
+
+    # ---------- .cac-certified (ชื่อบริษัท + เลขทะเบียน) ----------
+    company_name = None
+    registration_no = None
+    cac = root.find(lambda n: n.has_class("cac-certified"))
+    if cac is not None:
+        h3 = cac.find(lambda n: n.tag == "h3")
+        if h3 is not None:
+            # ตัด prefix "ชื่อนิติบุคคล :" (เผื่อมีสเปซ/โคลอนหลายแบบ)
+            company_name = re.sub(r"^\s*ชื่อนิติบุคคล\s*[:：]\s*", "", h3.text) or None
+        h4 = cac.find(lambda n: n.tag == "h4")
+        if h4 is not None:
+            reg_txt = re.sub(r"^\s*เลขทะเบียนนิติบุคคล\s*[:：]\s*", "", h4.text)
+            # เก็บเฉพาะเลข (รองรับมีขีด/ช่องว่าง)
+            m = re.search(r"(\d{10,20})", re.sub(r"[^\d]", "", reg_txt))
+            if m:
+                registration_no = m.group(1)
+
+    card = _find_card(root)
+    if card is None:
+        raise RuntimeError(f"ไม่พบการ์ด '{CARD_TITLE}'")
+    rows = _card_rows(card)
+
+    data: Dict[str, Any] = {
+        "company_name": company_name,
+        "registration_no": registration_no,
+        "entity_type": None,
+        "entity_status": None,
+        "incorporation_date_th_text": None,
+        "registered_date": None,  # YYYY-MM-DD
+        "registered_capital_text": None,
+        "old_registration_no": None,
+        "business_group": None,
+        "business_size": None,
+        "financial_filing_years_th": [],
+        "head_office_address": None,
+        "website": None,
+    }
+
+    i = 0
+    while i < len(rows) - 1:
+        label = rows[i].text
+        value_el = rows[i + 1]
+
+        if "ปีที่ส่งงบการเงิน" in label:
+            spans = value_el.find_all(lambda n: n.has_class("tab1fiscal"))
+            if spans:
+                yrs = [sp.attrs.get("title") or sp.text for sp in spans]
+            else:
+                yrs = [y for y in value_el.text.split() if y.isdigit()]
+            data["financial_filing_years_th"] = [y for y in yrs if y]
+            i += 2
+            continue
+
+        val = value_el.text
+
+        if label == "ประเภทนิติบุคคล":
+            data["entity_type"] = val or None
+        elif label == "สถานะนิติบุคคล":
+            data["entity_status"] = val or None
+        elif label == "วันที่จดทะเบียนจัดตั้ง":
+            data["incorporation_date_th_text"] = val or None
+            data["registered_date"] = thai_date_to_iso(val)
+        elif label == "ทุนจดทะเบียน":
+            data["registered_capital_text"] = val or None
+        elif label == "เลขทะเบียนเดิม":
+            data["old_registration_no"] = val or None
+        elif label == "กลุ่มธุรกิจ":
+            data["business_group"] = val or None
+        elif label == "ขนาดธุรกิจ":
+            data["business_size"] = val or None
+        elif label == "ที่ตั้งสำนักงานแห่งใหญ่":
+            data["head_office_address"] = val or None
+        elif label == "Website":
+            data["website"] = (val if val and val != "-" else None)
+        i += 2
+
+    return data
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parse saved DBD company pages into company_title JSON")
+    ap.add_argument("html_files", nargs="+", help="ไฟล์ HTML ที่บันทึกไว้ (ทั้งหน้า หรือ snapshot)")
+    ap.add_argument("--bench", type=int, default=0, metavar="N", help="parse ซ้ำ N รอบแล้วแสดงเวลาเฉลี่ย")
+    args = ap.parse_args()
+    for path in args.html_files:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        print(f"▶ {path}")
+        print(json.dumps(parse_title_card(html), ensure_ascii=False, indent=2))
+        if args.bench > 0:
+            t0 = time.perf_counter()
+            for _ in range(args.bench):
+                parse_title_card(html)
+            ms = (time.perf_counter() - t0) * 1000 / args.bench
+            print(f"  {ms:.2f} ms/parse ({len(html):,} chars)")
+
+
+if __name__ == "__main__":
+    main()
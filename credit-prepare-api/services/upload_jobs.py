@@ -0,0 +1,227 @@
+# services/upload_jobs.py
+"""
+งานแปลงไฟล์ที่อัปโหลดผ่าน API (main.py /upload/...) — รันบน process pool
+
+- save_stream(): คัดลอกไฟล์อัปโหลดลงดิสก์ทีละ chunk (ไม่อ่านทั้งไฟล์เข้าหน่วยความจำ)
+- run_job(kind, path): ใช้ parser เดิมของแต่ละชนิด แล้วเขียนผลเป็น NDJSON ที่ processed_data/uploads/<kind>/<batch>/<ชื่อไฟล์เต็ม>.ndjson
+  คืนสรุป (rows, output, seconds) — ตัว record ไม่ถูกส่งข้าม process (API อ่านจากไฟล์ output เมื่อต้องการ)
+- iter_results(): รอผลตามลำดับที่เสร็จ แล้วคืนบรรทัด NDJSON (สรุปต่อไฟล์ + สรุปรวมบรรทัดสุดท้าย)
+
+ชนิด (kind):
+  invoice     .csv/.xlsx/.xls  → services/inv_old_processor.load_old_invoice_data
+  po-report   .csv/.xlsx/.xls  → read_po_csv_to_json.iter_records
+  remittance  .pdf             → pdf_ocr_rm_report_to_json.iter_remittance_records
+  dbd         <tax_id>_<balance|income|ratios>.xls[x] → script_read_dbd_financials (long rows)
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+from services.record_sink import RecordSink, sink_path
+
+# env อ่านตอนใช้งาน (main.py เรียก load_dotenv() หลัง import): UPLOAD_DIR, UPLOAD_OUTPUT_DIR, UPLOAD_WORKERS
+CHUNK = 1024 * 1024
+
+EXTENSIONS = {
+    "invoice": (".csv", ".xlsx", ".xls"),
+    "po-report": (".csv", ".xlsx", ".xls"),
+    "remittance": (".pdf",),
+    "dbd": (".xls", ".xlsx"),
+}
+KINDS = tuple(EXTENSIONS)
+
+_SAFE_NAME = re.compile(r"[^\w.\-() ]+", re.UNICODE)
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """process pool เดียวต่อ API process (สร้างเมื่อใช้ครั้งแรก)"""
+    global _pool
+    if _pool is None:
+        workers = int(os.getenv("UPLOAD_WORKERS", "0")) or (os.cpu_count() or 2)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    """worker ตาย (OOM/segfault) → pool ใช้ต่อไม่ได้อีก; ทิ้งตัวนี้ให้ get_pool() สร้างใหม่
+    (เทียบตัว object เพื่อไม่ทิ้ง pool ใหม่ที่ request อื่นสร้างไปแล้ว)"""
+    global _pool
+    broken.shutdown(wait=False, cancel_futures=True)
+    if _pool is broken:
+        _pool = None
+
+
+def _drop_if_broken() -> None:
+    """ตรวจ pool ปัจจุบันด้วย submit งานว่าง (pool เสียจะ raise ทันที)"""
+    pool = _pool
+    if pool is None:
+        return
+    try:
+        pool.submit(int).cancel()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    except RuntimeError:  # shutdown แล้ว
+        pass
+
+
+# ---------- upload → disk ---------- #
+
+def batch_dir(kind: str) -> Path:
+    """โฟลเดอร์ของการอัปโหลดหนึ่งครั้ง (ชื่อไฟล์เดิมคงไว้ เพราะ dbd ใช้ชื่อไฟล์หา tax_id/statement)"""
+    d = Path(os.getenv("UPLOAD_DIR", "./raw_data/uploads")) / kind / f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def safe_filename(name: Optional[str]) -> str:
+    base = Path(name or "").name.strip()
+    base = _SAFE_NAME.sub("_", base).lstrip(".")
+    return base or f"upload_{uuid.uuid4().hex[:8]}"
+
+
+def check_file(kind: str, filename: str) -> Optional[str]:
+    """คืนข้อความ error ถ้าไฟล์ไม่ตรงกับ kind (None = ผ่าน)"""
+    if not filename.lower().endswith(EXTENSIONS[kind]):
+        return f"expected {'/'.join(EXTENSIONS[kind])}"
+    if kind == "dbd":
+        from script_read_dbd_financials import FILE_RE
+        if not FILE_RE.match(filename):
+            return "expected <tax_id>_<balance|income|ratios>.xls[x]"
+    return None
+
+
+def save_stream(src: BinaryIO, dest: Path) -> int:
+    """คัดลอก stream ลงไฟล์ทีละ CHUNK คืนจำนวน byte"""
+    n = 0
+    with open(dest, "wb") as out:
+        while True:
+            buf = src.read(CHUNK)
+            if not buf:
+                break
+            out.write(buf)
+            n += len(buf)
+    return n
+
+
+# ---------- per-kind records (รันใน worker) ---------- #
+
+def _invoice_records(path: Path) -> Iterable[Dict[str, Any]]:
+    from services.inv_old_processor import load_old_invoice_data
+    df = load_old_invoice_data(str(path.resolve()))
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def _po_report_records(path: Path) -> Iterable[Dict[str, Any]]:
+    from read_po_csv_to_json import iter_records
+    return iter_records(path)
+
+
+def _remittance_records(path: Path) -> Iterable[Dict[str, Any]]:
+    from pdf_ocr_rm_report_to_json import iter_remittance_records
+    return iter_remittance_records(path)
+
+
+def _dbd_records(path: Path) -> Iterable[Dict[str, Any]]:
+    from script_read_dbd_financials import CONVERTERS, FILE_RE, year_json_to_rows
+    m = FILE_RE.match(path.name)
+    stmt = m.group("stmt").lower()
+    return year_json_to_rows(CONVERTERS[stmt](path, m.group("tax"), None, False), stmt)
+
+
+_RECORDS = {
+    "invoice": _invoice_records,
+    "po-report": _po_report_records,
+    "remittance": _remittance_records,
+    "dbd": _dbd_records,
+}
+
+
+def run_job(kind: str, path: str, out_dir: str) -> Dict[str, Any]:
+    """แปลงไฟล์เดียว → NDJSON (เรียกใน worker process)"""
+    t0 = time.monotonic()
+    src = Path(path)
+    # ใช้ชื่อเต็ม (มีนามสกุล): a.csv กับ a.xlsx ในการอัปโหลดเดียวกันต้องได้ output คนละไฟล์
+    out = sink_path(Path(out_dir) / kind / src.parent.name, src.name, "ndjson")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with RecordSink(out, fmt="ndjson") as sink:
+        rows = sink.extend(_RECORDS[kind](src))
+    return {"rows": rows, "output": str(out), "seconds": round(time.monotonic() - t0, 3)}
+
+
+# ---------- results → NDJSON ---------- #
+
+def _line(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str) + "\n"
+
+
+def iter_results(
+    jobs: Dict[Future, str],
+    rejected: Optional[Dict[str, str]] = None,
+    records: bool = False,
+) -> Iterator[str]:
+    """บรรทัด NDJSON ตามลำดับที่ไฟล์เสร็จ:
+    {"file", "status": "ok", "rows", "output", "seconds"} | {"file", "status": "error", "error"}
+    records=True → ก่อนบรรทัดสรุปของแต่ละไฟล์ ส่ง {"file", "record": {...}} ทุกแถว
+    บรรทัดสุดท้าย: {"done": true, "files", "ok", "failed", "rows", "seconds"}
+    """
+    t0 = time.monotonic()
+    ok = failed = rows = 0
+    for name, err in (rejected or {}).items():
+        failed += 1
+        yield _line({"file": name, "status": "error", "error": err})
+    for fut in as_completed(jobs):
+        name = jobs[fut]
+        try:
+            res = fut.result()
+        except BrokenProcessPool as e:
+            # งานที่เหลือใน pool เดียวกันจะได้ error นี้ด้วย; request ถัดไปได้ pool ใหม่
+            _drop_if_broken()
+            failed += 1
+            yield _line({"file": name, "status": "error", "error": f"{type(e).__name__}: {e}"})
+            continue
+        except Exception as e:
+            failed += 1
+            yield _line({"file": name, "status": "error", "error": f"{type(e).__name__}: {e}"})
+            continue
+        if records:
+            prefix = '{"file": ' + json.dumps(name, ensure_ascii=False) + ', "record": '
+            with open(res["output"], encoding="utf-8") as f:
+                for ln in f:
+                    yield prefix + ln.rstrip("\n") + "}\n"
+        ok += 1
+        rows += res["rows"]
+        yield _line({"file": name, "status": "ok", **res})
+    yield _line({
+        "done": True,
+        "files": ok + failed,
+        "ok": ok,
+        "failed": failed,
+        "rows": rows,
+        "seconds": round(time.monotonic() - t0, 3),
+    })
+
+
+def submit(kind: str, path: Path) -> Future:
+    """ส่งงานเข้า pool; pool เสีย (worker ก่อนหน้าตาย) → สร้างใหม่แล้วส่งอีกครั้ง"""
+    args = (run_job, kind, str(path), os.getenv("UPLOAD_OUTPUT_DIR", "./processed_data/uploads"))
+    pool = get_pool()
+    try:
+        return pool.submit(*args)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return get_pool().submit(*args)
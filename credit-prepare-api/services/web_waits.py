@@ -0,0 +1,214 @@
+# services/web_waits.py
+"""
+รอแบบมีเงื่อนไข (แทน time.sleep คงที่) สำหรับ Selenium scraper
+
+- wait_any(driver, {"menu": js, "empty": js}, ...) : รอหลายเงื่อนไขพร้อมกัน ประเมินด้วย execute_script ครั้งเดียวต่อรอบ
+  คืนชื่อเงื่อนไขแรก (ตามลำดับ dict) ที่เป็นจริง
+- wait_until(driver, EC..., ...)                   : WebDriverWait เดิม แต่ poll ถี่ขึ้นและจับเวลา
+- dismiss_popups(driver, xpaths)                   : ปิด popup ที่เห็นอยู่ แล้วเฝ้าด้วย MutationObserver จน
+                                                     ไม่มี popup ใหม่ภายใน popup_quiet วินาที (execute_async_script ครั้งเดียว)
+- timed(name)                                      : จับเวลาการรออื่น ๆ (เช่นรอไฟล์ดาวน์โหลด)
+
+ทุกการรอพิมพ์เวลาที่ใช้ (⏱ name: 0.42s) และเก็บสถิติไว้ให้ summary() สรุป p50/p90/max ต่อชื่อ
+ปิดการพิมพ์รายครั้งด้วย env DBD_WAIT_LOG=0
+
+Timeout ต่อสภาพแวดล้อม (วินาที):
+- DBD_WAIT_SCALE=2        คูณทุก timeout (เครื่อง/เน็ตช้า)
+- DBD_WAIT_<FIELD>=45     กำหนดรายตัว เช่น DBD_WAIT_TAB=40, DBD_WAIT_POLL=0.2 (ไม่ถูกคูณด้วย SCALE)
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+@dataclass
+class Timeouts:
+    page: float = 30.0         # โหลดหน้า / ผลค้นหา
+    element: float = 20.0      # element ทั่วไป (ปุ่ม, การ์ด, ช่องค้นหา)
+    tab: float = 20.0          # แท็บงบการเงินแสดงเมนูหรือ "ไม่พบข้อมูล"
+    tab_click: float = 5.0     # หลังคลิกแท็บหนึ่งครั้ง ก่อนลองตัวเลือกถัดไป
+    report: float = 10.0       # สลับรายงาน / เมนู dropdown
+    popup: float = 3.0         # เฝ้า popup นานสุด
+    popup_quiet: float = 0.3   # ไม่มี popup ใหม่นานเท่านี้ = เสร็จ
+    pdf: float = 120.0         # ดาวน์โหลด PDF
+    xls: float = 180.0         # ดาวน์โหลด XLS
+    poll: float = 0.1          # ความถี่ในการตรวจเงื่อนไข
+
+    @classmethod
+    def from_env(cls) -> "Timeouts":
+        t = cls()
+        scale = float(os.environ.get("DBD_WAIT_SCALE", "1") or 1)
+        for f in fields(cls):
+            if f.name != "poll":
+                setattr(t, f.name, getattr(t, f.name) * scale)
+            env = os.environ.get(f"DBD_WAIT_{f.name.upper()}")
+            if env:
+                setattr(t, f.name, float(env))
+        return t
+
+
+TIMEOUTS = Timeouts.from_env()
+LOG = os.environ.get("DBD_WAIT_LOG", "1") != "0"
+WAIT_STATS: Dict[str, List[float]] = {}
+
+
+# ---------- timing ---------- #
+class _Timer:
+    __slots__ = ("name", "outcome")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcome: Optional[str] = None
+
+
+@contextmanager
+def timed(name: str) -> Iterator[_Timer]:
+    t = _Timer(name)
+    t0 = time.monotonic()
+    try:
+        yield t
+    except TimeoutException:
+        t.outcome = "timeout"
+        raise
+    except Exception as e:
+        t.outcome = type(e).__name__
+        raise
+    finally:
+        secs = time.monotonic() - t0
+        WAIT_STATS.setdefault(t.name, []).append(secs)
+        if LOG:
+            print(f"  ⏱ {t.name}: {secs:.2f}s" + (f" ({t.outcome})" if t.outcome else ""))
+
+
+def summary() -> str:
+    lines = []
+    for name, xs in sorted(WAIT_STATS.items()):
+        s = sorted(xs)
+        p = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+        lines.append(f"{name:24s} n={len(s):4d}  p50={p(0.5):6.2f}s  p90={p(0.9):6.2f}s  max={s[-1]:6.2f}s  total={sum(s):7.1f}s")
+    return "\n".join(lines)
+
+
+# ---------- JS probes ---------- #
+_JS_PRELUDE = """
+const vis = el => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+const xp = q => {
+  const r = document.evaluate(q, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+  const a = [];
+  for (let i = 0; i < r.snapshotLength; i++) a.push(r.snapshotItem(i));
+  return a;
+};
+const xp1 = q => document.evaluate(q, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+"""
+
+
+def js_visible_css(selector: str) -> str:
+    return f"Array.from(document.querySelectorAll({json.dumps(selector)})).some(vis)"
+
+
+def js_visible_xpath(xpath: str) -> str:
+    return f"xp({json.dumps(xpath)}).some(vis)"
+
+
+def js_present_xpath(xpath: str) -> str:
+    return f"xp1({json.dumps(xpath)}) !== null"
+
+
+def js_in_source(text: str) -> str:
+    """เทียบเท่า `text in driver.page_source` แต่ไม่ต้องส่ง HTML ทั้งหน้ากลับมา"""
+    return f"document.documentElement.outerHTML.includes({json.dumps(text)})"
+
+
+def _any_script(probes: Dict[str, str]) -> str:
+    items = ",\n  ".join(f"[{json.dumps(k)}, () => ({expr})]" for k, expr in probes.items())
+    return (
+        _JS_PRELUDE
+        + f"const probes = [\n  {items}\n];\n"
+        + "for (const [k, f] of probes) { try { if (f()) return k; } catch (e) {} }\nreturn null;"
+    )
+
+
+# ---------- waits ---------- #
+def wait_any(
+    driver,
+    probes: Dict[str, str],
+    timeout: float,
+    name: str,
+    raise_on_timeout: bool = True,
+) -> Optional[str]:
+    """รอจนเงื่อนไขใดเงื่อนไขหนึ่งเป็นจริง คืนชื่อเงื่อนไข; หมดเวลา → TimeoutException (หรือ None)"""
+    script = _any_script(probes)
+    try:
+        with timed(name) as t:
+            hit = WebDriverWait(driver, timeout, poll_frequency=TIMEOUTS.poll).until(
+                lambda d: d.execute_script(script)
+            )
+            t.outcome = hit
+            return hit
+    except TimeoutException:
+        if raise_on_timeout:
+            raise
+        return None
+
+
+def wait_until(driver, condition: Callable[[Any], Any], timeout: float, name: str) -> Any:
+    """WebDriverWait(...).until(condition) พร้อมจับเวลา"""
+    with timed(name):
+        return WebDriverWait(driver, timeout, poll_frequency=TIMEOUTS.poll).until(condition)
+
+
+_POPUP_JS = _JS_PRELUDE + """
+const [xpaths, quietMs, maxMs] = [arguments[0], arguments[1], arguments[2]];
+const done = arguments[arguments.length - 1];
+const seen = new WeakSet();
+const start = Date.now();
+let clicked = 0, last = start, pending = false, obs = null;
+const sweep = () => {
+  pending = false;
+  for (const q of xpaths) {
+    for (const el of xp(q)) {
+      if (!seen.has(el) && vis(el)) {
+        seen.add(el);
+        try { el.click(); clicked++; last = Date.now(); } catch (e) {}
+      }
+    }
+  }
+};
+sweep();
+if (document.body) {
+  obs = new MutationObserver(() => { if (!pending) { pending = true; setTimeout(sweep, 30); } });
+  obs.observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['style', 'class']});
+}
+const tick = () => {
+  const now = Date.now();
+  if (now - last >= quietMs || now - start >= maxMs) {
+    if (obs) obs.disconnect();
+    done(clicked);
+  } else {
+    setTimeout(tick, 50);
+  }
+};
+setTimeout(tick, quietMs);
+"""
+
+
+def dismiss_popups(driver, xpaths: List[str], quiet: Optional[float] = None, max_wait: Optional[float] = None) -> int:
+    """คลิกปุ่มปิด popup ที่เห็น แล้วรอจนไม่มี popup ใหม่ภายใน quiet วินาที; คืนจำนวนที่คลิก"""
+    quiet = TIMEOUTS.popup_quiet if quiet is None else quiet
+    max_wait = TIMEOUTS.popup if max_wait is None else max_wait
+    need = max_wait + 5
+    if getattr(driver, "_dbd_script_timeout", 0) < need:
+        driver.set_script_timeout(need)
+        driver._dbd_script_timeout = need
+    with timed("popups") as t:
+        n = driver.execute_async_script(_POPUP_JS, xpaths, int(quiet * 1000), int(max_wait * 1000)) or 0
+        if n:
+            t.outcome = f"closed {n}"
+        return n
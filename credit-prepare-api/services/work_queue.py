@@ -0,0 +1,191 @@
+# services/work_queue.py
+"""
+คิวงานแบบถาวรบน SQLite (ไฟล์เดียว) สำหรับ pipeline หลายขั้น
+
+- หนึ่งแถวต่อ (stage, key) เช่น ("ocr", "0105541008416") → enqueue ซ้ำไม่เกิดงานซ้ำ
+  requeue=True: งานที่ done/failed แล้วกลับเป็น pending (รอบ refresh ใหม่); pending/running ไม่ถูกแตะ
+- claim() จองงานแบบ atomic (BEGIN IMMEDIATE) ใช้ได้หลาย thread/หลาย process พร้อมกัน
+- fail() → กลับเป็น pending พร้อม backoff จนครบ max_attempts แล้วจึงเป็น failed
+- process ตายกลางคัน: recover() คืนงาน running ที่ค้างให้เป็น pending ตอนเริ่มรอบใหม่
+- stats() ให้จำนวนตามสถานะ + เวลาเฉลี่ยต่องาน (ใช้คำนวณ ETA)
+
+แต่ละ thread ใช้ connection ของตัวเอง (sqlite3 ห้ามแชร์ข้าม thread)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+STATUSES = (PENDING, RUNNING, DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    stage       TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    payload     TEXT,
+    error       TEXT,
+    worker      TEXT,
+    not_before  REAL NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    PRIMARY KEY (stage, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (stage, status, not_before, enqueued_at);
+"""
+
+_INSERT_SQL = "INSERT OR IGNORE INTO jobs (stage, key, payload, enqueued_at) VALUES (?, ?, ?, ?)"
+_REQUEUE_SQL = (
+    "INSERT INTO jobs (stage, key, payload, enqueued_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(stage, key) DO UPDATE SET status = 'pending', attempts = 0, not_before = 0, error = NULL, "
+    "worker = NULL, started_at = NULL, finished_at = NULL, payload = excluded.payload, enqueued_at = excluded.enqueued_at "
+    "WHERE jobs.status IN ('done', 'failed')"
+)
+
+
+@dataclass
+class Job:
+    stage: str
+    key: str
+    attempts: int
+    payload: Dict[str, Any]
+
+
+class WorkQueue:
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db_path = os.path.abspath(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._conn() as con:
+            con.executescript(_SCHEMA)
+
+    # ---------- connection ---------- #
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def close(self) -> None:
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    # ---------- producer ---------- #
+    def enqueue(self, stage: str, key: str, payload: Optional[Dict[str, Any]] = None, requeue: bool = False) -> bool:
+        """เพิ่มงาน; มี (stage, key) อยู่แล้ว → ไม่ทำอะไร คืน False (requeue=True: done/failed → pending คืน True)"""
+        cur = self._conn().execute(
+            _REQUEUE_SQL if requeue else _INSERT_SQL,
+            (stage, key, json.dumps(payload or {}, ensure_ascii=False), time.time()),
+        )
+        return cur.rowcount > 0
+
+    def enqueue_many(self, stage: str, keys: Iterable[str], requeue: bool = False) -> int:
+        now = time.time()
+        sql = _REQUEUE_SQL if requeue else _INSERT_SQL
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            n = 0
+            for k in keys:
+                n += con.execute(sql, (stage, k, "{}", now)).rowcount
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return n
+
+    # ---------- consumer ---------- #
+    def claim(self, stage: str, worker: str = "") -> Optional[Job]:
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute(
+                "SELECT key, attempts, payload FROM jobs WHERE stage = ? AND status = ? AND not_before <= ? "
+                "ORDER BY enqueued_at, key LIMIT 1",
+                (stage, PENDING, time.time()),
+            ).fetchone()
+            if row is None:
+                con.execute("COMMIT")
+                return None
+            key, attempts, payload = row
+            con.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?, error = NULL "
+                "WHERE stage = ? AND key = ?",
+                (RUNNING, worker, time.time(), stage, key),
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return Job(stage=stage, key=key, attempts=attempts + 1, payload=json.loads(payload or "{}"))
+
+    def complete(self, job: Job) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE stage = ? AND key = ?",
+            (DONE, time.time(), job.stage, job.key),
+        )
+
+    def fail(self, job: Job, error: str, max_attempts: int, retry_delay: float = 30.0) -> bool:
+        """คืน True ถ้าจะ retry อีก (backoff = retry_delay × 2^(attempts-1)), False ถ้าหมดสิทธิ์ → failed"""
+        retry = job.attempts < max_attempts
+        if retry:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, error = ?, not_before = ? WHERE stage = ? AND key = ?",
+                (PENDING, error[:2000], time.time() + retry_delay * (2 ** (job.attempts - 1)), job.stage, job.key),
+            )
+        else:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE stage = ? AND key = ?",
+                (FAILED, error[:2000], time.time(), job.stage, job.key),
+            )
+        return retry
+
+    # ---------- maintenance ---------- #
+    def recover(self, stage: Optional[str] = None) -> int:
+        """งาน running ที่ค้างจากรอบก่อน (process ตาย) → pending"""
+        sql = "UPDATE jobs SET status = ?, worker = NULL WHERE status = ?"
+        params: List[Any] = [PENDING, RUNNING]
+        if stage:
+            sql += " AND stage = ?"
+            params.append(stage)
+        return self._conn().execute(sql, params).rowcount
+
+    def retry_failed(self, stage: Optional[str] = None) -> int:
+        sql = "UPDATE jobs SET status = ?, attempts = 0, not_before = 0 WHERE status = ?"
+        params: List[Any] = [PENDING, FAILED]
+        if stage:
+            sql += " AND stage = ?"
+            params.append(stage)
+        return self._conn().execute(sql, params).rowcount
+
+    # ---------- reporting ---------- #
+    def stats(self, stage: str) -> Dict[str, Any]:
+        con = self._conn()
+        counts = {s: 0 for s in STATUSES}
+        for status, n in con.execute("SELECT status, COUNT(*) FROM jobs WHERE stage = ? GROUP BY status", (stage,)):
+            counts[status] = n
+        avg = con.execute(
+            "SELECT AVG(finished_at - started_at) FROM jobs WHERE stage = ? AND status = ? AND started_at IS NOT NULL",
+            (stage, DONE),
+        ).fetchone()[0]
+        counts["avg_seconds"] = avg
+        return counts
+
+    def failures(self, stage: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT key, attempts, error FROM jobs WHERE stage = ? AND status = ? ORDER BY key", (stage, FAILED)
+        ).fetchall()
+        return [{"key": k, "attempts": a, "error": e} for k, a, e in rows]
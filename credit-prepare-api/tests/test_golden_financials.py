@@ -0,0 +1,64 @@
+# tests/test_golden_financials.py
+"""
+Golden test: ผลของ DBD balance/income/ratios และ sale invoice/supplier ต้องเท่ากับผลของโค้ดเดิม (ก่อนแปลง iterrows เป็น column-wise)
+
+- tests/fixtures/dbd/<tax_id>_<statement>.xlsx      → tests/fixtures/dbd/expected/<tax_id>_<statement>.json
+- tests/fixtures/sale/<kind>_ocr.html (OCR output) → tests/fixtures/sale/expected/<kind>.json
+  (parse_non_table_metadata → parse_tables_to_df → dataframe_to_enriched_rows)
+
+ไฟล์ expected สร้างจากโค้ดเวอร์ชันก่อนปรับ — อย่าสร้างใหม่จากโค้ดปัจจุบัน เว้นแต่ตั้งใจเปลี่ยนผลลัพธ์
+
+    cd credit-prepare-api && python -m unittest tests.test_golden_financials
+"""
+
+import json
+import unittest
+from pathlib import Path
+
+import pdf_ocr_sale_invoice_to_json as sale_invoice
+import pdf_ocr_sale_supplier_to_json as sale_supplier
+from script_read_dbd_financials import CONVERTERS, FILE_RE
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def _expected(path: Path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _canon(obj) -> str:
+    # เทียบทั้งค่าและลำดับ (ลำดับปี/รายการเป็นส่วนหนึ่งของผลลัพธ์)
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+class DbdFinancialsGoldenTest(unittest.TestCase):
+    def test_statements_match_golden(self):
+        files = sorted((FIXTURES / "dbd").glob("*.xlsx"))
+        self.assertTrue(files)
+        for path in files:
+            m = FILE_RE.match(path.name)
+            stmt = m.group("stmt").lower()
+            with self.subTest(file=path.name):
+                got = CONVERTERS[stmt](path, m.group("tax"), None, False)
+                want = _expected(FIXTURES / "dbd" / "expected" / f"{path.stem}.json")
+                self.assertEqual(_canon(got), _canon(want))
+
+
+class SaleRowsGoldenTest(unittest.TestCase):
+    def _check(self, module, kind: str):
+        html = (FIXTURES / "sale" / f"{kind}_ocr.html").read_text(encoding="utf-8")
+        meta = module.parse_non_table_metadata(html)
+        df = module.parse_tables_to_df(html, f"{kind}.pdf")
+        got = module.dataframe_to_enriched_rows(df, meta)
+        self.assertEqual(_canon(got), _canon(_expected(FIXTURES / "sale" / "expected" / f"{kind}.json")))
+
+    def test_sale_invoice_rows_match_golden(self):
+        self._check(sale_invoice, "sale_invoice")
+
+    def test_sale_supplier_rows_match_golden(self):
+        self._check(sale_supplier, "sale_supplier")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# tests/test_pdf_text_backends.py
+"""
+Golden test ของ text layer: ทุก backend ของ services/pdf_text ต้องให้ผล parse เท่ากับ engine เดิม
+
+- tests/fixtures/pdf_text/<tax_id>_company_info.pdf → parse_structured_from_pages (pdf_ocr_dbd_to_json)
+- tests/fixtures/pdf_text/rm_report.pdf            → iter_remittance_records (pdf_ocr_rm_report_to_json)
+  expected/*.json สร้างจากโค้ดเดิม (dbd = pdfminer, rm report = PyPDF2) — อย่าสร้างใหม่จากโค้ดปัจจุบัน
+
+PDF เป็น text layer ล้วน (ฟอนต์ Type0 + ToUnicode ไม่ฝัง glyph) วางข้อความทีละบรรทัด/ทีละช่องแบบรายงานจริง
+สระบน/วรรณยุกต์กว้าง 0 เหมือนฟอนต์ไทยจริง → เห็นพฤติกรรมของแต่ละ backend กับภาษาไทย
+
+ผลที่ต่างกันจริงและเหตุที่ default ยังไม่เปลี่ยน อยู่ใน KNOWN_DIFFERENCES / RM_UNSUPPORTED
+
+    cd credit-prepare-api && python -m unittest tests.test_pdf_text_backends
+"""
+
+import json
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pdf_ocr_dbd_to_json as dbd
+import pdf_ocr_rm_report_to_json as rm_report
+from services.pdf_text import available_backends
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "pdf_text"
+
+# (fixture, backend) → ฟิลด์ที่ backend นั้นให้ค่าต่างจาก expected
+# pdfminer ย้ายวรรณยุกต์ (กว้าง 0) ที่ท้ายบรรทัดไปไว้ท้ายหน้า → สถานะ "ยังดำเนินกิจการอยู" (ไม่มีไม้เอก)
+# smf-api PublicApiController::mapBodyToCompanyEntity อาศัยค่าที่ขาดนี้ (แทนด้วยสถานะจาก title card)
+# → pdf_ocr_dbd_to_json ยังใช้ pdfminer เป็น default จนกว่าฝั่ง API จะรองรับทั้งสองแบบ
+KNOWN_DIFFERENCES = {
+    ("0105555000001_company_info", "pdfium"): {"status": "ยังดำเนินกิจการอยู่"},
+    ("0105555000001_company_info", "pypdf2"): {"status": "ยังดำเนินกิจการอยู่"},
+}
+# pdfminer จัดกลุ่มข้อความตามคอลัมน์ของตาราง (ไม่ใช่ตามแถว) → parser ของ rm report ไม่เจอ record เลย
+RM_UNSUPPORTED = {"pdfminer"}
+
+
+def _expected(stem: str):
+    with open(FIXTURES / "expected" / f"{stem}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _structured(path: Path, backend=None):
+    texts, used = dbd.extract_text_layer(str(path), backend)
+    pages = [dbd.make_page(i, t) for i, t in enumerate(texts, start=1)]
+    return dbd.parse_structured_from_pages(pages), used
+
+
+class _NoEnvBackend(unittest.TestCase):
+    def setUp(self):
+        env = mock.patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("PDF_TEXT_BACKEND", None)
+
+
+class DbdProfileBackendsTest(_NoEnvBackend):
+    def test_default_backend_matches_golden(self):
+        for path in sorted(FIXTURES.glob("*_company_info.pdf")):
+            with self.subTest(file=path.name):
+                got, used = _structured(path)
+                self.assertEqual(used, dbd.TEXT_BACKEND_DEFAULT)
+                self.assertEqual(got, _expected(path.stem))
+
+    def test_every_backend_matches_golden(self):
+        for backend in available_backends():
+            for path in sorted(FIXTURES.glob("*_company_info.pdf")):
+                with self.subTest(backend=backend, file=path.name):
+                    want = dict(_expected(path.stem), **KNOWN_DIFFERENCES.get((path.stem, backend), {}))
+                    got, used = _structured(path, backend)
+                    self.assertEqual(used, backend)
+                    self.assertEqual(got, want)
+
+
+class RemittanceReportBackendsTest(_NoEnvBackend):
+    PDF = FIXTURES / "rm_report.pdf"
+
+    def test_default_backend_matches_golden(self):
+        self.assertEqual(list(rm_report.iter_remittance_records(self.PDF)), _expected("rm_report"))
+
+    def test_every_backend_matches_golden(self):
+        want = _expected("rm_report")
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                got = list(rm_report.iter_remittance_records(self.PDF, backend))
+                self.assertEqual(got, [] if backend in RM_UNSUPPORTED else want)
+
+
+if __name__ == "__main__":
+    unittest.main()
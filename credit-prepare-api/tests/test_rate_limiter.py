@@ -0,0 +1,73 @@
+# tests/test_rate_limiter.py
+"""
+SharedRateLimiter.request(): ชะลอเฉพาะ error ฝั่ง transport (รวม RuntimeError ที่ chain มาจาก timeout)
+
+    cd credit-prepare-api && python -m unittest tests.test_rate_limiter
+"""
+
+import os
+import tempfile
+import unittest
+
+from services.rate_limiter import BlockedError, SharedRateLimiter, is_transient
+
+
+def _wrapped(inner: BaseException) -> RuntimeError:
+    # แบบเดียวกับ scraper: raise RuntimeError("ไม่พบ...") ภายใน except ของ wait
+    try:
+        try:
+            raise inner
+        except Exception:
+            raise RuntimeError("ไม่พบปุ่มพิมพ์ข้อมูล (id=printProfile)")
+    except RuntimeError as e:
+        return e
+
+
+class IsTransientTest(unittest.TestCase):
+    def test_direct(self):
+        self.assertTrue(is_transient(TimeoutError("page load")))
+        self.assertTrue(is_transient(ConnectionResetError()))
+        self.assertFalse(is_transient(ValueError("bad number")))
+
+    def test_follows_chain(self):
+        self.assertTrue(is_transient(_wrapped(TimeoutError("print_button"))))
+        self.assertFalse(is_transient(_wrapped(KeyError("title"))))
+
+    def test_explicit_cause(self):
+        try:
+            raise RuntimeError("wrapped") from ConnectionRefusedError()
+        except RuntimeError as e:
+            self.assertTrue(is_transient(e))
+
+
+class RequestFeedbackTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.limiter = SharedRateLimiter(
+            os.path.join(tmp.name, "rate.sqlite"), rate_per_min=600, max_per_min=600, burst=10, verbose=False
+        )
+        self.addCleanup(self.limiter.close)
+
+    def _run(self, exc: BaseException) -> dict:
+        with self.assertRaises(type(exc)):
+            with self.limiter.request():
+                raise exc
+        return self.limiter.state()
+
+    def test_other_exception_keeps_rate(self):
+        st = self._run(ValueError("parse"))
+        self.assertEqual((st["error"], round(st["rate_per_min"])), (0, 600))
+
+    def test_chained_timeout_backs_off(self):
+        st = self._run(_wrapped(TimeoutError("financial tab")))
+        self.assertEqual((st["error"], round(st["rate_per_min"])), (1, 300))
+
+    def test_blocked_pauses(self):
+        st = self._run(BlockedError("captcha"))
+        self.assertEqual(st["blocked"], 1)
+        self.assertGreater(st["cooling_down_s"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# tests/test_rm_layout.py
+"""
+pdf_ocr_rm_to_json.parse_page: ข้อความ OCR ทั้งหน้า (--layout page) กับ header + ตาราง (--layout auto) ต้องได้ผลเดียวกัน
+
+tests/fixtures/rm_ocr/
+- page_whole.txt  : psm 6 ทั้งหน้า — โลโก้เป็นขยะ, header สองคอลัมน์รวมเป็นบรรทัดเดียว
+- page_header.txt : psm 4 เฉพาะ header (ทาขาวโลโก้แล้ว) — คอลัมน์ซ้าย/ขวาแยกบรรทัด
+- page_table.txt  : psm 6 เฉพาะตาราง (ถึงบรรทัด GRAND TOTAL)
+ต่อ header + ตารางแบบเดียวกับ ocr_pdf_to_pages_text (strip แล้วคั่นด้วย \\n)
+
+    cd credit-prepare-api && python -m unittest tests.test_rm_layout
+"""
+
+import unittest
+from pathlib import Path
+
+import pdf_ocr_rm_to_json as rm
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "rm_ocr"
+
+
+def _read(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def _parse(*parts: str):
+    text = "\n".join(p.strip() for p in parts if p.strip())
+    return rm.parse_page({"page_number": 1, "text": text})
+
+
+class RegionSplitParseTest(unittest.TestCase):
+    def setUp(self):
+        self.whole = _parse(_read("page_whole.txt"))
+        self.split = _parse(_read("page_header.txt"), _read("page_table.txt"))
+
+    def test_header_fields_match(self):
+        for res in (self.whole, self.split):
+            row = res["transactions"][0]
+            self.assertEqual(
+                (row["วันที่จ่ายเงิน"], row["วันที่เอกสาร"], row["รหัสผู้ขาย"]),
+                ("2025-03-05", "2025-03-01", "012345"),
+            )
+
+    def test_rows_and_totals_match(self):
+        self.assertEqual(len(self.whole["transactions"]), 6)
+        self.assertEqual(self.split["transactions"], self.whole["transactions"])
+        self.assertEqual(self.split["grand_totals"], self.whole["grand_totals"])
+        self.assertEqual(self.split["_unmatched"], self.whole["_unmatched"])
+
+
+if __name__ == "__main__":
+    unittest.main()
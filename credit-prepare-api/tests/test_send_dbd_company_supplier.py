@@ -0,0 +1,192 @@
+# tests/test_send_dbd_company_supplier.py
+"""
+send_one() / send_batch() กับ stub server (http.server ใน thread) — ไม่ต้องมี Laravel
+
+    cd credit-prepare-api && python -m unittest discover -s tests
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from send_dbd_company_supplier import FAIL, OK, SKIPPED, bulk_url_for, prepare, send_batch, send_one
+from services.sent_ledger import SentLedger
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    /api/...            → single: 201 หรือ 422 (validation) แบบ Laravel
+    /api/.../bulk       → ผลรายบริษัทแบบ Laravel แต่เรียงกลับด้าน (ผู้ส่งต้อง map ด้วย index ไม่ใช่ลำดับ)
+                          บริษัทที่ไม่มี registration_number → 422
+    /api/.../down/bulk  → 500 ทั้ง request
+    /api/.../short/bulk → 200 แต่ไม่มีผลของรายการสุดท้าย
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        items = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(items)
+        if not self.path.endswith("/bulk"):
+            if items.get("registration_number"):
+                return self._reply(201, {"ok": True, "mode": "created", "registration_number": items["registration_number"]})
+            return self._reply(422, {"success": False, "error": "Validation failed",
+                                     "messages": {"registration_number": ["The registration number field is required."]}})
+        if "/down/" in self.path:
+            return self._reply(500, {"success": False, "error": "SQLSTATE[HY000] server has gone away"})
+        results = []
+        for i, it in enumerate(items):
+            if it.get("registration_number"):
+                results.append({"index": i, "registration_number": it["registration_number"], "ok": True,
+                                "status": 201, "mode": "created"})
+            else:
+                results.append({"index": i, "registration_number": None, "ok": False, "status": 422,
+                                "error": "Validation failed",
+                                "messages": {"registration_number": ["The registration number field is required."]}})
+        if "/short/" in self.path:
+            results = results[:-1]
+        failed = sum(1 for r in results if not r["ok"])
+        self._reply(200, {"ok": failed == 0, "count": len(items), "failed": failed, "results": results[::-1]})
+
+    def _reply(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SendBatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}/api/public"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.server.requests.clear()
+        self.items = [
+            self._item("0105541008416", {"registration_number": "0105541008416"}),
+            self._item("0105555000002", {"registration_number": None, "status": "ร้าง"}),
+            self._item("0105555000003", {"registration_number": "0105555000003"}),
+        ]
+
+    def _item(self, jid, payload):
+        path = os.path.join(self.tmp.name, f"{jid}_company_info_structured.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        return prepare(path, auto_jid=True)
+
+    def _send(self, api_url, ledger=None):
+        return send_batch(self.items, bulk_url_for(api_url), api_url, timeout=5, ledger=ledger)
+
+    # ---------- single ---------- #
+
+    def test_single_ok_is_recorded_and_skipped_next_run(self):
+        api_url = self.base + "/dbd-company-supplier"
+        ledger = SentLedger(os.path.join(self.tmp.name, "ledger.sqlite"))
+        self.addCleanup(ledger.close)
+        path = self.items[0].path
+
+        first = send_one(path, api_url, timeout=5, auto_jid=True, ledger=ledger)
+        second = send_one(path, api_url, timeout=5, auto_jid=True, ledger=ledger)
+        forced = send_one(path, api_url, timeout=5, auto_jid=True, ledger=ledger, force=True)
+
+        self.assertEqual((first.status, first.http_status), (OK, 201))
+        self.assertGreater(first.seconds, 0)
+        self.assertEqual(second.status, SKIPPED)
+        self.assertEqual(forced.status, OK)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[0]["juristic_id"], "0105541008416")
+        self.assertTrue(ledger.unchanged(api_url, "0105541008416", self.items[0].digest))
+
+    def test_single_changed_payload_is_sent_again(self):
+        api_url = self.base + "/dbd-company-supplier"
+        ledger = SentLedger(os.path.join(self.tmp.name, "ledger.sqlite"))
+        self.addCleanup(ledger.close)
+        path = self.items[0].path
+        send_one(path, api_url, timeout=5, auto_jid=True, ledger=ledger)
+
+        changed = self._item("0105541008416", {"registration_number": "0105541008416", "status": "เลิก"})
+        res = send_one(changed.path, api_url, timeout=5, auto_jid=True, ledger=ledger)
+
+        self.assertEqual(res.status, OK)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(ledger.get(api_url, "0105541008416"), changed.digest)
+
+    def test_single_validation_error_surfaces_message(self):
+        api_url = self.base + "/dbd-company-supplier"
+        ledger = SentLedger(os.path.join(self.tmp.name, "ledger.sqlite"))
+        self.addCleanup(ledger.close)
+
+        res = send_one(self.items[1].path, api_url, timeout=5, auto_jid=True, ledger=ledger)
+
+        self.assertEqual((res.status, res.http_status), (FAIL, 422))
+        self.assertIn("The registration number field is required.", res.message)
+        self.assertIn("422", res.line(api_url))
+        self.assertIsNone(ledger.get(api_url, "0105555000002"))
+
+    # ---------- bulk ---------- #
+
+    def test_results_map_back_to_files_by_index(self):
+        api_url = self.base + "/dbd-company-supplier"
+        ledger = SentLedger(os.path.join(self.tmp.name, "ledger.sqlite"))
+        self.addCleanup(ledger.close)
+
+        results, seconds = self._send(api_url, ledger)
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual([it["juristic_id"] for it in self.server.requests[0]],
+                         ["0105541008416", "0105555000002", "0105555000003"])
+        self.assertEqual([r.path for r in results], [it.path for it in self.items])
+        self.assertEqual([r.status for r in results], [OK, FAIL, OK])
+        self.assertEqual([r.http_status for r in results], [201, 422, 201])
+        self.assertIn("registration_number", results[1].message)
+        self.assertTrue(all(r.batch == 3 for r in results))
+        self.assertGreater(seconds, 0)
+        # ledger บันทึกเฉพาะบริษัทที่สำเร็จ
+        self.assertTrue(ledger.unchanged(api_url, "0105541008416", self.items[0].digest))
+        self.assertIsNone(ledger.get(api_url, "0105555000002"))
+        self.assertTrue(ledger.unchanged(api_url, "0105555000003", self.items[2].digest))
+
+    def test_whole_batch_fails_on_http_error(self):
+        api_url = self.base + "/down"
+        ledger = SentLedger(os.path.join(self.tmp.name, "ledger.sqlite"))
+        self.addCleanup(ledger.close)
+
+        results, _ = self._send(api_url, ledger)
+
+        self.assertEqual([r.status for r in results], [FAIL, FAIL, FAIL])
+        self.assertEqual({r.http_status for r in results}, {500})
+        self.assertIn("server has gone away", results[0].message)
+        self.assertEqual(ledger.count(), {})
+
+    def test_whole_batch_fails_on_connection_error(self):
+        results, _ = send_batch(self.items, "http://127.0.0.1:9/bulk", "http://127.0.0.1:9", timeout=2)
+
+        self.assertEqual([r.status for r in results], [FAIL, FAIL, FAIL])
+        self.assertTrue(all(r.http_status is None and r.message for r in results))
+
+    def test_missing_item_result_fails_only_that_file(self):
+        results, _ = self._send(self.base + "/short")
+
+        self.assertEqual([r.status for r in results], [OK, FAIL, FAIL])
+        self.assertEqual(results[1].http_status, 422)
+        self.assertIn("ไม่มีผล", results[2].message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_title_card.py
+"""
+services/title_card.parse_title_card กับ HTML ที่บันทึกไว้ (tests/fixtures/title_card/)
+
+- company_page.html          : ทั้งหน้า — .tab1fiscal (title/text), <br>, &nbsp;, display:none / hidden, <script>,
+                               การ์ดอื่นที่มี label เดียวกัน (ต้องไม่ถูกอ่าน)
+- snapshot_plain_years.html  : outerHTML แบบ SNAPSHOT_JS — การ์ดซ้อน, ปีงบเป็นข้อความล้วน, วันที่เดือนเต็ม
+
+    cd credit-prepare-api && python -m unittest tests.test_title_card
+"""
+
+import unittest
+from pathlib import Path
+
+from services.title_card import parse_title_card
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "title_card"
+
+
+def _parse(name: str):
+    return parse_title_card((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+class TitleCardTest(unittest.TestCase):
+    def test_full_page(self):
+        self.assertEqual(_parse("company_page.html"), {
+            "company_name": "บริษัท ทดสอบ ข้อมูล จำกัด",
+            "registration_no": "0105555000001",
+            "entity_type": "บริษัทจำกัด",
+            "entity_status": "ยังดำเนินกิจการอยู่",
+            "incorporation_date_th_text": "12 พ.ค. 2553",
+            "registered_date": "2010-05-12",
+            "registered_capital_text": "1,000,000.00 บาท",
+            "old_registration_no": "-",
+            "business_group": "ขายส่ง ยกเว้นยานยนต์",
+            "business_size": "S",
+            "financial_filing_years_th": ["2566", "2565", "2564"],
+            "head_office_address": "99 ถนนสุขุมวิท แขวงคลองตัน เขตคลองเตย กรุงเทพมหานคร 10110",
+            "website": None,
+        })
+
+    def test_snapshot_with_plain_fiscal_years(self):
+        self.assertEqual(_parse("snapshot_plain_years.html"), {
+            "company_name": "ห้างหุ้นส่วนจำกัด ทดสอบ",
+            "registration_no": "0103555000002",
+            "entity_type": "ห้างหุ้นส่วนจำกัด",
+            "entity_status": None,
+            "incorporation_date_th_text": "1 มกราคม 2560",
+            "registered_date": None,  # thai_date_to_iso รองรับเฉพาะเดือนย่อ
+            "registered_capital_text": None,
+            "old_registration_no": None,
+            "business_group": None,
+            "business_size": None,
+            "financial_filing_years_th": ["2565", "2564", "2562"],
+            "head_office_address": None,
+            "website": "www.example.co.th",
+        })
+
+    def test_missing_card_raises(self):
+        with self.assertRaises(RuntimeError):
+            parse_title_card('<div class="cac-certified"><h3>ชื่อนิติบุคคล : ทดสอบ</h3></div>')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# tests/test_upload_jobs.py
+"""
+services/upload_jobs: run_job() บน process pool จริง + บรรทัด NDJSON ของ iter_results()
+ใช้ไฟล์ DBD ใน tests/fixtures/dbd/ (ไม่ต้องเปิด API)
+
+    cd credit-prepare-api && python -m unittest tests.test_upload_jobs
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from services import upload_jobs
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "dbd"
+
+
+class UploadJobsTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.batch = Path(tmp.name) / "uploads" / "dbd" / "batch_1"
+        self.batch.mkdir(parents=True)
+        self.out_dir = Path(tmp.name) / "processed"
+        env = mock.patch.dict(os.environ, {"UPLOAD_OUTPUT_DIR": str(self.out_dir), "UPLOAD_WORKERS": "2"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(upload_jobs.shutdown_pool)
+
+    def _upload(self, name: str, src: Path = None) -> Path:
+        dest = self.batch / name
+        if src is None:
+            dest.write_bytes(b"not an excel file")
+        else:
+            shutil.copy(src, dest)
+        return dest
+
+    def _run(self, names, **kwargs):
+        jobs = {upload_jobs.submit("dbd", path): path.name for path in names}
+        return [json.loads(ln) for ln in upload_jobs.iter_results(jobs, **kwargs)]
+
+    def test_run_job_writes_ndjson(self):
+        path = self._upload("0105555000001_balance.xlsx", FIXTURES / "0105555000001_balance.xlsx")
+
+        res = upload_jobs.run_job("dbd", str(path), str(self.out_dir))
+
+        out = Path(res["output"])
+        self.assertEqual(out, self.out_dir / "dbd" / "batch_1" / "0105555000001_balance.xlsx.ndjson")
+        rows = [json.loads(ln) for ln in out.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(len(rows), res["rows"])
+        self.assertGreater(res["rows"], 0)
+        self.assertEqual({(r["tax_id"], r["statement"]) for r in rows}, {("0105555000001", "balance")})
+
+    def test_iter_results_per_file_and_done_lines(self):
+        good = [
+            self._upload(f.name, f)
+            for f in (FIXTURES / "0105555000001_income.xlsx", FIXTURES / "0105555000002_balance.xlsx")
+        ]
+        bad = self._upload("0105555000003_ratios.xlsx")
+
+        lines = self._run(good + [bad], rejected={"notes.txt": "expected .xls/.xlsx"})
+
+        done = lines[-1]
+        per_file = {ln["file"]: ln for ln in lines[:-1]}
+        self.assertEqual(lines[0], {"file": "notes.txt", "status": "error", "error": "expected .xls/.xlsx"})
+        self.assertEqual(set(per_file), {"notes.txt", bad.name} | {p.name for p in good})
+        self.assertEqual(per_file[bad.name]["status"], "error")
+        for p in good:
+            ln = per_file[p.name]
+            self.assertEqual(ln["status"], "ok")
+            self.assertTrue(Path(ln["output"]).is_file())
+            self.assertGreater(ln["rows"], 0)
+        self.assertEqual(
+            {k: done[k] for k in ("done", "files", "ok", "failed", "rows")},
+            {"done": True, "files": 4, "ok": 2, "failed": 2, "rows": sum(per_file[p.name]["rows"] for p in good)},
+        )
+
+    def test_iter_results_streams_records_before_summary(self):
+        path = self._upload("0105555000001_ratios.xlsx", FIXTURES / "0105555000001_ratios.xlsx")
+
+        lines = self._run([path], records=True)
+
+        summary = lines[-2]
+        records = lines[:-2]
+        self.assertEqual(summary["status"], "ok")
+        self.assertEqual(len(records), summary["rows"])
+        self.assertTrue(all(ln["file"] == path.name and ln["record"]["statement"] == "ratios" for ln in records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -540,117 +540,208 @@ class PublicApiController extends Controller
     {
         try {
             // 1) Validate ให้สอดคล้องกับ body ล่าสุด
-            $data = $request->validate([
-                'registration_number' => ['required', 'string', 'max:32'],
-                'entity_type' => ['nullable', 'string', 'max:100'],
+            $data = $request->validate($this->dbdCompanySupplierRules());
 
-                // วันที่ใน body อาจมีทั้ง registered_date และ/หรือ incorporation_date_th
-                'registered_date' => ['nullable', 'date'],
-                'incorporation_date_th' => ['nullable', 'date'],
+            // 2) Transaction: upsert company + upsert business sections + sync directors
+            $result = DB::transaction(function () use ($data) {
+                return $this->upsertDbdCompany($data);
+            });
+
+            return response()->json(['ok' => true] + $result, $result['mode'] === 'created' ? 201 : 200);
+        } catch (ValidationException $e) {
+            return response()->json([
+                'success' => false,
+                'error' => 'Validation failed',
+                'messages' => $e->errors(),
+            ], 422);
+        } catch (\Exception $e) {
+            return response()->json([
+                'success' => false,
+                'error' => $e->getMessage(),
+            ], 500);
+        }
+    }
+
+    /**
+     * Bulk: body เป็น array ของ payload แบบเดียวกับ dbd_company_supplier_store
+     * ทั้ง batch อยู่ใน transaction เดียว แต่ละบริษัทเป็น savepoint ของตัวเอง
+     * → บริษัทที่ validate ไม่ผ่าน/error ไม่ทำให้บริษัทอื่นใน batch ถูก rollback
+     * results[i].index = ตำแหน่งใน array ที่ส่งมา (ผู้ส่งใช้ map กลับไปยังไฟล์)
+     */
+    public function dbd_company_supplier_bulk_store(Request $request): JsonResponse
+    {
+        $items = $request->all();
+        if (!array_is_list($items)) {
+            return response()->json([
+                'success' => false,
+                'error' => 'Body must be a JSON array of company payloads',
+            ], 422);
+        }
+
+        $rules = $this->dbdCompanySupplierRules();
+        $results = [];
+        $counts = ['created' => 0, 'updated' => 0, 'failed' => 0];
+
+        try {
+            DB::transaction(function () use ($items, $rules, &$results, &$counts) {
+                foreach ($items as $i => $item) {
+                    $registrationNumber = is_array($item) ? ($item['registration_number'] ?? null) : null;
+                    try {
+                        $data = validator(is_array($item) ? $item : [], $rules)->validate();
+
+                        $result = DB::transaction(function () use ($data) {
+                            return $this->upsertDbdCompany($data);
+                        });
+
+                        $counts[$result['mode']]++;
+                        $results[] = [
+                            'index' => $i,
+                            'registration_number' => $registrationNumber,
+                            'ok' => true,
+                            'status' => $result['mode'] === 'created' ? 201 : 200,
+                        ] + $result;
+                    } catch (ValidationException $e) {
+                        $counts['failed']++;
+                        $results[] = [
+                            'index' => $i,
+                            'registration_number' => $registrationNumber,
+                            'ok' => false,
+                            'status' => 422,
+                            'error' => 'Validation failed',
+                            'messages' => $e->errors(),
+                        ];
+                    } catch (\Exception $e) {
+                        $counts['failed']++;
+                        $results[] = [
+                            'index' => $i,
+                            'registration_number' => $registrationNumber,
+                            'ok' => false,
+                            'status' => 500,
+                            'error' => $e->getMessage(),
+                        ];
+                    }
+                }
+            });
+        } catch (\Exception $e) {
+            return response()->json([
+                'success' => false,
+                'error' => $e->getMessage(),
+            ], 500);
+        }
 
-                'status' => ['nullable', 'string', 'max:100'],
-                'registered_capital_baht' => ['nullable', 'numeric', 'min:0'],
-                'address' => ['nullable', 'string'],
+        return response()->json([
+            'ok' => $counts['failed'] === 0,
+            'count' => count($items),
+            'created' => $counts['created'],
+            'updated' => $counts['updated'],
+            'failed' => $counts['failed'],
+            'results' => $results,
+        ]);
+    }
 
-                'business_section_at_registration' => ['nullable', 'array'],
-                'business_section_at_registration.code' => ['nullable', 'string', 'max:50'],
-                'business_section_at_registration.description' => ['nullable', 'string'],
+    private function dbdCompanySupplierRules(): array
+    {
+        return [
+            'registration_number' => ['required', 'string', 'max:32'],
+            'entity_type' => ['nullable', 'string', 'max:100'],
 
-                'objective_at_registration' => ['nullable', 'string'],
+            // วันที่ใน body อาจมีทั้ง registered_date และ/หรือ incorporation_date_th
+            'registered_date' => ['nullable', 'date'],
+            'incorporation_date_th' => ['nullable', 'date'],
 
-                'business_section_latest' => ['nullable', 'array'],
-                'business_section_latest.code' => ['nullable', 'string', 'max:50'],
-                'business_section_latest.description' => ['nullable', 'string'],
+            'status' => ['nullable', 'string', 'max:100'],
+            'registered_capital_baht' => ['nullable', 'numeric', 'min:0'],
+            'address' => ['nullable', 'string'],
 
-                'objective_latest' => ['nullable', 'string'],
+            'business_section_at_registration' => ['nullable', 'array'],
+            'business_section_at_registration.code' => ['nullable', 'string', 'max:50'],
+            'business_section_at_registration.description' => ['nullable', 'string'],
 
-                'financial_filing_years_th' => ['nullable', 'array'],
-                'financial_filing_years_th.*' => ['string', 'max:10'],
+            'objective_at_registration' => ['nullable', 'string'],
 
-                // directors เป็น array ของ object { no, name }
-                'directors' => ['nullable', 'array'],
-                'directors.*.no'   => ['required_with:directors', 'integer', 'min:0'],
-                'directors.*.name' => ['required_with:directors', 'string', 'max:255'],
+            'business_section_latest' => ['nullable', 'array'],
+            'business_section_latest.code' => ['nullable', 'string', 'max:50'],
+            'business_section_latest.description' => ['nullable', 'string'],
 
-                'title_card' => ['nullable', 'array'],
-                'title_card.company_name' => ['nullable', 'string'],
-                'title_card.entity_status' => ['nullable', 'string'],
-                'title_card.business_size' => ['nullable', 'string', 'max:5'],
-                'title_card.business_group' => ['nullable', 'string'],
-            ]);
+            'objective_latest' => ['nullable', 'string'],
+
+            'financial_filing_years_th' => ['nullable', 'array'],
+            'financial_filing_years_th.*' => ['string', 'max:10'],
 
-            // 2) Map → company_entity
-            $mapped = $this->mapBodyToCompanyEntity($data);
+            // directors เป็น array ของ object { no, name }
+            'directors' => ['nullable', 'array'],
+            'directors.*.no'   => ['required_with:directors', 'integer', 'min:0'],
+            'directors.*.name' => ['required_with:directors', 'string', 'max:255'],
+
+            'title_card' => ['nullable', 'array'],
+            'title_card.company_name' => ['nullable', 'string'],
+            'title_card.entity_status' => ['nullable', 'string'],
+            'title_card.business_size' => ['nullable', 'string', 'max:5'],
+            'title_card.business_group' => ['nullable', 'string'],
+        ];
+    }
 
-            // 3) Transaction: upsert company + upsert business sections + sync directors
-            return DB::transaction(function () use ($mapped, $data) {
-                // upsert company_entity (key = registered_no)
-                $company = CompanyEntity::updateOrCreate(
-                    ['registered_no' => $mapped['registered_no']],
-                    $mapped
+    /**
+     * upsert company_entity + business sections + sync directors ของบริษัทเดียว
+     * (ต้องเรียกภายใน DB::transaction)
+     */
+    private function upsertDbdCompany(array $data): array
+    {
+        $mapped = $this->mapBodyToCompanyEntity($data);
+
+        // upsert company_entity (key = registered_no)
+        $company = CompanyEntity::updateOrCreate(
+            ['registered_no' => $mapped['registered_no']],
+            $mapped
+        );
+
+        // upsert master business sections (ถ้ามี code)
+        $sections_upserted = 0;
+        foreach (['business_section_at_registration', 'business_section_latest'] as $k) {
+            if (!empty($data[$k]['code'])) {
+                CompanyBusinessSection::updateOrCreate(
+                    ['code' => trim($data[$k]['code'])],
+                    ['description' => isset($data[$k]['description']) ? trim($data[$k]['description']) : null]
                 );
+                $sections_upserted++;
+            }
+        }
 
-                // upsert master business sections (ถ้ามี code)
-                $sections_upserted = 0;
-                foreach (['business_section_at_registration', 'business_section_latest'] as $k) {
-                    if (!empty($data[$k]['code'])) {
-                        CompanyBusinessSection::updateOrCreate(
-                            ['code' => trim($data[$k]['code'])],
-                            ['description' => isset($data[$k]['description']) ? trim($data[$k]['description']) : null]
-                        );
-                        $sections_upserted++;
-                    }
-                }
+        // sync directors → company_person (ลบทิ้งของบริษัทนี้ก่อนแล้วเติมใหม่)
+        $directors_synced = 0;
+        if (!empty($data['directors']) && is_array($data['directors'])) {
+            CompanyPerson::where('registered_no', $company->registered_no)->delete();
 
-                // sync directors → company_person (ลบทิ้งของบริษัทนี้ก่อนแล้วเติมใหม่)
-                $directors_synced = 0;
-                if (!empty($data['directors']) && is_array($data['directors'])) {
-                    CompanyPerson::where('registered_no', $company->registered_no)->delete();
-
-                    foreach ($data['directors'] as $d) {
-                        $no   = isset($d['no']) ? (int)$d['no'] : null;
-                        $name = (string)($d['name'] ?? '');
-
-                        [$prefix, $first, $last] = $this->splitThaiName($name);
-                        if ($first === '' && $last === '') {
-                            continue;
-                        }
-
-                        CompanyPerson::create([
-                            'registered_no' => $company->registered_no,
-                            'citizen_id'    => null,
-                            'prefix'        => $prefix,
-                            'first_name'    => $first,
-                            'last_name'     => $last,
-                            'phone'         => null,
-                            'is_owner'      => null,
-                            'director_no'   => $no,   // <- จาก payload
-                            'boj5_doc_no'   => null,
-                        ]);
-                        $directors_synced++;
-                    }
+            foreach ($data['directors'] as $d) {
+                $no   = isset($d['no']) ? (int)$d['no'] : null;
+                $name = (string)($d['name'] ?? '');
+
+                [$prefix, $first, $last] = $this->splitThaiName($name);
+                if ($first === '' && $last === '') {
+                    continue;
                 }
 
-                return response()->json([
-                    'ok' => true,
-                    'mode' => $company->wasRecentlyCreated ? 'created' : 'updated',
-                    'company_id' => $company->id,
-                    'business_sections_upserted' => $sections_upserted,
-                    'directors_synced' => $directors_synced,
-                ], $company->wasRecentlyCreated ? 201 : 200);
-            });
-        } catch (ValidationException $e) {
-            return response()->json([
-                'success' => false,
-                'error' => 'Validation failed',
-                'messages' => $e->errors(),
-            ], 422);
-        } catch (\Exception $e) {
-            return response()->json([
-                'success' => false,
-                'error' => $e->getMessage(),
-            ], 500);
+                CompanyPerson::create([
+                    'registered_no' => $company->registered_no,
+                    'citizen_id'    => null,
+                    'prefix'        => $prefix,
+                    'first_name'    => $first,
+                    'last_name'     => $last,
+                    'phone'         => null,
+                    'is_owner'      => null,
+                    'director_no'   => $no,   // <- จาก payload
+                    'boj5_doc_no'   => null,
+                ]);
+                $directors_synced++;
+            }
         }
+
+        return [
+            'mode' => $company->wasRecentlyCreated ? 'created' : 'updated',
+            'company_id' => $company->id,
+            'business_sections_upserted' => $sections_upserted,
+            'directors_synced' => $directors_synced,
+        ];
     }
 
     private function mapBodyToCompanyEntity(array $src): array
@@ -28,6 +28,7 @@ Route::prefix('/public')->group(function () {
 
     Route::post('/dbd-supplier', [PublicApiController::class, 'dbd_supplier_store']);
     Route::post('/dbd-company-supplier', [PublicApiController::class, 'dbd_company_supplier_store']);
+    Route::post('/dbd-company-supplier/bulk', [PublicApiController::class, 'dbd_company_supplier_bulk_store']);
     Route::get('/directors/{registered_no}', [PublicApiController::class, 'directorsByRegisteredNo']);
     Route::get('/company/{tax_id}/financial', [PublicApiController::class, 'getCompanyFinancialAllYears']);
     Route::get('/company/{tax_id}/financial/{year}', [PublicApiController::class, 'getCompanyFinancial']);
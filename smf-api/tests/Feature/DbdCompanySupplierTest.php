@@ -0,0 +1,194 @@
+<?php
+
+namespace Tests\Feature;
+
+use App\Models\CompanyEntity;
+use App\Models\CompanyPerson;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Foundation\Testing\RefreshDatabase;
+use Illuminate\Support\Facades\Schema;
+use Tests\TestCase;
+
+class DbdCompanySupplierTest extends TestCase
+{
+    use RefreshDatabase;
+
+    protected function setUp(): void
+    {
+        parent::setUp();
+
+        // ตาราง company_* ไม่มี migration ใน repo (สร้างไว้ที่ DB จริง) → สร้างเฉพาะคอลัมน์ที่ endpoint ใช้
+        Schema::create('company_entity', function (Blueprint $table) {
+            $table->id();
+            $table->string('registered_no')->unique();
+            $table->string('company_name_en')->nullable();
+            $table->string('company_name_th')->nullable();
+            $table->string('entity_type_code')->nullable();
+            $table->date('registration_date')->nullable();
+            $table->string('business_group')->nullable();
+            $table->string('company_status')->nullable();
+            $table->string('company_size')->nullable();
+            $table->integer('num_director')->nullable();
+            $table->decimal('registered_capital_baht', 18, 2)->nullable();
+            $table->bigInteger('total_num_shares')->nullable();
+            $table->decimal('value_per_share', 18, 2)->nullable();
+            $table->boolean('is_hq')->nullable();
+            $table->string('branch')->nullable();
+            $table->text('registered_address')->nullable();
+            $table->text('address')->nullable();
+            $table->unsignedBigInteger('contact_person_id')->nullable();
+            $table->string('vat_registered_no')->nullable();
+            $table->boolean('is_vat')->nullable();
+            $table->boolean('is_ncb')->nullable();
+            $table->boolean('is_led')->nullable();
+            $table->boolean('is_secured')->nullable();
+            $table->string('business_section_registration_code')->nullable();
+            $table->string('business_section_latest_code')->nullable();
+            $table->text('objective_at_registration')->nullable();
+            $table->text('objective_latest')->nullable();
+            $table->timestamps();
+        });
+
+        Schema::create('company_business_section', function (Blueprint $table) {
+            $table->id();
+            $table->string('code')->unique();
+            $table->text('description')->nullable();
+        });
+
+        Schema::create('company_person', function (Blueprint $table) {
+            $table->id();
+            $table->string('registered_no')->index();
+            $table->string('citizen_id')->nullable();
+            $table->string('prefix')->nullable();
+            $table->string('first_name')->nullable();
+            $table->string('last_name')->nullable();
+            $table->string('phone')->nullable();
+            $table->boolean('is_owner')->nullable();
+            $table->integer('director_no')->nullable();
+            $table->string('boj5_doc_no')->nullable();
+            $table->timestamps();
+        });
+    }
+
+    private function payload(string $registeredNo, array $overrides = []): array
+    {
+        return array_replace([
+            'registration_number' => $registeredNo,
+            'entity_type' => 'บริษัทจำกัด',
+            'registered_date' => '2010-05-12',
+            'status' => 'ยังดำเนินกิจการอยู่',
+            'registered_capital_baht' => 1000000,
+            'address' => '99 ถนนสุขุมวิท กรุงเทพมหานคร',
+            'business_section_at_registration' => ['code' => '46900', 'description' => 'การขายส่งสินค้าทั่วไป'],
+            'business_section_latest' => ['code' => '47190', 'description' => 'การขายปลีกสินค้าทั่วไป'],
+            'directors' => [
+                ['no' => 1, 'name' => 'นายสมชาย ใจดี'],
+                ['no' => 2, 'name' => 'นางสาวสมหญิง รักงาน'],
+            ],
+            'title_card' => [
+                'company_name' => "บริษัท ทดสอบ {$registeredNo} จำกัด",
+                'entity_status' => 'ยังดำเนินกิจการอยู่',
+                'business_size' => 'S',
+                'business_group' => 'ขายส่ง',
+            ],
+        ], $overrides);
+    }
+
+    // ---------- single ---------- //
+
+    public function test_single_store_creates_then_updates_company(): void
+    {
+        $this->postJson('/api/public/dbd-company-supplier', $this->payload('0105555000001'))
+            ->assertStatus(201)
+            ->assertJson(['ok' => true, 'mode' => 'created', 'directors_synced' => 2, 'business_sections_upserted' => 2]);
+
+        $this->postJson('/api/public/dbd-company-supplier', $this->payload('0105555000001', [
+            'directors' => [['no' => 1, 'name' => 'นายสมชาย ใจดี']],
+        ]))
+            ->assertStatus(200)
+            ->assertJson(['ok' => true, 'mode' => 'updated', 'directors_synced' => 1]);
+
+        $this->assertSame(1, CompanyEntity::count());
+        $this->assertSame(1, CompanyPerson::where('registered_no', '0105555000001')->count());
+        $this->assertDatabaseHas('company_entity', [
+            'registered_no' => '0105555000001',
+            'company_name_th' => 'บริษัท ทดสอบ 0105555000001 จำกัด',
+            'company_size' => 'S',
+        ]);
+    }
+
+    public function test_single_store_rejects_invalid_payload(): void
+    {
+        $this->postJson('/api/public/dbd-company-supplier', $this->payload('0105555000002', ['registration_number' => null]))
+            ->assertStatus(422)
+            ->assertJson(['success' => false, 'error' => 'Validation failed'])
+            ->assertJsonStructure(['messages' => ['registration_number']]);
+
+        $this->assertSame(0, CompanyEntity::count());
+    }
+
+    // ---------- bulk ---------- //
+
+    public function test_bulk_store_commits_valid_items_and_reports_invalid_one(): void
+    {
+        CompanyEntity::create(['registered_no' => '0105555000013', 'company_name_th' => 'ชื่อเดิม']);
+
+        $response = $this->postJson('/api/public/dbd-company-supplier/bulk', [
+            $this->payload('0105555000011'),
+            $this->payload('0105555000012', ['registered_capital_baht' => -5]),
+            $this->payload('0105555000013'),
+        ]);
+
+        $response->assertStatus(200)
+            ->assertJson([
+                'ok' => false,
+                'count' => 3,
+                'created' => 1,
+                'updated' => 1,
+                'failed' => 1,
+            ])
+            ->assertJsonPath('results.0.index', 0)
+            ->assertJsonPath('results.0.status', 201)
+            ->assertJsonPath('results.0.mode', 'created')
+            ->assertJsonPath('results.1.index', 1)
+            ->assertJsonPath('results.1.registration_number', '0105555000012')
+            ->assertJsonPath('results.1.ok', false)
+            ->assertJsonPath('results.1.status', 422)
+            ->assertJsonStructure(['results' => [1 => ['messages' => ['registered_capital_baht']]]])
+            ->assertJsonPath('results.2.index', 2)
+            ->assertJsonPath('results.2.status', 200)
+            ->assertJsonPath('results.2.mode', 'updated');
+
+        $this->assertDatabaseHas('company_entity', ['registered_no' => '0105555000011']);
+        $this->assertDatabaseMissing('company_entity', ['registered_no' => '0105555000012']);
+        $this->assertDatabaseHas('company_entity', [
+            'registered_no' => '0105555000013',
+            'company_name_th' => 'บริษัท ทดสอบ 0105555000013 จำกัด',
+        ]);
+        $this->assertSame(2, CompanyPerson::where('registered_no', '0105555000011')->count());
+        $this->assertSame(0, CompanyPerson::where('registered_no', '0105555000012')->count());
+    }
+
+    public function test_bulk_store_reports_non_object_item_by_index(): void
+    {
+        $this->postJson('/api/public/dbd-company-supplier/bulk', [
+            'not-an-object',
+            $this->payload('0105555000021'),
+        ])
+            ->assertStatus(200)
+            ->assertJson(['ok' => false, 'created' => 1, 'failed' => 1])
+            ->assertJsonPath('results.0.index', 0)
+            ->assertJsonPath('results.0.status', 422)
+            ->assertJsonPath('results.1.index', 1)
+            ->assertJsonPath('results.1.status', 201);
+    }
+
+    public function test_bulk_store_requires_json_array(): void
+    {
+        $this->postJson('/api/public/dbd-company-supplier/bulk', $this->payload('0105555000031'))
+            ->assertStatus(422)
+            ->assertJson(['success' => false]);
+
+        $this->assertSame(0, CompanyEntity::count());
+    }
+}